@@ -20,7 +20,7 @@ from hailo_apps_infra.instance_segmentation_pipeline import GStreamerInstanceSeg
 class user_app_callback_class(app_callback_class):
     def __init__(self):
         super().__init__()
-        self.frame_skip = 2  # Process every 2nd frame to reduce compute
+        # To reduce compute, run with --target-fps: frames are then dropped before inference instead of after it
 
 # Predefined colors (BGR format)
 COLORS = [
@@ -52,10 +52,6 @@ def app_callback(pad, info, user_data):
     user_data.increment()
     string_to_print = f"Frame count: {user_data.get_count()}\n"
 
-    # Skip frames to reduce compute
-    if user_data.get_count() % user_data.frame_skip != 0:
-        return Gst.PadProbeReturn.OK
-
     # Get the caps from the pad
     format, width, height = get_caps_from_pad(pad)
 
@@ -0,0 +1,53 @@
+import gi
+gi.require_version('Gst', '1.0')
+from gi.repository import Gst, GLib
+import hailo
+
+from hailo_apps_infra.hailo_rpi_common import app_callback_class
+from hailo_apps_infra.multi_stream_detection_pipeline import GStreamerMultiStreamDetectionApp
+
+# -----------------------------------------------------------------------------------------------
+# User-defined class to be used in the callback function
+# -----------------------------------------------------------------------------------------------
+# Inheritance from the app_callback_class
+class user_app_callback_class(app_callback_class):
+    def __init__(self):
+        super().__init__()
+        # Per-stream frame and detection counts, keyed by stream id ('sink_0', 'sink_1', ...)
+        self.stream_frames = {}
+        self.stream_detections = {}
+
+# -----------------------------------------------------------------------------------------------
+# User-defined callback function
+# -----------------------------------------------------------------------------------------------
+
+# This is the callback function that will be called for every frame of every source
+def app_callback(pad, info, user_data):
+    # Get the GstBuffer from the probe info
+    buffer = info.get_buffer()
+    # Check if the buffer is valid
+    if buffer is None:
+        return Gst.PadProbeReturn.OK
+
+    user_data.increment()
+    roi = hailo.get_roi_from_buffer(buffer)
+    # The stream id tells which input (in --inputs order) the frame came from
+    stream_id = roi.get_stream_id()
+    detections = roi.get_objects_typed(hailo.HAILO_DETECTION)
+    user_data.stream_frames[stream_id] = user_data.stream_frames.get(stream_id, 0) + 1
+    user_data.stream_detections[stream_id] = user_data.stream_detections.get(stream_id, 0) + len(detections)
+
+    for detection in detections:
+        track_id = 0
+        track = detection.get_objects_typed(hailo.HAILO_UNIQUE_ID)
+        if len(track) == 1:
+            track_id = track[0].get_id()
+        print(f"Stream: {stream_id} Frame: {user_data.stream_frames[stream_id]} "
+              f"Detection: ID: {track_id} Label: {detection.get_label()} Confidence: {detection.get_confidence():.2f}")
+    return Gst.PadProbeReturn.OK
+
+if __name__ == "__main__":
+    # Create an instance of the user app callback class
+    user_data = user_app_callback_class()
+    app = GStreamerMultiStreamDetectionApp(app_callback, user_data)
+    app.run()
@@ -0,0 +1,28 @@
+/**
+ * Cropping function for the hailocropper of INFERENCE_PIPELINE_WRAPPER when frame gates are enabled
+ * (hailo_apps_infra/frame_gating.py, --target-fps / --motion-gate).
+ * Like the TAPPAS whole-buffer cropper it returns the frame's main ROI, except for frames a gate tagged with an
+ * "inference_skipped" classification: those get no crop, so they only take the wrapper's bypass branch and skip
+ * hailonet while keeping their place in the stream.
+ *
+ * Build and install to resources/libgated_crops.so:
+ *   meson setup build.release cpp --buildtype=release && ninja -C build.release install
+ */
+#include <vector>
+#include "gated_crops.hpp"
+
+// Must match frame_gating.SKIP_INFERENCE_TYPE
+static const std::string SKIP_INFERENCE_TYPE = "inference_skipped";
+
+std::vector<HailoROIPtr> create_crops(std::shared_ptr<HailoMat> image, HailoROIPtr roi)
+{
+    std::vector<HailoROIPtr> crop_rois;
+    for (auto &object : roi->get_objects_typed(HAILO_CLASSIFICATION))
+    {
+        auto classification = std::dynamic_pointer_cast<HailoClassification>(object);
+        if (classification->get_classification_type() == SKIP_INFERENCE_TYPE)
+            return crop_rois;
+    }
+    crop_rois.emplace_back(roi);
+    return crop_rois;
+}
@@ -0,0 +1,8 @@
+#pragma once
+#include <vector>
+#include "hailo_objects.hpp"
+#include "hailomat.hpp"
+
+__BEGIN_DECLS
+std::vector<HailoROIPtr> create_crops(std::shared_ptr<HailoMat> image, HailoROIPtr roi);
+__END_DECLS
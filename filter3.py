@@ -11,6 +11,10 @@ from hailo_apps_infra.hailo_rpi_common import (
     app_callback_class,
 )
 from hailo_apps_infra.detection_pipeline import GStreamerDetectionApp
+from hailo_apps_infra.recording import FrameDeduplicator
+
+# Fraction of the (downsampled) frame that must change for a frame to be written again, 0 writes every frame
+DEDUP_THRESHOLD = 0.01
 
 # -----------------------------------------------------------------------------------------------
 # User-defined class to be used in the callback function
@@ -19,6 +23,12 @@ class user_app_callback_class(app_callback_class):
     def __init__(self):
         super().__init__()
         self.new_variable = 42  # Example variable
+        # Near-identical frames are not written again; frames.jsonl keeps the timing for pictovid.py
+        os.makedirs("captures", exist_ok=True)
+        self.frame_deduplicator = FrameDeduplicator(
+            threshold=DEDUP_THRESHOLD,
+            timing_path=os.path.join("captures", "frames.jsonl"),
+        )
     
     def new_function(self):  # Example function
         return "The meaning of life is: "
@@ -54,6 +64,8 @@ def app_callback(pad, info, user_data):
     
     detection_count = 0
     frame2 = np.frombuffer(map_info.data, dtype=np.uint8).reshape((height, width, 3))
+    # Checked before drawing so only the camera image decides whether the frame is new
+    write_frame = user_data.frame_deduplicator.accept(frame2, frame_count, f"frame2_{frame_count:04d}.jpg")
     frame2 = np.array(frame2, copy=True)
     
     for detection in detections:
@@ -76,9 +88,10 @@ def app_callback(pad, info, user_data):
             cv2.rectangle(frame2, (xmin, ymin), (xmax, ymax), (0, 255, 0), 2)
             cv2.putText(frame2, f"{label} {confidence:.2f}", (xmin, ymin-10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 1)
     
-    frame2 = cv2.cvtColor(frame2, cv2.COLOR_RGB2BGR)
-    output_path = f"captures/frame2_{frame_count:04d}.jpg"
-    cv2.imwrite(output_path, frame2)
+    if write_frame:
+        frame2 = cv2.cvtColor(frame2, cv2.COLOR_RGB2BGR)
+        output_path = f"captures/frame2_{frame_count:04d}.jpg"
+        cv2.imwrite(output_path, frame2)
     
     if user_data.use_frame:
         cv2.putText(frame, f"Detections: {detection_count}", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
@@ -93,4 +106,7 @@ def app_callback(pad, info, user_data):
 if __name__ == "__main__":
     user_data = user_app_callback_class()
     app = GStreamerDetectionApp(app_callback, user_data)
-    app.run()
+    try:
+        app.run()
+    finally:
+        user_data.frame_deduplicator.close()
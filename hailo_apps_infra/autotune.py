@@ -0,0 +1,131 @@
+import itertools
+import json
+import os
+import time
+import gi
+gi.require_version('Gst', '1.0')
+from gi.repository import Gst
+from hailo_apps_infra.startup_profile import lazy_import
+from hailo_apps_infra.gstreamer_helper_pipelines import (
+    QUEUE,
+    SOURCE_PIPELINE,
+)
+
+# -----------------------------------------------------------------------------------------------
+# hailonet batch size / scheduler auto-tuning
+# -----------------------------------------------------------------------------------------------
+# Runs a short calibration of the inference part of an app on a recorded (replay) source for every candidate
+# configuration and persists the fastest one per HEF in a JSON tuning file.
+# The HEF path, size and modification time form the key, so a re-exported HEF is tuned again. Apps whose inference
+# part depends on more than the HEF (e.g. the tile grid of --tiles) add a variant to the key.
+
+DEFAULT_TUNING_FILE = os.path.join(os.path.expanduser('~'), '.cache', 'hailo_apps_infra', 'tuning.json')
+DEFAULT_BATCH_SIZES = [1, 2, 4, 8]
+DEFAULT_SCHEDULER_TIMEOUTS_MS = [None, 5, 20, 50]
+
+def get_hef_key(hef_path, variant=None):
+    stat = os.stat(hef_path)
+    key = f'{os.path.abspath(hef_path)}:{stat.st_size}:{int(stat.st_mtime)}'
+    return f'{key}:{variant}' if variant else key
+
+def load_tuned_config(hef_path, tuning_file=DEFAULT_TUNING_FILE, variant=None):
+    """
+    Returns the persisted configuration for the HEF and variant
+    ({'batch_size', 'scheduler_timeout_ms', 'scheduler_priority', ...}), or None if they were not tuned.
+    """
+    if not os.path.exists(tuning_file) or not os.path.exists(hef_path):
+        return None
+    try:
+        with open(tuning_file) as f:
+            return json.load(f).get(get_hef_key(hef_path, variant))
+    except (OSError, ValueError) as e:
+        print(f"Could not read tuning file {tuning_file}: {e}")
+        return None
+
+def save_tuned_config(hef_path, config, tuning_file=DEFAULT_TUNING_FILE, variant=None):
+    tuned = {}
+    if os.path.exists(tuning_file):
+        try:
+            with open(tuning_file) as f:
+                tuned = json.load(f)
+        except (OSError, ValueError):
+            pass
+    os.makedirs(os.path.dirname(tuning_file), exist_ok=True)
+    tuned[get_hef_key(hef_path, variant)] = config
+    lazy_import('hailo_apps_infra.recording').write_json_atomic(tuning_file, tuned)
+
+def measure_inference_fps(pipeline_string, warmup_frames=30):
+    """
+    Runs the pipeline to EOS and returns the FPS measured at the 'autotune_sink' fakesink after warmup_frames.
+    """
+    pipeline = Gst.parse_launch(pipeline_string)
+    timestamps = []
+
+    def on_buffer(pad, info):
+        timestamps.append(time.perf_counter())
+        return Gst.PadProbeReturn.OK
+
+    pipeline.get_by_name('autotune_sink').get_static_pad('sink').add_probe(Gst.PadProbeType.BUFFER, on_buffer)
+    pipeline.set_state(Gst.State.PLAYING)
+    message = pipeline.get_bus().timed_pop_filtered(Gst.CLOCK_TIME_NONE, Gst.MessageType.EOS | Gst.MessageType.ERROR)
+    pipeline.set_state(Gst.State.NULL)
+    if message.type == Gst.MessageType.ERROR:
+        err, debug = message.parse_error()
+        raise RuntimeError(f"{err}, {debug}")
+    measured = timestamps[warmup_frames:]
+    if len(measured) < 2:
+        raise RuntimeError("Not enough frames to measure, use a longer replay source")
+    return (len(measured) - 1) / (measured[-1] - measured[0])
+
+def run_auto_tune(app, replay_source, batch_sizes=DEFAULT_BATCH_SIZES, scheduler_timeouts_ms=DEFAULT_SCHEDULER_TIMEOUTS_MS, num_frames=300):
+    """
+    Calibrates batch size and scheduler timeout for an app.
+    The app must implement get_inference_pipeline() building its inference wrapper from
+    app.batch_size, app.scheduler_timeout_ms and app.scheduler_priority.
+    The app attributes are restored; the best configuration is returned.
+
+    Args:
+        app (GStreamerApp): The app to tune.
+        replay_source (str): A recorded video file.
+        batch_sizes (list): Candidate batch sizes.
+        scheduler_timeouts_ms (list): Candidate scheduler timeouts (None = hailonet default).
+        num_frames (int): Frames per candidate run.
+
+    Returns:
+        dict: {'batch_size', 'scheduler_timeout_ms', 'scheduler_priority', 'fps'} of the fastest configuration.
+    """
+    Gst.init(None)
+    original = (app.batch_size, app.scheduler_timeout_ms)
+    source_pipeline = SOURCE_PIPELINE(replay_source, app.video_width, app.video_height, app.video_format, decode_chain=app.decode_chain)
+    results = []
+    print(f"Auto-tuning {app.hef_path} on {replay_source}")
+    for batch_size, scheduler_timeout_ms in itertools.product(batch_sizes, scheduler_timeouts_ms):
+        app.batch_size, app.scheduler_timeout_ms = batch_size, scheduler_timeout_ms
+        pipeline_string = (
+            f'{source_pipeline} ! '
+            f'identity name=autotune_limit eos-after={num_frames} ! '
+            f'{app.get_inference_pipeline()} ! '
+            f'{QUEUE(name="autotune_sink_q")} ! '
+            f'fakesink name=autotune_sink sync=false '
+        )
+        try:
+            fps = measure_inference_fps(pipeline_string)
+        except Exception as e:
+            print(f"  batch-size={batch_size} scheduler-timeout-ms={scheduler_timeout_ms}: failed ({e})")
+            continue
+        print(f"  batch-size={batch_size} scheduler-timeout-ms={scheduler_timeout_ms}: {fps:.1f} FPS")
+        results.append((fps, batch_size, scheduler_timeout_ms))
+    app.batch_size, app.scheduler_timeout_ms = original
+    if not results:
+        raise RuntimeError("Auto-tuning failed for all candidate configurations")
+
+    fps, batch_size, scheduler_timeout_ms = max(results, key=lambda r: r[0])
+    best = {
+        'batch_size': batch_size,
+        'scheduler_timeout_ms': scheduler_timeout_ms,
+        'scheduler_priority': app.scheduler_priority,
+        'fps': round(fps, 2),
+        'tuned_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+    print(f"Best configuration: batch-size={batch_size} scheduler-timeout-ms={scheduler_timeout_ms} ({fps:.1f} FPS)")
+    return best
@@ -0,0 +1,290 @@
+import glob
+import itertools
+import json
+import multiprocessing
+import os
+import queue
+import sys
+import time
+from hailo_apps_infra.gstreamer_app import (
+    Gst,
+    app_callback_class,
+)
+from hailo_apps_infra.hailo_rpi_common import get_default_parser
+from hailo_apps_infra.detection_pipeline import GStreamerDetectionApp
+from hailo_apps_infra.tracking import get_track_id
+from hailo_apps_infra.startup_profile import lazy_import
+
+# -----------------------------------------------------------------------------------------------
+# Batch reprocessing of recorded files
+# -----------------------------------------------------------------------------------------------
+# Runs every recording in a directory through the detection pipeline headless and unsynchronized (as fast as the
+# device allows) and writes one detections file per input. One pipeline is built and the HEF is loaded once:
+# at the end of each file the pipeline goes to READY, the filesrc location is switched and it plays again.
+#
+# With --workers N, N worker processes (each with its own pipeline) take files from a shared job queue. They share the
+# device through the HailoRT multi-process service (hailonet multi-process-service=true, same vdevice-group-id), so
+# CPU-bound decode is spread over the cores while the accelerator stays busy. The hailort service must be running.
+#
+# Usage:
+#   python -m hailo_apps_infra.batch_reprocess --input-dir recordings --output-dir detections [--workers 3] [detection app options]
+#
+# Output: <output-dir>/<recording name>.detections.jsonl with one line per frame:
+#   {"frame_index": 0, "pts": 0.0, "detections": [{"label": ..., "confidence": ..., "bbox": [xmin, ymin, xmax, ymax], "track_id": ...}]}
+# bbox is normalized to the frame, track_id is 0 when the detection is not tracked.
+
+def get_output_path(input_path, output_dir):
+    return os.path.join(output_dir, f'{os.path.splitext(os.path.basename(input_path))[0]}.detections.jsonl')
+
+
+class DetectionFileWriter:
+    """
+    Writes the detections of every frame of one input as JSONL.
+    """
+    def __init__(self, output_path):
+        self.output_path = output_path
+        self.file = open(output_path, 'w')
+        self.frame_count = 0
+        self.detection_count = 0
+
+    def write(self, buffer):
+        hailo = lazy_import('hailo')
+        detections = []
+        for detection in hailo.get_roi_from_buffer(buffer).get_objects_typed(hailo.HAILO_DETECTION):
+            bbox = detection.get_bbox()
+            detections.append({
+                'label': detection.get_label(),
+                'confidence': round(detection.get_confidence(), 4),
+                'bbox': [round(v, 4) for v in (bbox.xmin(), bbox.ymin(), bbox.xmax(), bbox.ymax())],
+                'track_id': get_track_id(detection),
+            })
+        pts = buffer.pts / Gst.SECOND if buffer.pts != Gst.CLOCK_TIME_NONE else None
+        self.file.write(json.dumps({'frame_index': self.frame_count, 'pts': pts, 'detections': detections}) + '\n')
+        self.frame_count += 1
+        self.detection_count += len(detections)
+
+    def close(self):
+        self.file.close()
+
+
+class batch_callback_class(app_callback_class):
+    def __init__(self):
+        super().__init__()
+        # The writer of the input currently playing, switched by BatchReprocessApp between files
+        self.writer = None
+
+def batch_callback(pad, info, user_data):
+    buffer = info.get_buffer()
+    if buffer is not None and user_data.writer is not None:
+        user_data.writer.write(buffer)
+    return Gst.PadProbeReturn.OK
+
+
+class BatchReprocessApp(GStreamerDetectionApp):
+    """
+    Detection app that plays a sequence of recorded files through a single pipeline.
+
+    Args:
+        user_data (batch_callback_class): The callback data.
+        parser (argparse.ArgumentParser): The parser with the default, detection and batch options.
+        next_input (callable): Returns the path of the next file to process, or None when there are no more files.
+        output_dir (str): Where the detections files are written.
+        total_inputs (int or None): The number of files, for progress reporting.
+        multi_process (bool): Share the device with other processes through the HailoRT multi-process service.
+        report_file (callable or None): Called with a result dict after each file instead of printing the progress.
+    """
+    def __init__(self, user_data, parser, next_input, output_dir, total_inputs=None, multi_process=False, report_file=None):
+        self.next_input = next_input
+        self.output_dir = output_dir
+        self.total_inputs = total_inputs
+        self.multi_process = multi_process
+        self.report_file = report_file or self.print_file_result
+        self.current_input = next_input()
+        if self.current_input is None:
+            raise ValueError("No input files to process")
+        self.files_done = 0
+        self.files_failed = []
+        self.file_start = None
+        # Headless and unsynchronized: frames are processed as fast as decode and inference allow
+        parser.set_defaults(input=self.current_input, headless=True, disable_sync=True)
+        os.makedirs(output_dir, exist_ok=True)
+        super().__init__(batch_callback, user_data, parser=parser)
+
+    def get_inference_pipeline(self):
+        # Set here since GStreamerDetectionApp builds the pipeline in its constructor
+        if self.multi_process:
+            self.multi_process_service = True
+        return super().get_inference_pipeline()
+
+    def on_decoder_pad_added(self, decodebin, pad):
+        # parse_launch links the decoder only once; after READY decodebin creates a new pad that is linked here
+        sink_pad = self.pipeline.get_by_name('source_scale_q').get_static_pad('sink')
+        if not sink_pad.is_linked() and pad.query_caps(None).to_string().startswith('video/'):
+            pad.link(sink_pad)
+
+    def start_file(self):
+        self.user_data.writer = DetectionFileWriter(get_output_path(self.current_input, self.output_dir))
+        self.file_start = time.perf_counter()
+
+    def finish_file(self, failed=False):
+        writer, self.user_data.writer = self.user_data.writer, None
+        writer.close()
+        self.files_done += 1
+        if failed:
+            self.files_failed.append(self.current_input)
+        self.report_file({
+            'input': self.current_input,
+            'output': writer.output_path,
+            'frames': writer.frame_count,
+            'detections': writer.detection_count,
+            'seconds': time.perf_counter() - self.file_start,
+            'failed': failed,
+        })
+
+    def print_file_result(self, result):
+        progress = f"{self.files_done}/{self.total_inputs}" if self.total_inputs else f"{self.files_done}"
+        print(f"[{progress}] {format_file_result(result)}")
+
+    def advance(self, failed=False):
+        # Called from the bus watch at EOS (or error) of the current file
+        self.finish_file(failed)
+        self.current_input = self.next_input()
+        if self.current_input is None:
+            if self.files_failed:
+                print(f"{len(self.files_failed)} file(s) failed: {', '.join(self.files_failed)}", file=sys.stderr)
+            self.shutdown()
+            return
+        self.pipeline.set_state(Gst.State.READY)
+        self.pipeline.get_by_name('source').set_property('location', self.current_input)
+        self.start_file()
+        self.pipeline.set_state(Gst.State.PLAYING)
+
+    def on_eos(self):
+        self.advance()
+
+    def bus_call(self, bus, message, loop):
+        if message.type == Gst.MessageType.ERROR:
+            # A broken recording must not stop the batch, the next file is started instead
+            err, debug = message.parse_error()
+            print(f"Error in {self.current_input}: {err}, {debug}", file=sys.stderr)
+            if self.user_data.writer is not None:
+                self.advance(failed=True)
+            return True
+        return super().bus_call(bus, message, loop)
+
+    def run(self):
+        self.pipeline.get_by_name('source_decodebin').connect('pad-added', self.on_decoder_pad_added)
+        self.start_file()
+        super().run()
+
+def format_file_result(result):
+    if result['failed']:
+        return f"{result['input']}: failed after {result['frames']} frames"
+    return (f"{result['input']}: {result['frames']} frames, {result['detections']} detections, "
+            f"{result['frames'] / max(result['seconds'], 1e-6):.1f} FPS -> {result['output']}")
+
+def run_worker(worker_index, job_queue, result_queue, output_dir):
+    # Worker process: its own pipeline, files taken from the shared job queue until the None sentinel
+    def report_file(result):
+        result_queue.put({**result, 'worker': worker_index})
+
+    first_input = job_queue.get()
+    if first_input is None:
+        # The other workers already took all the files
+        return
+    pending = itertools.chain([first_input], iter(job_queue.get, None))
+    app = BatchReprocessApp(
+        batch_callback_class(),
+        get_batch_parser(),
+        next_input=lambda: next(pending, None),
+        output_dir=output_dir,
+        multi_process=True,
+        report_file=report_file,
+    )
+    app.run()
+
+def run_workers(input_files, output_dir, workers):
+    """
+    Processes the files with several worker processes and prints the per-file progress.
+
+    Returns:
+        bool: True if every file was processed successfully.
+    """
+    job_queue = multiprocessing.Queue()
+    result_queue = multiprocessing.Queue()
+    for input_file in input_files:
+        job_queue.put(input_file)
+    for _ in range(workers):
+        job_queue.put(None)
+    processes = [
+        multiprocessing.Process(target=run_worker, args=(index, job_queue, result_queue, output_dir))
+        for index in range(workers)
+    ]
+    start = time.perf_counter()
+    for process in processes:
+        process.start()
+
+    done, frames, failed = 0, 0, []
+    try:
+        while done < len(input_files):
+            try:
+                result = result_queue.get(timeout=1)
+            except queue.Empty:
+                if not any(process.is_alive() for process in processes):
+                    break
+                continue
+            done += 1
+            frames += result['frames']
+            if result['failed']:
+                failed.append(result['input'])
+            print(f"[{done}/{len(input_files)}] worker {result['worker']}: {format_file_result(result)}")
+    except KeyboardInterrupt:
+        # The workers got the SIGINT as well and shut down their pipelines
+        print("Interrupted, waiting for the workers...")
+    for process in processes:
+        process.join()
+
+    elapsed = time.perf_counter() - start
+    print(f"Processed {done}/{len(input_files)} files, {frames} frames in {elapsed:.1f} s "
+          f"({frames / max(elapsed, 1e-6):.1f} FPS over {workers} workers)")
+    if failed:
+        print(f"{len(failed)} file(s) failed: {', '.join(failed)}", file=sys.stderr)
+    return done == len(input_files) and not failed
+
+def get_batch_parser():
+    parser = get_default_parser()
+    parser.add_argument("--input-dir", type=str, required=True, help="Directory with the recordings to process")
+    parser.add_argument("--output-dir", type=str, default=None, help="Directory for the detections files. Default is --input-dir.")
+    parser.add_argument("--pattern", type=str, default="*.mp4", help="Glob pattern of the recordings. Default is *.mp4.")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Worker processes sharing the device through the HailoRT multi-process service. Default is 1.")
+    return parser
+
+def get_input_files(input_dir, pattern):
+    return sorted(glob.glob(os.path.join(input_dir, pattern)))
+
+def main():
+    parser = get_batch_parser()
+    # Only the batch options are needed here, the detection options are parsed by the app
+    args, _ = parser.parse_known_args()
+    input_files = get_input_files(args.input_dir, args.pattern)
+    if not input_files:
+        print(f"No files matching {args.pattern} in {args.input_dir}", file=sys.stderr)
+        sys.exit(1)
+    output_dir = args.output_dir or args.input_dir
+    workers = min(args.workers, len(input_files))
+    if workers > 1:
+        sys.exit(0 if run_workers(input_files, output_dir, workers) else 1)
+
+    pending = iter(input_files)
+    app = BatchReprocessApp(
+        batch_callback_class(),
+        parser,
+        next_input=lambda: next(pending, None),
+        output_dir=output_dir,
+        total_inputs=len(input_files),
+    )
+    app.run()
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,5 @@
-import gi
-gi.require_version('Gst', '1.0')
-from gi.repository import Gst, GLib
 import os
-import argparse
-import multiprocessing
-import numpy as np
-import setproctitle
-import cv2
-import time
-import hailo
+from hailo_apps_infra.startup_profile import lazy_import
 from hailo_apps_infra.hailo_rpi_common import (
     get_default_parser,
     detect_hailo_arch,
@@ -18,11 +9,12 @@ from hailo_apps_infra.gstreamer_helper_pipelines import(
     SOURCE_PIPELINE,
     INFERENCE_PIPELINE,
     INFERENCE_PIPELINE_WRAPPER,
+    TILE_CROPPER_PIPELINE,
     TRACKER_PIPELINE,
+    TRACKER_PRESETS,
     USER_CALLBACK_PIPELINE,
-    DISPLAY_PIPELINE,
-    #FILE_SINK_PIPELINE,#-------------------------------------------
 )
+from hailo_apps_infra.pipeline_model import PipelineDescription
 from hailo_apps_infra.gstreamer_app import (
     GStreamerApp,
     app_callback_class,
@@ -37,13 +29,50 @@ from hailo_apps_infra.gstreamer_app import (
 
 # This class inherits from the hailo_rpi_common.GStreamerApp class
 class GStreamerDetectionApp(GStreamerApp):
-    def __init__(self, app_callback, user_data):
-        parser = get_default_parser()
+    def __init__(self, app_callback, user_data, parser=None):
+        # Tools built on the detection app (e.g. batch_reprocess) pass their own parser with extra options
+        if parser is None:
+            parser = get_default_parser()
         parser.add_argument(
             "--labels-json",
             default=None,
             help="Path to costume labels JSON file",
         )
+        parser.add_argument(
+            "--event-labels", nargs="+", default=None,
+            help="Enable pre-event recording: keep the last seconds of video in memory and save them when one of these labels \
+            is detected, e.g. --event-labels 'Missing Bolt' MissLBracket",
+        )
+        parser.add_argument(
+            "--pre-event-seconds", type=float, default=5.0,
+            help="Seconds of video kept in memory and saved before a trigger label. Default is 5.",
+        )
+        parser.add_argument(
+            "--post-event-seconds", type=float, default=5.0,
+            help="Seconds of video saved after the last trigger label. Default is 5.",
+        )
+        parser.add_argument(
+            "--event-dir", type=str, default="events",
+            help="Directory for the saved event recordings. Default is events.",
+        )
+        parser.add_argument(
+            "--tiles", type=int, nargs=2, default=None, metavar=("COLS", "ROWS"),
+            help="Tiled inference: split the full-resolution frame (--tile-input-size) into COLS x ROWS overlapping tiles \
+            and merge the detections with cross-tile NMS. Finds small objects at the cost of COLS*ROWS inferences per frame. \
+            Compare settings with: python -m hailo_apps_infra.tiling_benchmark --input <recording>",
+        )
+        parser.add_argument(
+            "--tile-overlap", type=float, default=0.1,
+            help="Overlap between neighbouring tiles as a fraction of the tile size. Default is 0.1.",
+        )
+        parser.add_argument(
+            "--tile-iou-threshold", type=float, default=0.3,
+            help="IoU above which detections from overlapping tiles are merged. Default is 0.3.",
+        )
+        parser.add_argument(
+            "--tile-input-size", type=int, nargs=2, default=[1280, 720], metavar=("WIDTH", "HEIGHT"),
+            help="Frame resolution used with --tiles (the Picamera2 main stream for -i rpi). Default is 1280 720.",
+        )
         args = parser.parse_args()
         # Call the parent class constructor
         super().__init__(args, user_data)
@@ -53,6 +82,19 @@ class GStreamerDetectionApp(GStreamerApp):
         nms_score_threshold = 0.3
         nms_iou_threshold = 0.45
 
+        # Tiled inference runs on the full-resolution frame, all tiles of a frame in one batch
+        self.tiles = args.tiles
+        if self.tiles and self.inference_roi is not None:
+            raise ValueError("--roi-file can not be combined with --tiles")
+        # hailotilecropper always crops every tile, there is no per-frame bypass: the gates drop the skipped frames
+        if self.tiles and self.inference_crop_so is not None:
+            print("Warning: with --tiles, frames skipped by --target-fps or --motion-gate are dropped.")
+            self.inference_crop_so = None
+        if self.tiles:
+            self.video_width, self.video_height = args.tile_input_size
+            self.picamera_stream = "main"
+            self.batch_size = self.tiles[0] * self.tiles[1]
+
 
         # Determine the architecture if not specified
         if args.arch is None:
@@ -75,48 +117,76 @@ class GStreamerDetectionApp(GStreamerApp):
 
         # Set the post-processing shared object file
         self.post_process_so = os.path.join(self.current_path, '../resources/libyolo_hailortpp_postprocess.so')
-        self.post_function_name = "filter_letterbox"
+        # Tiles are stretched to the network input, not letterboxed
+        self.post_function_name = "filter" if self.tiles else "filter_letterbox"
         # User-defined label JSON file
         self.labels_json = args.labels_json
 
         self.app_callback = app_callback
 
+        if args.event_labels:
+            user_data.event_recorder = lazy_import('hailo_apps_infra.recording').EventRecorder(
+                output_dir=args.event_dir,
+                trigger_labels=args.event_labels,
+                pre_seconds=args.pre_event_seconds,
+                post_seconds=args.post_event_seconds,
+            )
+
         self.thresholds_str = (
             f"nms-score-threshold={nms_score_threshold} "
             f"nms-iou-threshold={nms_iou_threshold} "
             f"output-format-type=HAILO_FORMAT_TYPE_FLOAT32"
         )
 
+        # Batch size and scheduler settings from the command line or a previous --auto-tune
+        self.apply_inference_tuning()
+
         # Set the process title
-        setproctitle.setproctitle("Automated Recognition and Monitoring for Anomaly Detection and Assessment (ARMADA) System")
+        lazy_import('setproctitle').setproctitle("Automated Recognition and Monitoring for Anomaly Detection and Assessment (ARMADA) System")
         
         self.create_pipeline()
 
-    def get_pipeline_string(self):
-        source_pipeline = SOURCE_PIPELINE(self.video_source, self.video_width, self.video_height)
+    def get_inference_pipeline(self):
         detection_pipeline = INFERENCE_PIPELINE(
             hef_path=self.hef_path,
             post_process_so=self.post_process_so,
             post_function_name=self.post_function_name,
             batch_size=self.batch_size,
             config_json=self.labels_json,
-            additional_params=self.thresholds_str)
-        detection_pipeline_wrapper = INFERENCE_PIPELINE_WRAPPER(detection_pipeline)
-        tracker_pipeline = TRACKER_PIPELINE(class_id=-1)
+            additional_params=self.thresholds_str,
+            scheduler_timeout_ms=self.scheduler_timeout_ms,
+            scheduler_priority=self.scheduler_priority,
+            vdevice_group_id=self.vdevice_group_id,
+            multi_process_service=self.multi_process_service,
+            **self.pipeline_plan.inference_args)
+        if self.tiles:
+            # Keeps the inference_wrapper queue names used by the queue telemetry and --queue-config
+            return TILE_CROPPER_PIPELINE(
+                detection_pipeline,
+                tiles_x=self.tiles[0],
+                tiles_y=self.tiles[1],
+                overlap_x=self.options_menu.tile_overlap,
+                overlap_y=self.options_menu.tile_overlap,
+                iou_threshold=self.options_menu.tile_iou_threshold,
+                name='inference_wrapper')
+        return INFERENCE_PIPELINE_WRAPPER(detection_pipeline, crop_so=self.inference_crop_so)
+
+    def get_pipeline_description(self):
+        source_pipeline = SOURCE_PIPELINE(self.video_source, self.video_width, self.video_height, decode_chain=self.decode_chain, **self.pipeline_plan.source_args)
+        detection_pipeline_wrapper = self.get_inference_pipeline()
+        tracker_pipeline = TRACKER_PIPELINE(class_id=-1, **TRACKER_PRESETS[self.options_menu.tracker_preset])
         #tracker_pipeline = TRACKER_PIPELINE(class_id=0)
         user_callback_pipeline = USER_CALLBACK_PIPELINE()
-        display_pipeline = DISPLAY_PIPELINE(video_sink=self.video_sink, sync=self.sync, show_fps=self.show_fps)#-----------------------
-        #file_sink_pipeline = FILE_SINK_PIPELINE(output_file = 'test_output.mkv')#-----------------------------
-        pipeline_string = (
-            f'{source_pipeline} ! '
-            f'{detection_pipeline_wrapper} ! '
-            f'{tracker_pipeline} ! '
-            f'{user_callback_pipeline} ! '
-            #f'{file_sink_pipeline}' #------------------------------
-            f'{display_pipeline}'#-------------------------------
+        # Display (or headless sink) plus any extra outputs (--record-file, --udp-preview, --snapshot-dir)
+        display_pipeline = self.get_display_pipeline()
+        return (
+            PipelineDescription()
+            .add('source', source_pipeline)
+            .add('inference', detection_pipeline_wrapper)
+            .add('tracker', tracker_pipeline)
+            .add('callback', user_callback_pipeline)
+            .add('display', display_pipeline)
         )
-        print(pipeline_string)
-        return pipeline_string
 
 if __name__ == "__main__":
     # Create an instance of the user app callback class
@@ -0,0 +1,114 @@
+import argparse
+import resource
+import sys
+import time
+from hailo_apps_infra.gstreamer_app import (
+    Gst,
+    element_available,
+)
+from hailo_apps_infra.gstreamer_helper_pipelines import (
+    QUEUE,
+    ENCODER_PROFILES,
+    ENCODER_PIPELINE,
+)
+
+# -----------------------------------------------------------------------------------------------
+# Encoder benchmark
+# -----------------------------------------------------------------------------------------------
+# Runs a recorded file through decode -> scale to the app resolution (RGB, as the app outputs) -> encoder profile -> fakesink
+# for every encoder profile and reports encode FPS and CPU usage.
+# A decode-only baseline is measured first so the CPU cost of the encoder itself can be reported.
+#
+# Usage:
+#   python -m hailo_apps_infra.encoder_benchmark --input recording.mp4 --width 640 --height 480
+
+def get_benchmark_pipeline_string(input_file, encoder_pipeline, width, height, num_frames):
+    eos_after_str = f'eos-after={num_frames} ' if num_frames > 0 else ''
+    encode_str = f'videoconvert name=bench_videoconvert n-threads=2 qos=false ! {encoder_pipeline} ! ' if encoder_pipeline else ''
+    return (
+        f'filesrc location="{input_file}" ! '
+        f'decodebin ! '
+        f'videoscale n-threads=2 ! videoconvert n-threads=2 ! '
+        f'video/x-raw, pixel-aspect-ratio=1/1, format=RGB, width={width}, height={height} ! '
+        f'identity name=bench_limit {eos_after_str}! '
+        f'{QUEUE(name="bench_encoder_q")} ! '
+        f'{encode_str}'
+        f'fakesink name=bench_sink sync=false '
+    )
+
+def run_benchmark(pipeline_string):
+    """
+    Runs the pipeline to EOS and returns (frames, wall seconds, cpu seconds).
+    CPU time is the process user+system time, which includes all GStreamer streaming threads.
+    """
+    pipeline = Gst.parse_launch(pipeline_string)
+    frame_counter = [0]
+
+    def count_frames(pad, info):
+        frame_counter[0] += 1
+        return Gst.PadProbeReturn.OK
+
+    pipeline.get_by_name("bench_sink").get_static_pad("sink").add_probe(Gst.PadProbeType.BUFFER, count_frames)
+
+    usage_start = resource.getrusage(resource.RUSAGE_SELF)
+    wall_start = time.perf_counter()
+    pipeline.set_state(Gst.State.PLAYING)
+    message = pipeline.get_bus().timed_pop_filtered(Gst.CLOCK_TIME_NONE, Gst.MessageType.EOS | Gst.MessageType.ERROR)
+    wall_time = time.perf_counter() - wall_start
+    usage_end = resource.getrusage(resource.RUSAGE_SELF)
+    pipeline.set_state(Gst.State.NULL)
+
+    if message.type == Gst.MessageType.ERROR:
+        err, debug = message.parse_error()
+        raise RuntimeError(f"{err}, {debug}")
+
+    cpu_time = (usage_end.ru_utime - usage_start.ru_utime) + (usage_end.ru_stime - usage_start.ru_stime)
+    return frame_counter[0], wall_time, cpu_time
+
+def get_parser():
+    parser = argparse.ArgumentParser(description="Benchmark the recording encoder profiles on a recorded input")
+    parser.add_argument("--input", "-i", type=str, required=True, help="Recorded video file used as input")
+    parser.add_argument("--profiles", nargs="+", default=list(ENCODER_PROFILES), choices=list(ENCODER_PROFILES),
+                        help="Encoder profiles to benchmark. Defaults to all profiles.")
+    parser.add_argument("--width", type=int, default=640, help="Encode width. Default is 640.")
+    parser.add_argument("--height", type=int, default=480, help="Encode height. Default is 480.")
+    parser.add_argument("--bitrate", type=int, default=5000, help="Bitrate in kbit/s. Default is 5000.")
+    parser.add_argument("--keyframe-interval", type=int, default=30, help="Keyframe interval in frames. Default is 30.")
+    parser.add_argument("--num-frames", type=int, default=300, help="Frames to encode per profile, 0 for the whole file. Default is 300.")
+    return parser
+
+def main():
+    args = get_parser().parse_args()
+    Gst.init(None)
+
+    def benchmark(label, encoder_pipeline):
+        pipeline_string = get_benchmark_pipeline_string(args.input, encoder_pipeline, args.width, args.height, args.num_frames)
+        try:
+            return run_benchmark(pipeline_string)
+        except Exception as e:
+            print(f"{label}: failed ({e})", file=sys.stderr)
+            return None
+
+    baseline = benchmark('decode-only', None)
+    if baseline is None:
+        sys.exit(1)
+    base_frames, base_wall, base_cpu = baseline
+    base_cpu_per_frame = base_cpu / max(base_frames, 1)
+
+    print(f"{'profile':<18} {'frames':>7} {'fps':>8} {'cpu %':>7} {'encode cpu ms/frame':>20}")
+    print(f"{'decode-only':<18} {base_frames:>7} {base_frames / base_wall:>8.1f} {100 * base_cpu / base_wall:>7.0f} {'-':>20}")
+    for profile in args.profiles:
+        element = ENCODER_PROFILES[profile]['element']
+        if not element_available(element):
+            print(f"{profile:<18} skipped, {element} is not installed")
+            continue
+        encoder_pipeline = ENCODER_PIPELINE(profile, bitrate=args.bitrate, keyframe_interval=args.keyframe_interval, name='bench')
+        result = benchmark(profile, encoder_pipeline)
+        if result is None:
+            continue
+        frames, wall, cpu = result
+        encode_cpu_ms = max(cpu / max(frames, 1) - base_cpu_per_frame, 0) * 1000
+        print(f"{profile:<18} {frames:>7} {frames / wall:>8.1f} {100 * cpu / wall:>7.0f} {encode_cpu_ms:>20.2f}")
+
+if __name__ == "__main__":
+    main()
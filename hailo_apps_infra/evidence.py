@@ -0,0 +1,158 @@
+import json
+import os
+import time
+from hailo_apps_infra.startup_profile import lazy_import
+
+# -----------------------------------------------------------------------------------------------
+# Defect evidence persistence
+# -----------------------------------------------------------------------------------------------
+# Evidence is stored as padded bbox crops taken straight from the mapped GstBuffer.
+# Only crop-sized data is ever copied or channel-swapped; the full frame is never copied or colour converted.
+# Every run writes into its own session subdirectory, since hailotracker ids start again at 1 on every run.
+# Every saved crop gets one line in the session's index.jsonl linking crop -> frame index -> track id; new crops are
+# appended, rewriting a crop (e.g. a better view of the same track) replaces its line.
+
+def get_frame_view(map_info, width, height):
+    """
+    Returns a zero-copy (height, width, 3) uint8 view of a mapped RGB buffer.
+    The view is only valid while the buffer is mapped.
+    """
+    np = lazy_import('numpy')
+    return np.ndarray(shape=(height, width, 3), dtype=np.uint8, buffer=map_info.data)
+
+def get_padded_crop(frame, bbox, padding=0.2):
+    """
+    Returns a view of the frame around a normalized bbox, grown by padding (fraction of the bbox size) on every side.
+    With padding=None the whole frame is returned.
+
+    Args:
+        frame (np.ndarray): The frame, (height, width, channels).
+        bbox (tuple): (xmin, ymin, xmax, ymax) normalized to [0, 1].
+        padding (float or None): The padding as a fraction of the bbox width/height. Defaults to 0.2.
+
+    Returns:
+        np.ndarray: A view (no copy) of the padded crop.
+    """
+    if padding is None:
+        return frame
+    height, width = frame.shape[:2]
+    xmin, ymin, xmax, ymax = bbox
+    pad_x = (xmax - xmin) * padding
+    pad_y = (ymax - ymin) * padding
+    x0, x1 = int(max(xmin - pad_x, 0) * width), int(min(xmax + pad_x, 1) * width)
+    y0, y1 = int(max(ymin - pad_y, 0) * height), int(min(ymax + pad_y, 1) * height)
+    if x1 <= x0 or y1 <= y0:
+        return frame
+    return frame[y0:y1, x0:x1]
+
+
+class EvidenceWriter:
+    """
+    Writes defect evidence crops (and optional low-resolution thumbnails of the full frame) with a compact index.
+
+    encode() must be called while the buffer is mapped; it returns small JPEG byte strings that can be kept
+    (e.g. while waiting for a better view of the same track) and written later with write().
+    """
+    def __init__(self, output_dir, padding=0.2, jpeg_quality=90, thumbnail_scale=0, channel_order='RGB', index_name='index.jsonl', session=None):
+        """
+        Args:
+            output_dir (str): The parent directory of the session directories holding crops, thumbnails and the index.
+            padding (float or None): The crop padding as a fraction of the bbox size. None saves the whole frame. Defaults to 0.2.
+            jpeg_quality (int): The JPEG quality. Defaults to 90.
+            thumbnail_scale (int): Also save the full frame subsampled by this factor (e.g. 4 -> 160x120 from 640x480). 0 disables. Defaults to 0.
+            channel_order (str): 'RGB' for frames taken from the pipeline buffer, 'BGR' for frames already converted for cv2.
+            index_name (str): The index file name. Defaults to 'index.jsonl'.
+            session (str, optional): The session subdirectory name. Defaults to the start time of the run.
+        """
+        if session is None:
+            session = time.strftime('%Y-%m-%d_%H-%M-%S')
+        self.output_dir = os.path.join(output_dir, session)
+        suffix = 1
+        while os.path.exists(self.output_dir):
+            suffix += 1
+            self.output_dir = os.path.join(output_dir, f'{session}_{suffix}')
+        self.padding = padding
+        self.jpeg_quality = jpeg_quality
+        self.thumbnail_scale = thumbnail_scale
+        self.swap_channels = channel_order == 'RGB'
+        self.index_path = os.path.join(self.output_dir, index_name)
+        self.written_count = 0
+        os.makedirs(self.output_dir)
+        # crop name -> index entry of this session
+        self.index = {}
+
+    def _encode_jpeg(self, image):
+        cv2 = lazy_import('cv2')
+        np = lazy_import('numpy')
+        if self.swap_channels:
+            image = image[..., ::-1]
+        ok, jpeg = cv2.imencode('.jpg', np.ascontiguousarray(image), [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+        return jpeg.tobytes() if ok else None
+
+    def encode(self, frame, bbox):
+        """
+        Encodes the padded crop (and thumbnail if enabled) of a detection.
+
+        Args:
+            frame (np.ndarray): The frame, typically a view from get_frame_view().
+            bbox (tuple): (xmin, ymin, xmax, ymax) normalized to [0, 1].
+
+        Returns:
+            dict: {'crop': bytes, 'thumbnail': bytes or None}
+        """
+        thumbnail = None
+        if self.thumbnail_scale:
+            # Strided view, so only the subsampled pixels are touched
+            thumbnail = self._encode_jpeg(frame[::self.thumbnail_scale, ::self.thumbnail_scale])
+        return {'crop': self._encode_jpeg(get_padded_crop(frame, bbox, self.padding)), 'thumbnail': thumbnail}
+
+    def write(self, encoded, frame_index, track_id, label, confidence, bbox):
+        """
+        Writes an encoded crop (and thumbnail) and adds or replaces its index line.
+
+        Returns:
+            str: The crop file name, or None if the crop could not be encoded.
+        """
+        if encoded['crop'] is None:
+            return None
+        base_name = f"track_{track_id:05d}_{label.replace(' ', '_')}"
+        crop_name = f'{base_name}.jpg'
+        with open(os.path.join(self.output_dir, crop_name), 'wb') as f:
+            f.write(encoded['crop'])
+        thumbnail_name = None
+        if encoded.get('thumbnail') is not None:
+            thumbnail_name = f'{base_name}_thumb.jpg'
+            with open(os.path.join(self.output_dir, thumbnail_name), 'wb') as f:
+                f.write(encoded['thumbnail'])
+        entry = {
+            'crop': crop_name,
+            'thumbnail': thumbnail_name,
+            'frame_index': frame_index,
+            'track_id': track_id,
+            'label': label,
+            'confidence': round(float(confidence), 4),
+            'bbox': [round(float(v), 4) for v in bbox],
+        }
+        if crop_name in self.index:
+            self.index[crop_name] = entry
+            self._write_index()
+        else:
+            self.index[crop_name] = entry
+            with open(self.index_path, 'a') as f:
+                f.write(json.dumps(entry) + '\n')
+        self.written_count += 1
+        return crop_name
+
+    def _write_index(self):
+        # Only needed when a crop is refreshed. Rewritten through a temp file so the index on disk is always complete
+        tmp_path = f'{self.index_path}.tmp'
+        with open(tmp_path, 'w') as f:
+            for entry in self.index.values():
+                f.write(json.dumps(entry) + '\n')
+        os.replace(tmp_path, self.index_path)
+
+    def save(self, frame, frame_index, track_id, label, confidence, bbox):
+        """
+        Encodes and writes a detection in one step.
+        """
+        return self.write(self.encode(frame, bbox), frame_index, track_id, label, confidence, bbox)
@@ -0,0 +1,307 @@
+import os
+import threading
+import time
+import gi
+gi.require_version('Gst', '1.0')
+from gi.repository import Gst
+from hailo_apps_infra.startup_profile import lazy_import
+from hailo_apps_infra.pipeline_metrics import add_entered, pop_entered
+
+# -----------------------------------------------------------------------------------------------
+# Frame gating
+# -----------------------------------------------------------------------------------------------
+# Gates decide per frame, before the inference wrapper, whether a frame goes through inference.
+# Gates are attached with a buffer probe on the sink pad of the inference wrapper input queue.
+# A frame that should skip inference is tagged with a SKIP_INFERENCE_TYPE classification on its main ROI. The wrapper
+# hailocropper then uses the gated cropping function (GATED_CROP_SO, built from cpp/gated_crops.cpp), which returns
+# no crop for tagged frames: they only take the wrapper bypass branch, so hailonet is skipped but the frame keeps its
+# place in the stream and still reaches the tracker, the callback, the display and the recordings.
+# Without GATED_CROP_SO the gates are created with drop=True and drop the frame instead: it then skips the tracker,
+# the callback and the outputs as well.
+# InferenceBypass re-attaches the last inferred detections (moved along their velocity on rate-limited frames) to these
+# frames before the tracker, and removes the tag before the callback.
+
+# Classification type of the tag, must match SKIP_INFERENCE_TYPE in cpp/gated_crops.cpp
+SKIP_INFERENCE_TYPE = 'inference_skipped'
+# Tag labels: the reason a frame skipped inference
+RATE_LIMITED = 'rate_limited'
+STATIC_SCENE = 'static_scene'
+
+# Cropping function returning no crop for tagged frames (see cpp/meson.build)
+GATED_CROP_SO = os.path.join(os.path.dirname(os.path.abspath(__file__)), '../resources/libgated_crops.so')
+
+def get_gate_pads(pipeline, entry_name='inference_wrapper_input_q', exit_names=('identity_callback', 'hailo_display')):
+    """
+    Returns (entry sink pad, exit sink pad) used by the gates, or (None, None) if the elements are missing.
+    The exit pad is the first element of exit_names found in the pipeline.
+    """
+    entry = pipeline.get_by_name(entry_name)
+    exit_element = next((e for e in (pipeline.get_by_name(n) for n in exit_names) if e is not None), None)
+    if entry is None or exit_element is None:
+        return None, None
+    return entry.get_static_pad('sink'), exit_element.get_static_pad('sink')
+
+def get_skip_tag(roi):
+    """
+    Returns the SKIP_INFERENCE_TYPE classification of a main ROI, or None if the frame goes through inference.
+    """
+    hailo = lazy_import('hailo')
+    for classification in roi.get_objects_typed(hailo.HAILO_CLASSIFICATION):
+        if classification.get_classification_type() == SKIP_INFERENCE_TYPE:
+            return classification
+    return None
+
+def skip_inference(buffer, reason):
+    """
+    Tags the frame so the gated cropping function sends it around hailonet. Returns False if it is already tagged.
+    """
+    hailo = lazy_import('hailo')
+    roi = hailo.get_roi_from_buffer(buffer)
+    if get_skip_tag(roi) is not None:
+        return False
+    roi.add_object(hailo.HailoClassification(SKIP_INFERENCE_TYPE, reason, 1.0))
+    return True
+
+def get_thumbnail(frame, thumbnail_width=64):
+    """
+    Returns a small int16 thumbnail of an RGB or BGR frame: a strided subsample of the green channel
+    (the same for both channel orders). Only the subsampled pixels are copied.
+    """
+    step = max(frame.shape[1] // thumbnail_width, 1)
+    return frame[::step, ::step, 1].astype('int16')
+
+def get_changed_fraction(thumbnail, reference, pixel_threshold=20):
+    """
+    Returns the fraction of thumbnail pixels that changed by more than pixel_threshold levels,
+    or 1.0 when there is no comparable reference.
+    """
+    if reference is None or reference.shape != thumbnail.shape:
+        return 1.0
+    return float((abs(thumbnail - reference) > pixel_threshold).mean())
+
+
+class AdaptiveRateController:
+    """
+    Admits at most target_fps frames per second into inference and lowers the admitted rate while the measured
+    latency from the inference entry to the callback exceeds latency_budget_ms (AIMD: multiplicative decrease,
+    additive increase back to target_fps once the latency recovers).
+
+    Frames over the admitted rate skip only inference (see skip_inference): they still reach the tracker, the callback
+    and the outputs, and InferenceBypass fills their boxes from the tracker (see tracking.TrackInterpolator).
+    Frames already skipped by another gate (e.g. MotionGate) do not consume the frame budget.
+    With drop=True (no gated cropping function) the frames over the admitted rate are dropped instead.
+    """
+    def __init__(self, target_fps, min_fps=1.0, latency_budget_ms=None, smoothing=0.1, drop=False):
+        self.target_fps = target_fps
+        self.min_fps = min(min_fps, target_fps)
+        self.latency_budget = (latency_budget_ms if latency_budget_ms else 3000.0 / target_fps) / 1000.0
+        self.smoothing = smoothing
+        self.drop = drop
+        self.admit_fps = target_fps
+        self.latency = 0.0
+        self.last_admit = None
+        self.entered = {}
+        self.passed = 0
+        self.skipped = 0
+        self.lock = threading.Lock()
+
+    def attach(self, pipeline):
+        entry_pad, exit_pad = get_gate_pads(pipeline)
+        if entry_pad is None:
+            print("Warning: inference wrapper or callback element not found, the rate controller is disabled.")
+            return False
+        entry_pad.add_probe(Gst.PadProbeType.BUFFER, self.on_entry)
+        exit_pad.add_probe(Gst.PadProbeType.BUFFER, self.on_exit)
+        return True
+
+    def on_entry(self, pad, info):
+        buffer = info.get_buffer()
+        hailo = lazy_import('hailo')
+        if get_skip_tag(hailo.get_roi_from_buffer(buffer)) is not None:
+            return Gst.PadProbeReturn.OK
+        now = time.perf_counter()
+        if self.last_admit is not None and now - self.last_admit < 1.0 / self.admit_fps:
+            self.skipped += 1
+            if self.drop:
+                return Gst.PadProbeReturn.DROP
+            skip_inference(buffer, RATE_LIMITED)
+            return Gst.PadProbeReturn.OK
+        self.last_admit = now
+        with self.lock:
+            add_entered(self.entered, buffer.pts, now)
+        self.passed += 1
+        return Gst.PadProbeReturn.OK
+
+    def on_exit(self, pad, info):
+        with self.lock:
+            start = pop_entered(self.entered, info.get_buffer().pts)
+        if start is None:
+            return Gst.PadProbeReturn.OK
+        latency = time.perf_counter() - start
+        self.latency += self.smoothing * (latency - self.latency)
+        if self.latency > self.latency_budget:
+            self.admit_fps = max(self.min_fps, self.admit_fps * 0.9)
+        else:
+            self.admit_fps = min(self.target_fps, self.admit_fps + 0.5)
+        return Gst.PadProbeReturn.OK
+
+    def report(self):
+        total = max(self.passed + self.skipped, 1)
+        return [
+            "Adaptive rate controller:",
+            f"  target fps {self.target_fps:.1f}, admitted fps {self.admit_fps:.1f}, "
+            f"latency {1000 * self.latency:.1f} ms (budget {1000 * self.latency_budget:.1f} ms)",
+            f"  inferred {self.passed}, skipped {self.skipped} ({100 * self.skipped / total:.1f}%)",
+        ]
+
+
+class MotionGate:
+    """
+    Skips inference while the scene is static: every frame entering the inference wrapper is reduced to a small
+    thumbnail (a strided view of the mapped buffer, one colour channel) and compared to the thumbnail of the last
+    admitted frame. Frames where less than motion_threshold of the thumbnail pixels changed by more than
+    pixel_threshold levels skip hailonet (see skip_inference); InferenceBypass re-attaches the detections of the last
+    inferred frame, so the display, the recordings and the callback keep running with unchanged boxes.
+    A frame is admitted at least every max_skip_seconds so slow changes (lighting, drift) are still picked up.
+    With drop=True (no gated cropping function) static frames are dropped instead, so the outputs freeze.
+
+    Hits are skipped (unchanged) frames, misses are admitted frames.
+    """
+    def __init__(self, motion_threshold=0.01, pixel_threshold=20, max_skip_seconds=2.0, thumbnail_width=64, drop=False):
+        self.motion_threshold = motion_threshold
+        self.pixel_threshold = pixel_threshold
+        self.max_skip_seconds = max_skip_seconds
+        self.thumbnail_width = thumbnail_width
+        self.drop = drop
+        self.reference = None
+        self.last_admit = None
+        self.hits = 0
+        self.misses = 0
+        self.forced = 0
+
+    def attach(self, pipeline):
+        entry_pad, _ = get_gate_pads(pipeline)
+        if entry_pad is None:
+            print("Warning: inference wrapper not found, the motion gate is disabled.")
+            return False
+        entry_pad.add_probe(Gst.PadProbeType.BUFFER, self.on_entry)
+        return True
+
+    def get_thumbnail(self, pad, buffer):
+        np = lazy_import('numpy')
+        structure = pad.get_current_caps().get_structure(0)
+        video_format = structure.get_value('format')
+        if video_format not in ('RGB', 'BGR'):
+            return None
+        width, height = structure.get_value('width'), structure.get_value('height')
+        success, map_info = buffer.map(Gst.MapFlags.READ)
+        if not success:
+            return None
+        try:
+            return get_thumbnail(np.ndarray(shape=(height, width, 3), dtype=np.uint8, buffer=map_info.data), self.thumbnail_width)
+        finally:
+            buffer.unmap(map_info)
+
+    def on_entry(self, pad, info):
+        buffer = info.get_buffer()
+        thumbnail = self.get_thumbnail(pad, buffer)
+        if thumbnail is None:
+            return Gst.PadProbeReturn.OK
+        now = time.perf_counter()
+        if self.reference is not None:
+            if get_changed_fraction(thumbnail, self.reference, self.pixel_threshold) < self.motion_threshold:
+                if now - self.last_admit < self.max_skip_seconds:
+                    self.hits += 1
+                    if self.drop:
+                        return Gst.PadProbeReturn.DROP
+                    skip_inference(buffer, STATIC_SCENE)
+                    return Gst.PadProbeReturn.OK
+                self.forced += 1
+        self.reference = thumbnail
+        self.last_admit = now
+        self.misses += 1
+        return Gst.PadProbeReturn.OK
+
+    def report(self):
+        total = max(self.hits + self.misses, 1)
+        return [
+            "Motion gate:",
+            f"  skipped (static) {self.hits} ({100 * self.hits / total:.1f}%), inferred {self.misses} "
+            f"(of which {self.forced} forced refreshes)",
+        ]
+
+
+class InferenceBypass:
+    """
+    Completes the frames a gate sent around hailonet (see skip_inference):
+    - after the inference wrapper, before the tracker, the detections of the last inferred frame of the same stream
+      are re-attached, so the tracker keeps its tracks and the outputs keep showing the boxes. On rate-limited frames
+      the boxes are moved on by their velocity over the last two inferred frames (tracking.TrackInterpolator, with
+      detections matched by IoU since they have no track id yet), so the tracker is updated with moving boxes;
+      on static scenes they are kept where they were;
+    - before the callback the tag is removed, so the callback and hailooverlay see a normal frame.
+    """
+    def __init__(self):
+        # tracking loads hailo and numpy, recording imports this module only for the thumbnail helpers
+        self.tracking = lazy_import('hailo_apps_infra.tracking')
+        self.last_detections = {}
+        self.interpolators = {}
+        self.frame_index = {}
+        self.reused = 0
+        self.interpolated = 0
+
+    def attach(self, pipeline, name='inference_wrapper'):
+        # The wrapper output queue src pad comes after the --roi-file probe mapping the new detections to the frame
+        output_queue = pipeline.get_by_name(f'{name}_output_q')
+        _, exit_pad = get_gate_pads(pipeline)
+        if output_queue is None or exit_pad is None:
+            print(f"Warning: {name}_output_q or callback element not found, skipped frames get no detections.")
+            return False
+        output_queue.get_static_pad('src').add_probe(Gst.PadProbeType.BUFFER, self.on_output)
+        exit_pad.add_probe(Gst.PadProbeType.BUFFER, self.on_exit)
+        return True
+
+    def on_output(self, pad, info):
+        hailo = lazy_import('hailo')
+        roi = hailo.get_roi_from_buffer(info.get_buffer())
+        stream_id = roi.get_stream_id()
+        frame_index = self.frame_index.get(stream_id, 0) + 1
+        self.frame_index[stream_id] = frame_index
+        interpolator = self.interpolators.setdefault(stream_id, self.tracking.TrackInterpolator())
+        tag = get_skip_tag(roi)
+        if tag is None:
+            detections = [
+                (d.get_class_id(), d.get_label(), d.get_confidence(), d.get_bbox())
+                for d in roi.get_objects_typed(hailo.HAILO_DETECTION)
+            ]
+            boxes = [(bbox.xmin(), bbox.ymin(), bbox.width(), bbox.height()) for _, _, _, bbox in detections]
+            track_ids = interpolator.match([(label, box) for (_, label, _, _), box in zip(detections, boxes)])
+            interpolator.update(frame_index, dict(zip(track_ids, boxes)))
+            self.last_detections[stream_id] = [
+                (track_id, class_id, label, confidence, box)
+                for track_id, (class_id, label, confidence, _), box in zip(track_ids, detections, boxes)
+            ]
+            return Gst.PadProbeReturn.OK
+        rate_limited = tag.get_label() == RATE_LIMITED
+        for track_id, class_id, label, confidence, box in self.last_detections.get(stream_id, []):
+            if rate_limited:
+                box = interpolator.predict(frame_index, track_id) or box
+            roi.add_object(hailo.HailoDetection(hailo.HailoBBox(*box), class_id, label, confidence))
+        self.reused += 1
+        if rate_limited:
+            self.interpolated += 1
+        return Gst.PadProbeReturn.OK
+
+    def on_exit(self, pad, info):
+        hailo = lazy_import('hailo')
+        roi = hailo.get_roi_from_buffer(info.get_buffer())
+        tag = get_skip_tag(roi)
+        if tag is not None:
+            roi.remove_object(tag)
+        return Gst.PadProbeReturn.OK
+
+    def report(self):
+        return [
+            "Inference bypass:",
+            f"  frames with reused detections {self.reused}, of which interpolated {self.interpolated}",
+        ]
@@ -1,21 +1,36 @@
 import multiprocessing
-import setproctitle
 import signal
 import os
-import gi
 import threading
 import sys
-import cv2
-import numpy as np
 import time
-gi.require_version('Gst', '1.0')
-from gi.repository import Gst, GLib, GObject
-from hailo_apps_infra.gstreamer_helper_pipelines import get_source_type
-import pyautogui
-try:
-    from picamera2 import Picamera2
-except ImportError:
-    pass # Available only on Pi OS
+import fnmatch
+from hailo_apps_infra.startup_profile import STARTUP_PROFILE, lazy_import
+with STARTUP_PROFILE.section('import gi / Gst'):
+    import gi
+    gi.require_version('Gst', '1.0')
+    from gi.repository import Gst, GLib, GObject
+# Imported after gi so the 'import gi / Gst' section above measures the GStreamer import cost.
+# Only the modules every run needs are imported here. The optional features (recording, queue_tuning, frame_gating,
+# roi, the conversion planner) are loaded with lazy_import when their command line option is used, autotune when the
+# app applies its inference tuning.
+from hailo_apps_infra.pipeline_metrics import ElementTimer, QosCounters, QueueMonitor
+from hailo_apps_infra.pipeline_model import PipelineDescription
+from hailo_apps_infra.pipeline_planner import PipelinePlan
+from hailo_apps_infra.gstreamer_helper_pipelines import (
+    get_source_type,
+    DISPLAY_PIPELINE,
+    HEADLESS_PIPELINE,
+    FILE_SINK_PIPELINE,
+    SEGMENTED_FILE_SINK_PIPELINE,
+    NETWORK_PREVIEW_PIPELINE,
+    JPEG_SNAPSHOT_PIPELINE,
+    MULTI_OUTPUT_PIPELINE,
+    ENCODER_PROFILES,
+    DECODE_CHAINS,
+    HARDWARE_DECODERS,
+)
+# cv2, numpy, setproctitle and picamera2 are imported lazily (see lazy_import) on the code paths that use them
 
 # -----------------------------------------------------------------------------------------------
 # User-defined class to be used in the callback function
@@ -31,6 +46,12 @@ class app_callback_class:
         self.use_frame = False
         self.frame_queue = multiprocessing.Queue(maxsize=3)
         self.running = True
+        # Set by the app when pre-event recording is enabled (see recording.EventRecorder)
+        self.event_recorder = None
+        # Set by the app when --target-fps is used (see frame_gating.AdaptiveRateController)
+        self.rate_controller = None
+        # Set by the app when --motion-gate is used (see frame_gating.MotionGate)
+        self.motion_gate = None
 
     def increment(self):
         self.frame_count += 1
@@ -68,10 +89,11 @@ def dummy_callback(pad, info, user_data):
 class GStreamerApp:
     def __init__(self, args, user_data: app_callback_class):
         # Set the process title
-        setproctitle.setproctitle("Hailo Python App")
+        lazy_import('setproctitle').setproctitle("Hailo Python App")
 
         # Create options menu
         self.options_menu = args
+        self.startup_profile = getattr(args, 'startup_profile', False)
 
         # Set up signal handler for SIGINT (Ctrl-C)
         signal.signal(signal.SIGINT, self.shutdown)
@@ -87,11 +109,23 @@ class GStreamerApp:
         self.source_type = get_source_type(self.video_source)
         self.user_data = user_data
         self.video_sink = "autovideosink"
+        # fpsdisplaysink elements reporting FPS, one per output stream
+        self.display_names = ["hailo_display"]
         self.pipeline = None
         self.loop = None
         self.threads = []
         self.error_occurred = False
         self.pipeline_latency = 300  # milliseconds
+        self.segment_manifest = None
+        # Metric collectors (see pipeline_metrics), reported at shutdown and every --metrics-interval seconds
+        self.metrics = []
+        # QoS messages from the elements allowed to drop late buffers (--qos-allow)
+        self.qos_counters = QosCounters()
+        self.metrics.append(self.qos_counters)
+        # When recording, shutdown first sends EOS so the muxers can finalize the files
+        self.finalize_on_shutdown = False
+        self.eos_sent = False
+        self.shutdown_complete = False
 
         # Set Hailo parameters; these parameters should be set based on the model used
         #screen_width, screen_height =pyautogui.size()#-----------------------------------------------------------------------------------------------------------------
@@ -100,19 +134,55 @@ class GStreamerApp:
         #window_width = int(screen_width * 8//10)
         #window_height = int(screen_height - 80)
         self.batch_size = 1
+        self.scheduler_timeout_ms = None
+        self.scheduler_priority = None
+        # Set multi_process_service when several processes share the device (hailort service must be running)
+        self.multi_process_service = None
+        self.vdevice_group_id = 1
         #self.video_width = {window_width}
         #self.video_height = {window_height}
         self.video_width = 640
         self.video_height = 480
         self.video_format = "RGB"
+        # Picamera2 stream pushed into the pipeline: 'lores' (video_width x video_height next to a 1280x720 main stream)
+        # or 'main' to feed full-resolution frames at video_width x video_height (e.g. for tiled inference)
+        self.picamera_stream = "lores"
         self.hef_path = None
         self.app_callback = None
+        # Tiled inference grid, set by apps supporting --tiles
+        self.tiles = None
+        # SOURCE_PIPELINE / INFERENCE_PIPELINE arguments, reduced by --optimize-conversions
+        self.pipeline_plan = PipelinePlan()
+        # Queue fill-level sampling for --queue-telemetry / --tune-queues
+        self.queue_monitor = None
+        # Static inference ROI (--roi-file)
+        self.inference_roi = None
+        roi_file = getattr(self.options_menu, 'roi_file', None)
+        if roi_file:
+            self.inference_roi = lazy_import('hailo_apps_infra.roi').load_roi(roi_file)
+        # Frame gates send skipped frames through the wrapper bypass, which needs the gated cropping function.
+        # Without it they fall back to dropping the skipped frames before the inference wrapper.
+        self.inference_crop_so = None
+        if getattr(self.options_menu, 'target_fps', 0) or getattr(self.options_menu, 'motion_gate', False):
+            gated_crop_so = lazy_import('hailo_apps_infra.frame_gating').GATED_CROP_SO
+            if os.path.exists(gated_crop_so):
+                self.inference_crop_so = gated_crop_so
+            else:
+                print(f"Warning: {gated_crop_so} not found, frames skipping inference are dropped and do not reach the "
+                      "callback or the outputs. Build it with: meson setup build.release cpp && ninja -C build.release install")
 
         # Set user data parameters
         user_data.use_frame = self.options_menu.use_frame
 
         self.sync = "false" if (self.options_menu.disable_sync or self.source_type != "file") else "true"
         self.show_fps = self.options_menu.show_fps
+        # Initialize GStreamer once, the element lookups (decode chain, encoder profile, validation) need the registry
+        with STARTUP_PROFILE.section('Gst.init'):
+            Gst.init(None)
+        self.decode_chain = select_decode_chain(getattr(self.options_menu, 'decode_chain', 'separate'))
+        self.headless = getattr(self.options_menu, 'headless', False)
+        if self.headless:
+            self.video_sink = "fakesink"
 
         if self.options_menu.dump_dot:
             os.environ["GST_DEBUG_DUMP_DOT_DIR"] = os.getcwd()
@@ -122,12 +192,38 @@ class GStreamerApp:
         return True
 
     def create_pipeline(self):
-        # Initialize GStreamer
-        Gst.init(None)
-
-        pipeline_string = self.get_pipeline_string()
+        if getattr(self.options_menu, 'optimize_conversions', False):
+            with STARTUP_PROFILE.section('plan_conversions'):
+                self.pipeline_plan = self.plan_conversions()
+            print("\n".join(self.pipeline_plan.report()))
+
+        with STARTUP_PROFILE.section('get_pipeline_description'):
+            self.pipeline_description = self.get_pipeline_description()
+        pipeline_file = getattr(self.options_menu, 'pipeline_file', None)
+        if pipeline_file:
+            deployed = PipelineDescription.load(pipeline_file)
+            print(f"Using the pipeline from {pipeline_file}, differences to the generated pipeline:")
+            print("\n".join(self.pipeline_description.diff(deployed)) or "  none")
+            self.pipeline_description = deployed
+        queue_config = getattr(self.options_menu, 'queue_config', None)
+        if queue_config:
+            queue_tuning = lazy_import('hailo_apps_infra.queue_tuning')
+            for pattern in queue_tuning.apply_queue_config(self.pipeline_description, queue_tuning.load_queue_config(queue_config)):
+                print(f"Warning: {queue_config}: no queue matches '{pattern}'")
+        save_pipeline = getattr(self.options_menu, 'save_pipeline', None)
+        if save_pipeline:
+            self.pipeline_description.save(save_pipeline)
+            print(f"Pipeline description saved to {save_pipeline}")
+        for problem in self.pipeline_description.validate(element_available):
+            print(f"Pipeline warning: {problem}", file=sys.stderr)
+        pipeline_string = self.pipeline_description.to_string()
+        if getattr(self.options_menu, 'print_pipeline', False):
+            print(self.pipeline_description.pretty())
+        else:
+            print(pipeline_string)
         try:
-            self.pipeline = Gst.parse_launch(pipeline_string)
+            with STARTUP_PROFILE.section('Gst.parse_launch'):
+                self.pipeline = Gst.parse_launch(pipeline_string)
         except Exception as e:
             print(f"Error creating pipeline: {e}", file=sys.stderr)
             sys.exit(1)
@@ -135,7 +231,10 @@ class GStreamerApp:
         # Connect to hailo_display fps-measurements
         if self.show_fps:
             print("Showing FPS")
-            self.pipeline.get_by_name("hailo_display").connect("fps-measurements", self.on_fps_measurement)
+            for display_name in self.display_names:
+                display = self.pipeline.get_by_name(display_name)
+                if display is not None:
+                    display.connect("fps-measurements", self.on_fps_measurement)
 
         # Create a GLib Main Loop
         self.loop = GLib.MainLoop()
@@ -150,15 +249,19 @@ class GStreamerApp:
             print(f"Error: {err}, {debug}", file=sys.stderr)
             self.error_occurred = True
             self.shutdown()
+        elif t == Gst.MessageType.ELEMENT:
+            structure = message.get_structure()
+            if self.segment_manifest is not None and structure is not None:
+                self.segment_manifest.on_element_message(structure)
         # QOS
         elif t == Gst.MessageType.QOS:
-            # Handle QoS message here
-            qos_element = message.src.get_name()
-            print(f"QoS message received from {qos_element}")
+            self.qos_counters.on_message(message)
         return True
 
 
     def on_eos(self):
+        # All branches are drained at this point, recordings are already finalized
+        self.eos_sent = True
         self.shutdown()
         #if self.source_type == "file":
              # Seek to the start (position 0) in nanoseconds
@@ -172,8 +275,17 @@ class GStreamerApp:
 
 
     def shutdown(self, signum=None, frame=None):
+        if self.shutdown_complete:
+            return False
         print("Shutting down... Hit Ctrl-C again to force quit.")
         signal.signal(signal.SIGINT, signal.SIG_DFL)
+        if self.finalize_on_shutdown and not self.eos_sent and not self.error_occurred:
+            # Let the recording branches finalize their files; on_eos calls shutdown again
+            self.eos_sent = True
+            self.pipeline.send_event(Gst.Event.new_eos())
+            GLib.timeout_add_seconds(3, self.shutdown)
+            return False
+        self.shutdown_complete = True
         self.pipeline.set_state(Gst.State.PAUSED)
         GLib.usleep(100000)  # 0.1 second delay
 
@@ -182,12 +294,192 @@ class GStreamerApp:
 
         self.pipeline.set_state(Gst.State.NULL)
         GLib.idle_add(self.loop.quit)
+        return False
 
 
     def get_pipeline_string(self):
         # This is a placeholder function that should be overridden by the child class
         return ""
 
+    def get_pipeline_description(self):
+        # Returns the pipeline stages, apps building their pipeline as a single string get it as one stage
+        return PipelineDescription().add('pipeline', self.get_pipeline_string())
+
+    def get_inference_pipeline(self):
+        # Returns the inference part of the pipeline (used by --auto-tune), should be overridden by the child class
+        return ""
+
+    def plan_conversions(self):
+        # Returns the PipelinePlan for --optimize-conversions, apps use its source_args / inference_args
+        return lazy_import('hailo_apps_infra.pipeline_planner').plan_conversions(
+            self.video_source,
+            self.hef_path,
+            self.video_width,
+            self.video_height,
+            self.video_format,
+            resized_by_cropper=not self.tiles,
+        )
+
+    def apply_inference_tuning(self):
+        # Sets batch size and scheduler parameters: command line > persisted --auto-tune result > app defaults.
+        # Must be called once self.hef_path is known.
+        # With --tiles the batch size stays one batch per frame (all tiles) and only the scheduler is tuned, under a
+        # tuning key of its own, so tiled and untiled runs of the same HEF do not share a configuration.
+        autotune = lazy_import('hailo_apps_infra.autotune')
+        tuning_file = getattr(self.options_menu, 'tuning_file', None) or autotune.DEFAULT_TUNING_FILE
+        variant = f'tiles={self.tiles[0]}x{self.tiles[1]}' if self.tiles else None
+        if getattr(self.options_menu, 'auto_tune', False):
+            replay_source = self.video_source if self.source_type == 'file' else os.path.join(self.current_path, '../resources/example.mp4')
+            if self.tiles:
+                best = autotune.run_auto_tune(self, replay_source, batch_sizes=[self.batch_size])
+            else:
+                best = autotune.run_auto_tune(self, replay_source)
+            autotune.save_tuned_config(self.hef_path, best, tuning_file, variant)
+        tuned = autotune.load_tuned_config(self.hef_path, tuning_file, variant)
+        if tuned is not None:
+            print(f"Using tuned inference configuration: batch-size={tuned['batch_size']} "
+                  f"scheduler-timeout-ms={tuned['scheduler_timeout_ms']} ({tuned.get('fps')} FPS when tuned)")
+            if not self.tiles:
+                self.batch_size = tuned['batch_size']
+            self.scheduler_timeout_ms = tuned['scheduler_timeout_ms']
+            self.scheduler_priority = tuned.get('scheduler_priority')
+        if getattr(self.options_menu, 'batch_size', None) is not None:
+            self.batch_size = self.options_menu.batch_size
+        if getattr(self.options_menu, 'scheduler_timeout_ms', None) is not None:
+            self.scheduler_timeout_ms = self.options_menu.scheduler_timeout_ms
+        if getattr(self.options_menu, 'scheduler_priority', None) is not None:
+            self.scheduler_priority = self.options_menu.scheduler_priority
+
+    def get_display_pipeline(self):
+        # Returns the output branch of the pipeline: a window, or a measurement-only sink when running headless.
+        # Additional outputs requested on the command line are attached to a tee on their own leaky queues.
+        if self.headless:
+            display_pipeline = HEADLESS_PIPELINE(
+                sync=self.sync,
+                preview_fps=self.options_menu.preview_fps,
+                preview_location=self.options_menu.preview_path,
+            )
+        else:
+            display_pipeline = DISPLAY_PIPELINE(video_sink=self.video_sink, sync=self.sync, show_fps=self.show_fps)
+
+        extra_outputs = self.get_extra_output_pipelines()
+        if not extra_outputs:
+            return display_pipeline
+        # The display keeps a blocking queue since it paces the pipeline when sync is enabled
+        return MULTI_OUTPUT_PIPELINE([(display_pipeline, {'leaky': 'no'})] + extra_outputs)
+
+    def get_extra_output_pipelines(self):
+        extra_outputs = []
+        record_file = getattr(self.options_menu, 'record_file', None)
+        if record_file or getattr(self.options_menu, 'record_dir', None):
+            self.finalize_on_shutdown = True
+        if record_file:
+            extra_outputs.append(FILE_SINK_PIPELINE(
+                output_file=record_file,
+                bitrate=self.options_menu.record_bitrate,
+                encoder_profile=select_encoder_profile(self.options_menu.encoder_profile),
+            ))
+        record_dir = getattr(self.options_menu, 'record_dir', None)
+        if record_dir:
+            self.segment_manifest = lazy_import('hailo_apps_infra.recording').SegmentManifest(record_dir, segment_seconds=self.options_menu.segment_seconds)
+            extra_outputs.append(SEGMENTED_FILE_SINK_PIPELINE(
+                output_dir=record_dir,
+                segment_seconds=self.options_menu.segment_seconds,
+                max_segments=self.options_menu.max_segments,
+                bitrate=self.options_menu.record_bitrate,
+                encoder_profile=select_encoder_profile(self.options_menu.encoder_profile),
+            ))
+        udp_preview = getattr(self.options_menu, 'udp_preview', None)
+        if udp_preview:
+            host, port = udp_preview.rsplit(':', 1)
+            extra_outputs.append(NETWORK_PREVIEW_PIPELINE(host=host, port=int(port)))
+        snapshot_dir = getattr(self.options_menu, 'snapshot_dir', None)
+        if snapshot_dir:
+            os.makedirs(snapshot_dir, exist_ok=True)
+            extra_outputs.append(JPEG_SNAPSHOT_PIPELINE(
+                location=os.path.join(snapshot_dir, 'snapshot_%05d.jpg'),
+                snapshot_fps=self.options_menu.snapshot_fps,
+            ))
+        return extra_outputs
+
+    def on_first_buffer(self, pad, info):
+        # One-shot probe used by --startup-profile to measure time to the first processed frame
+        STARTUP_PROFILE.mark('first buffer')
+        GLib.idle_add(self.print_startup_profile)
+        return Gst.PadProbeReturn.REMOVE
+
+    def print_startup_profile(self):
+        STARTUP_PROFILE.report()
+        return False
+
+    def setup_metrics(self):
+        # Attach the metric collectors and frame gates requested on the command line
+        if getattr(self.options_menu, 'tracker_stats', False):
+            tracker = self.pipeline.get_by_name("hailo_tracker")
+            if tracker is None:
+                print("Warning: hailo_tracker element not found, --tracker-stats is ignored.")
+            else:
+                self.metrics.append(ElementTimer(tracker))
+        target_fps = getattr(self.options_menu, 'target_fps', 0)
+        if target_fps or getattr(self.options_menu, 'motion_gate', False):
+            frame_gating = lazy_import('hailo_apps_infra.frame_gating')
+            # Without the gated cropping function the gates drop the frames instead of tagging them
+            drop = self.inference_crop_so is None
+        if getattr(self.options_menu, 'motion_gate', False):
+            # Attached before the rate controller so static frames do not consume its frame budget
+            motion_gate = frame_gating.MotionGate(
+                motion_threshold=self.options_menu.motion_threshold,
+                max_skip_seconds=self.options_menu.motion_max_skip_seconds,
+                drop=drop,
+            )
+            if motion_gate.attach(self.pipeline):
+                self.user_data.motion_gate = motion_gate
+                self.metrics.append(motion_gate)
+        if target_fps:
+            rate_controller = frame_gating.AdaptiveRateController(target_fps, latency_budget_ms=self.options_menu.latency_budget_ms, drop=drop)
+            if rate_controller.attach(self.pipeline):
+                self.user_data.rate_controller = rate_controller
+                self.metrics.append(rate_controller)
+        if self.inference_crop_so is not None:
+            inference_bypass = frame_gating.InferenceBypass()
+            if inference_bypass.attach(self.pipeline):
+                self.metrics.append(inference_bypass)
+        queue_telemetry = getattr(self.options_menu, 'queue_telemetry', None)
+        if queue_telemetry or getattr(self.options_menu, 'tune_queues', None):
+            frame_element = self.pipeline.get_by_name("identity_callback") or self.pipeline.get_by_name(self.display_names[0])
+            if frame_element is None:
+                print("Warning: identity_callback element not found, queue telemetry is disabled.")
+            else:
+                self.queue_monitor = QueueMonitor(self.pipeline, frame_element.get_static_pad("sink"), telemetry_path=queue_telemetry)
+                self.metrics.append(self.queue_monitor)
+        metrics_interval = getattr(self.options_menu, 'metrics_interval', 0)
+        if self.metrics and metrics_interval > 0:
+            GLib.timeout_add_seconds(metrics_interval, self.print_metrics)
+
+    def print_metrics(self):
+        for metric in self.metrics:
+            lines = metric.report()
+            if lines:
+                print("\n".join(lines))
+        return True
+
+    def save_queue_tuning(self):
+        if self.queue_monitor is None:
+            return
+        self.queue_monitor.close()
+        tune_queues = getattr(self.options_menu, 'tune_queues', None)
+        if not tune_queues:
+            return
+        stats = self.queue_monitor.stats
+        if not stats.samples:
+            print("No queue samples recorded, the queue config is not written.")
+            return
+        queue_tuning = lazy_import('hailo_apps_infra.queue_tuning')
+        config = queue_tuning.suggest_queue_config(stats, target_fps=getattr(self.options_menu, 'target_fps', 0))
+        print("\n".join(queue_tuning.format_queue_config_changes(stats, config)))
+        queue_tuning.save_queue_config(tune_queues, config)
+        print(f"Queue config saved to {tune_queues}, apply it with --queue-config {tune_queues}")
+
     def dump_dot_file(self):
         print("Dumping dot file...")
         Gst.debug_bin_to_dot_file(self.pipeline, Gst.DebugGraphDetails.ALL, "pipeline")
@@ -209,12 +501,17 @@ class GStreamerApp:
                 identity_pad = identity.get_static_pad("src")
                 identity_pad.add_probe(Gst.PadProbeType.BUFFER, self.app_callback, self.user_data)
 
-        hailo_display = self.pipeline.get_by_name("hailo_display")
+        hailo_display = self.pipeline.get_by_name(self.display_names[0])
         if hailo_display is None:
             print("Warning: hailo_display element not found, add <fpsdisplaysink name=hailo_display> to your pipeline to support fps display.")
 
-        # Disable QoS to prevent frame drops
-        disable_qos(self.pipeline)
+        # Disable QoS to prevent frame drops, except on the elements allowed to drop late buffers (e.g. the display)
+        apply_qos_policy(self.pipeline, getattr(self.options_menu, 'qos_allow', None) or [])
+
+        self.setup_metrics()
+
+        if self.inference_roi is not None:
+            self.inference_roi.attach(self.pipeline)
 
         # Start a subprocess to run the display_user_data_frame function
         if self.options_menu.use_frame:
@@ -222,19 +519,26 @@ class GStreamerApp:
             display_process.start()
 
         if self.source_type == "rpi":
-            picam_thread = threading.Thread(target=picamera_thread, args=(self.pipeline, self.video_width, self.video_height, self.video_format))
+            picam_thread = threading.Thread(target=picamera_thread, args=(self.pipeline, self.video_width, self.video_height, self.video_format, None, self.picamera_stream))
             self.threads.append(picam_thread)
             picam_thread.start()
 
+        if self.startup_profile:
+            first_buffer_element = self.pipeline.get_by_name("identity_callback") or hailo_display
+            if first_buffer_element is not None:
+                first_buffer_element.get_static_pad("sink").add_probe(Gst.PadProbeType.BUFFER, self.on_first_buffer)
+
         # Set the pipeline to PAUSED to ensure elements are initialized
-        self.pipeline.set_state(Gst.State.PAUSED)
+        with STARTUP_PROFILE.section('set_state PAUSED'):
+            self.pipeline.set_state(Gst.State.PAUSED)
 
         # Set pipeline latency
         new_latency = self.pipeline_latency * Gst.MSECOND  # Convert milliseconds to nanoseconds
         self.pipeline.set_latency(new_latency)
 
         # Set pipeline to PLAYING state
-        self.pipeline.set_state(Gst.State.PLAYING)
+        with STARTUP_PROFILE.section('set_state PLAYING'):
+            self.pipeline.set_state(Gst.State.PLAYING)
 
         # Dump dot file
         if self.options_menu.dump_dot:
@@ -247,6 +551,10 @@ class GStreamerApp:
         try:
             self.user_data.running = False
             self.pipeline.set_state(Gst.State.NULL)
+            self.print_metrics()
+            self.save_queue_tuning()
+            if self.user_data.event_recorder is not None:
+                self.user_data.event_recorder.close()
             if self.options_menu.use_frame:
                 display_process.terminate()
                 display_process.join()
@@ -262,7 +570,11 @@ class GStreamerApp:
                 print("Exiting...")
                 sys.exit(0)
 
-def picamera_thread(pipeline, video_width, video_height, video_format, picamera_config=None):
+def picamera_thread(pipeline, video_width, video_height, video_format, picamera_config=None, capture_stream='lores'):
+    # picamera2 is available only on Pi OS, so it is imported only when the rpi source is used
+    Picamera2 = lazy_import('picamera2').Picamera2
+    cv2 = lazy_import('cv2')
+    np = lazy_import('numpy')
     appsrc = pipeline.get_by_name("app_source")
     appsrc.set_property("is-live", True)
     appsrc.set_property("format", Gst.Format.TIME)
@@ -271,18 +583,22 @@ def picamera_thread(pipeline, video_width, video_height, video_format, picamera_
     with Picamera2() as picam2:
         if picamera_config is None:
             # Default configuration
-            main = {'size': (1280, 720), 'format': 'RGB888'}
-            lores = {'size': (video_width, video_height), 'format': 'RGB888'}
             controls = {'FrameRate': 30}
-            config = picam2.create_preview_configuration(main=main, lores=lores, controls=controls)
+            if capture_stream == 'main':
+                main = {'size': (video_width, video_height), 'format': 'RGB888'}
+                config = picam2.create_preview_configuration(main=main, controls=controls)
+            else:
+                main = {'size': (1280, 720), 'format': 'RGB888'}
+                lores = {'size': (video_width, video_height), 'format': 'RGB888'}
+                config = picam2.create_preview_configuration(main=main, lores=lores, controls=controls)
         else:
             config = picamera_config
         # Configure the camera with the created configuration
         picam2.configure(config)
-        # Update GStreamer caps based on 'lores' stream
-        lores_stream = config['lores']
-        format_str = 'RGB' if lores_stream['format'] == 'RGB888' else video_format
-        width, height = lores_stream['size']
+        # Update GStreamer caps based on the captured stream
+        stream_config = config[capture_stream]
+        format_str = 'RGB' if stream_config['format'] == 'RGB888' else video_format
+        width, height = stream_config['size']
         print(f"Picamera2 configuration: width={width}, height={height}, format={format_str}")
         appsrc.set_property(
             "caps",
@@ -296,7 +612,7 @@ def picamera_thread(pipeline, video_width, video_height, video_format, picamera_
         start_time = time.time()
         print("picamera_process started")
         while True:
-            frame_data = picam2.capture_array('lores')
+            frame_data = picam2.capture_array(capture_stream)
             # frame_data = np.random.randint(0, 255, (height, width, 3), dtype=np.uint8)
             if frame_data is None:
                 print("Failed to capture frame.")
@@ -317,6 +633,89 @@ def picamera_thread(pipeline, video_width, video_height, video_format, picamera_
                 break
             frame_count += 1
 
+def element_available(factory_name):
+    """
+    Returns True if the GStreamer element factory is installed on this machine. Gst.init() must have been called.
+    """
+    return Gst.ElementFactory.find(factory_name) is not None
+
+def select_encoder_profile(encoder_profile='auto', fallback='x264-zerolatency'):
+    """
+    Resolves an encoder profile name to one whose encoder element is installed.
+    'auto' prefers the hardware encoder and falls back to the cheapest software profile.
+
+    Args:
+        encoder_profile (str): A key of ENCODER_PROFILES or 'auto'.
+        fallback (str): The profile used when the requested encoder element is missing.
+
+    Returns:
+        str: The selected key of ENCODER_PROFILES.
+    """
+    if encoder_profile == 'auto':
+        candidates = ['v4l2-h264', 'x264-low-cpu', 'openh264', fallback]
+    else:
+        candidates = [encoder_profile, fallback]
+    for candidate in candidates:
+        if element_available(ENCODER_PROFILES[candidate]['element']):
+            if candidate != encoder_profile and encoder_profile != 'auto':
+                print(f"Encoder profile '{encoder_profile}' is not available on this machine, using '{candidate}'")
+            print(f"Using encoder profile: {candidate}")
+            return candidate
+    return fallback
+
+# Ranks of the hardware decoders before set_hardware_decoder_preference() changed them
+ORIGINAL_DECODER_RANKS = {}
+
+def set_hardware_decoder_preference(prefer_hardware):
+    """
+    Raises the rank of the installed V4L2 hardware decoders above the software decoders so decodebin picks them
+    (or restores their original rank). Gst.init() must have been called.
+
+    Returns:
+        list: The hardware decoders found on this machine.
+    """
+    registry = Gst.Registry.get()
+    found = []
+    for factory_name in HARDWARE_DECODERS:
+        feature = registry.lookup_feature(factory_name)
+        if feature is None:
+            continue
+        found.append(factory_name)
+        original_rank = ORIGINAL_DECODER_RANKS.setdefault(factory_name, feature.get_rank())
+        feature.set_rank(Gst.Rank.PRIMARY + 1 if prefer_hardware else original_rank)
+    return found
+
+def decode_chain_available(decode_chain):
+    """
+    Returns True if every element of the decode chain (and a hardware decoder if it needs one) is installed.
+    """
+    chain = DECODE_CHAINS[decode_chain]
+    if chain['hardware_decoders'] and not any(element_available(decoder) for decoder in HARDWARE_DECODERS):
+        return False
+    return all(element_available(element) for element in chain['elements'])
+
+def select_decode_chain(decode_chain='separate', fallback='separate'):
+    """
+    Resolves a decode chain name to one that is installed and applies its hardware decoder preference.
+    'auto' picks the first available chain of DECODE_CHAINS (hardware decode and single-pass convert first).
+
+    Args:
+        decode_chain (str): A key of DECODE_CHAINS or 'auto'.
+        fallback (str): The chain used when the requested one is not available.
+
+    Returns:
+        str: The selected key of DECODE_CHAINS.
+    """
+    candidates = list(DECODE_CHAINS) if decode_chain == 'auto' else [decode_chain, fallback]
+    selected = next((candidate for candidate in candidates if decode_chain_available(candidate)), fallback)
+    if selected != decode_chain and decode_chain != 'auto':
+        print(f"Decode chain '{decode_chain}' is not available on this machine, using '{selected}'")
+    hardware_decoders = set_hardware_decoder_preference(DECODE_CHAINS[selected]['hardware_decoders'])
+    decoders = f", preferring {', '.join(hardware_decoders)}" if DECODE_CHAINS[selected]['hardware_decoders'] else ''
+    convert = ' ! '.join(element.split()[0] for element in DECODE_CHAINS[selected]['convert'])
+    print(f"Using decode chain: {selected} (decodebin{decoders} ! {convert})")
+    return selected
+
 def disable_qos(pipeline):
     """
     Iterate through all elements in the given GStreamer pipeline and set the qos property to False
@@ -325,26 +724,46 @@ def disable_qos(pipeline):
     We are running on long pipelines, so we want to disable this feature to avoid dropping frames.
     :param pipeline: A GStreamer pipeline object
     """
-    # Ensure the pipeline is a Gst.Pipeline instance
+    apply_qos_policy(pipeline, [])
+
+def get_element_names(element):
+    # The element name and the names of the bins containing it, up to (not including) the pipeline
+    names = []
+    while element is not None and not isinstance(element, Gst.Pipeline):
+        names.append(element.get_name())
+        element = element.get_parent()
+    return names
+
+def apply_qos_policy(pipeline, allow_patterns):
+    """
+    Sets the qos property of every element in the pipeline (including elements inside bins such as fpsdisplaysink):
+    True for elements matching one of the allow patterns, False for all others (see disable_qos).
+    An element matches when its name or the name of a bin containing it matches a glob pattern, so 'hailo_display*'
+    lets the display branch drop late frames while the recording branches and the inference path never drop.
+
+    Args:
+        pipeline (Gst.Pipeline): The pipeline.
+        allow_patterns (list): Glob patterns of the element names allowed to drop late buffers.
+    """
     if not isinstance(pipeline, Gst.Pipeline):
         print("The provided object is not a GStreamer Pipeline")
         return
 
-    # Iterate through all elements in the pipeline
-    it = pipeline.iterate_elements()
+    it = pipeline.iterate_recurse()
     while True:
         result, element = it.next()
         if result != Gst.IteratorResult.OK:
             break
-
-        # Check if the element has the 'qos' property
-        if 'qos' in GObject.list_properties(element):
-            # Set the 'qos' property to False
-            element.set_property('qos', False)
-            print(f"Set qos to False for {element.get_name()}")
+        if 'qos' not in [prop.name for prop in GObject.list_properties(element)]:
+            continue
+        allowed = any(fnmatch.fnmatch(name, pattern) for name in get_element_names(element) for pattern in allow_patterns)
+        element.set_property('qos', allowed)
+        if allowed:
+            print(f"QoS enabled for {element.get_name()}")
 
 # This function is used to display the user data frame
 def display_user_data_frame(user_data: app_callback_class):
+    cv2 = lazy_import('cv2')
     while user_data.running:
         frame = user_data.get_frame()
         if frame is not None:
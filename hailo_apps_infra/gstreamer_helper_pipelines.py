@@ -1,5 +1,6 @@
 import os
-import pyautogui
+from hailo_apps_infra.startup_profile import lazy_import
+
 def get_source_type(input_source):
     # This function will return the source type based on the input source
     # return values can be "file", "mipi" or "usb"
@@ -45,7 +46,47 @@ def get_camera_resulotion(video_width=640, video_height=640):
         return 3840, 2160
 
 
-def SOURCE_PIPELINE(video_source, video_width=640, video_height=640, video_format='RGB', name='source', no_webcam_compression=False):
+# Decode / scale / convert chains used by SOURCE_PIPELINE, selectable with --decode-chain.
+# 'elements' are the GStreamer factories that must be installed for the chain to be usable.
+# 'hardware_decoders' chains raise the rank of the V4L2 hardware decoders (HARDWARE_DECODERS) so decodebin picks them
+# over the software decoders; at least one of them must be installed.
+# 'convert' are the element format strings (name, n_threads) run after the source, separated by queues.
+# videoconvertscale (GStreamer >= 1.22) scales and converts in a single pass over the frame.
+# 'separate' is the historical chain.
+HARDWARE_DECODERS = ['v4l2slh265dec', 'v4l2slh264dec', 'v4l2h265dec', 'v4l2h264dec']
+
+DECODE_CHAINS = {
+    'hw-convertscale': {
+        'elements': ['videoconvertscale'],
+        'hardware_decoders': True,
+        'convert': ['videoconvertscale name={name}_convert n-threads={convert_threads} qos=false'],
+    },
+    'hw-separate': {
+        'elements': ['videoscale', 'videoconvert'],
+        'hardware_decoders': True,
+        'convert': [
+            'videoscale name={name}_videoscale n-threads={scale_threads}',
+            'videoconvert n-threads={convert_threads} name={name}_convert qos=false',
+        ],
+    },
+    'convertscale': {
+        'elements': ['videoconvertscale'],
+        'hardware_decoders': False,
+        'convert': ['videoconvertscale name={name}_convert n-threads={convert_threads} qos=false'],
+    },
+    # The default chain, with the fixed thread counts SOURCE_PIPELINE always used
+    'separate': {
+        'elements': ['videoscale', 'videoconvert'],
+        'hardware_decoders': False,
+        'n_threads': (2, 3),
+        'convert': [
+            'videoscale name={name}_videoscale n-threads={scale_threads}',
+            'videoconvert n-threads={convert_threads} name={name}_convert qos=false',
+        ],
+    },
+}
+
+def SOURCE_PIPELINE(video_source, video_width=640, video_height=640, video_format='RGB', name='source', no_webcam_compression=False, decode_chain='separate', n_threads=None, scale=True, convert=True):
     """
     Creates a GStreamer pipeline string for the video source.
 
@@ -55,11 +96,21 @@ def SOURCE_PIPELINE(video_source, video_width=640, video_height=640, video_forma
         video_height (int, optional): The height of the video. Defaults to 640.
         video_format (str, optional): The video format. Defaults to 'RGB'.
         name (str, optional): The prefix name for the pipeline elements. Defaults to 'source'.
+        decode_chain (str, optional): A key of DECODE_CHAINS, resolve 'auto' with gstreamer_app.select_decode_chain().
+            Defaults to 'separate'.
+        n_threads (int, optional): Threads of the scale / convert elements. Defaults to the chain's fixed thread counts
+            (2 / 3 for 'separate'), or the number of CPUs, at most 4, for the other chains.
+        scale (bool, optional): False drops the scale step when the source already has the output size (see pipeline_planner). Defaults to True.
+        convert (bool, optional): False drops the convert step when the source already has the output format. Defaults to True.
 
     Returns:
         str: A string representing the GStreamer pipeline for the video source.
     """
     source_type = get_source_type(video_source)
+    if n_threads is not None:
+        scale_threads = convert_threads = n_threads
+    else:
+        scale_threads, convert_threads = DECODE_CHAINS[decode_chain].get('n_threads') or (min(os.cpu_count() or 1, 4),) * 2
 
     if source_type == 'usb':
         if no_webcam_compression:
@@ -67,7 +118,7 @@ def SOURCE_PIPELINE(video_source, video_width=640, video_height=640, video_forma
             source_element = (
                 f'v4l2src device={video_source} name={name} ! '
                 f'video/x-raw, format=RGB, width=640, height=480 ! '
-                'videoflip name=videoflip video-direction=horiz ! '
+                f'videoflip name={name}_videoflip video-direction=horiz ! '
             )
         else:
             # Use compressed format for webcam
@@ -76,7 +127,7 @@ def SOURCE_PIPELINE(video_source, video_width=640, video_height=640, video_forma
                 f'v4l2src device={video_source} name={name} ! image/jpeg, framerate=30/1, width={width}, height={height} ! '
                 f'{QUEUE(name=f"{name}_queue_decode")} ! '
                 f'decodebin name={name}_decodebin ! '
-                f'videoflip name=videoflip video-direction=horiz ! '
+                f'videoflip name={name}_videoflip video-direction=horiz ! '
             )
     elif source_type == 'rpi':
         source_element = (
@@ -101,17 +152,68 @@ def SOURCE_PIPELINE(video_source, video_width=640, video_height=640, video_forma
             f'{QUEUE(name=f"{name}_queue_decode")} ! '
             f'decodebin name={name}_decodebin ! '
         )
+    # The first queue after the source is always {name}_scale_q
+    queue_names = [f'{name}_scale_q', f'{name}_convert_q']
+    elements = [
+        element for element in DECODE_CHAINS[decode_chain]['convert']
+        if (scale or not element.startswith('videoscale '))
+        and (convert or not element.startswith('videoconvert '))
+        and (scale or convert or not element.startswith('videoconvertscale '))
+    ]
+    convert_pipeline = ''
+    for queue_name, element in zip(queue_names, elements):
+        convert_pipeline += f'{QUEUE(name=queue_name)} ! {element.format(name=name, scale_threads=scale_threads, convert_threads=convert_threads)} ! '
     source_pipeline = (
         f'{source_element} '
-        f'{QUEUE(name=f"{name}_scale_q")} ! '
-        f'videoscale name={name}_videoscale n-threads=2 ! '
-        f'{QUEUE(name=f"{name}_convert_q")} ! '
-        f'videoconvert n-threads=3 name={name}_convert qos=false ! '
+        f'{convert_pipeline}'
         f'video/x-raw, pixel-aspect-ratio=1/1, format={video_format}, width={video_width}, height={video_height} '
     )
 
     return source_pipeline
 
+# hailoroundrobin mode property values
+ROUND_ROBIN_MODES = {'funnel': 0, 'blocking': 1, 'non-blocking': 2}
+
+def MULTI_SOURCE_PIPELINE(video_sources, video_width=640, video_height=640, video_format='RGB', name='robin', decode_chain='separate', mode=None):
+    """
+    Creates a GStreamer pipeline string that multiplexes several video sources into one stream with hailoroundrobin,
+    so a single hailonet serves all of them.
+    Every frame carries the stream id of its source ('sink_0', 'sink_1', ...), available in the callback with
+    roi.get_stream_id() and used by STREAM_ROUTER_PIPELINE to demultiplex the results.
+    The RPi camera (appsrc) source can not be used here.
+
+    Args:
+        video_sources (list): The paths or device names of the video sources.
+        video_width (int, optional): The width every source is scaled to. Defaults to 640.
+        video_height (int, optional): The height every source is scaled to. Defaults to 640.
+        video_format (str, optional): The video format. Defaults to 'RGB'.
+        name (str, optional): The name of the hailoroundrobin element. Defaults to 'robin'.
+        decode_chain (str, optional): A key of DECODE_CHAINS used for every source. Defaults to 'separate'.
+        mode (str, optional): A key of ROUND_ROBIN_MODES. 'blocking' waits for a frame from every source in turn,
+            so one stalled source stops inference for all of them. 'non-blocking' takes the sources in turn but skips
+            a source that has no frame ready, and 'funnel' passes frames in arrival order.
+            Defaults to 'non-blocking' if any source is live (camera), 'funnel' for files only.
+
+    Returns:
+        str: A string representing the GStreamer pipeline for the multiplexed sources.
+    """
+    multi_source_pipeline = ''
+    for index, video_source in enumerate(video_sources):
+        if get_source_type(video_source) == 'rpi':
+            raise ValueError("The rpi source can not be used with multiple sources, use libcamera instead")
+        multi_source_pipeline += (
+            f'{SOURCE_PIPELINE(video_source, video_width, video_height, video_format, name=f"source_{index}", decode_chain=decode_chain)} ! '
+            f'{QUEUE(name=f"{name}_sink_{index}_q")} ! '
+            f'{name}.sink_{index} '
+        )
+    if mode is None:
+        # A stalled live camera must not block the other streams
+        live = any(get_source_type(video_source) != 'file' for video_source in video_sources)
+        mode = 'non-blocking' if live else 'funnel'
+    multi_source_pipeline += f'hailoroundrobin mode={ROUND_ROBIN_MODES[mode]} name={name} '
+
+    return multi_source_pipeline
+
 def INFERENCE_PIPELINE(
     hef_path,
     post_process_so=None,
@@ -124,7 +226,9 @@ def INFERENCE_PIPELINE(
     scheduler_timeout_ms=None,
     scheduler_priority=None,
     vdevice_group_id=1,
-    multi_process_service=None
+    multi_process_service=None,
+    scale=True,
+    convert=True
 ):
     """
     Creates a GStreamer pipeline string for inference and post-processing using a user-provided shared object file.
@@ -146,6 +250,9 @@ def INFERENCE_PIPELINE(
         scheduler_timeout_ms (int or None): hailonet scheduler-timeout-ms. Default=None.
         scheduler_priority (int or None): hailonet scheduler-priority. Default=None.
         multi_process_service (bool or None): hailonet multi-process-service. Default=None.
+        scale (bool): False drops videoscale when the frame already arrives at the HEF input size, e.g. resized
+            by the hailocropper of INFERENCE_PIPELINE_WRAPPER (see pipeline_planner). Default=True.
+        convert (bool): False drops videoconvert when the frame already has the HEF input format. Default=True.
 
     Returns:
         str: A string representing the GStreamer pipeline for inference.
@@ -170,12 +277,19 @@ def INFERENCE_PIPELINE(
         f'force-writable=true '
     )
 
-    inference_pipeline = (
-        f'{QUEUE(name=f"{name}_scale_q")} ! '
-        f'videoscale name={name}_videoscale n-threads=2 qos=false ! '
-        f'{QUEUE(name=f"{name}_convert_q")} ! '
-        f'video/x-raw, pixel-aspect-ratio=1/1 ! '
-        f'videoconvert name={name}_videoconvert n-threads=2 ! '
+    inference_pipeline = ''
+    if scale:
+        inference_pipeline += (
+            f'{QUEUE(name=f"{name}_scale_q")} ! '
+            f'videoscale name={name}_videoscale n-threads=2 qos=false ! '
+        )
+    if convert:
+        inference_pipeline += (
+            f'{QUEUE(name=f"{name}_convert_q")} ! '
+            f'video/x-raw, pixel-aspect-ratio=1/1 ! '
+            f'videoconvert name={name}_videoconvert n-threads=2 ! '
+        )
+    inference_pipeline += (
         f'{QUEUE(name=f"{name}_hailonet_q")} ! '
         f'{hailonet_str} ! '
     )
@@ -190,15 +304,19 @@ def INFERENCE_PIPELINE(
 
     return inference_pipeline
 
-def INFERENCE_PIPELINE_WRAPPER(inner_pipeline, bypass_max_size_buffers=20, name='inference_wrapper'):
+def INFERENCE_PIPELINE_WRAPPER(inner_pipeline, bypass_max_size_buffers=20, crop_so=None, name='inference_wrapper'):
     """
     Creates a GStreamer pipeline string that wraps an inner pipeline with a hailocropper and hailoaggregator.
     This allows to keep the original video resolution and color-space (format) of the input frame.
     The inner pipeline should be able to do the required conversions and rescale the detection to the original frame size.
+    The cropper crops the bbox of the frame's main ROI, so a static region of interest is inferred by setting that bbox
+    before the wrapper (see roi.InferenceRoi.attach()).
 
     Args:
         inner_pipeline (str): The inner pipeline string to be wrapped.
         bypass_max_size_buffers (int, optional): The maximum number of buffers for the bypass queue. Defaults to 20.
+        crop_so (str, optional): The cropping library providing create_crops, e.g. frame_gating.GATED_CROP_SO to let
+            frame gates send frames through the bypass only. Defaults to the TAPPAS whole-buffer cropper.
         name (str, optional): The prefix name for the pipeline elements. Defaults to 'inference_wrapper'.
 
     Returns:
@@ -206,12 +324,13 @@ def INFERENCE_PIPELINE_WRAPPER(inner_pipeline, bypass_max_size_buffers=20, name=
     """
     # Get the directory for post-processing shared objects
     tappas_post_process_dir = os.environ.get('TAPPAS_POST_PROC_DIR', '')
-    whole_buffer_crop_so = os.path.join(tappas_post_process_dir, 'cropping_algorithms/libwhole_buffer.so')
+    if crop_so is None:
+        crop_so = os.path.join(tappas_post_process_dir, 'cropping_algorithms/libwhole_buffer.so')
 
     # Construct the inference wrapper pipeline string
     inference_wrapper_pipeline = (
         f'{QUEUE(name=f"{name}_input_q")} ! '
-        f'hailocropper name={name}_crop so-path={whole_buffer_crop_so} function-name=create_crops use-letterbox=true resize-method=inter-area internal-offset=true '
+        f'hailocropper name={name}_crop so-path={crop_so} function-name=create_crops use-letterbox=true resize-method=inter-area internal-offset=true '
         f'hailoaggregator name={name}_agg '
         f'{name}_crop. ! {QUEUE(max_size_buffers=bypass_max_size_buffers, name=f"{name}_bypass_q")} ! {name}_agg.sink_0 '
         f'{name}_crop. ! {inner_pipeline} ! {name}_agg.sink_1 '
@@ -254,7 +373,8 @@ def DISPLAY_PIPELINE(video_sink='autovideosink', sync='true', show_fps='true', n
         str: A string representing the GStreamer pipeline for displaying the video.
     """
     # Construct the display pipeline string
-    screen_width, screen_height =pyautogui.size()#-----------------------------------------------------------------------------------------------------------------
+    # pyautogui connects to the X server on import, so it is only loaded when a display is actually built
+    screen_width, screen_height = lazy_import('pyautogui').size()#-----------------------------------------------------------------------------------------------------------------
      
     
     window_width = int(screen_width * 8//10)
@@ -271,34 +391,129 @@ def DISPLAY_PIPELINE(video_sink='autovideosink', sync='true', show_fps='true', n
         f'videoconvert name={name}_videoconvert n-threads=2 qos=false ! '
         f'{QUEUE(name=f"{name}_q")} ! '
         f'fpsdisplaysink name={name} video-sink={video_sink} sync={sync} text-overlay={show_fps} signal-fps-measurements=true '
-
-        #f'{QUEUE(name=f"{name}_hailooverlay_q")} ! '
-       # f'hailooverlay name={name}_hailooverlay ! '
-        #f'{QUEUE(name=f"{name}_videoconvert_q")} ! '
-        ##f'videoconvert name={name}_videoconvert n-threads=2 qos=false ! '
-        #f'{QUEUE(name=f"{name}_tee_q")} ! '
-       # f'tee name={name}_tee '
-       # f'{name}_tee. ! {QUEUE(name=f"{name}_display_q")} ! '
-       # f'fpsdisplaysink name={name} video-sink={video_sink} sync={sync} text-overlay={show_fps} signal-fps-measurements=true '
-       ## f'{name}_tee. ! {QUEUE(name=f"{name}_file_q")} ! '
-       # f'videoconvert ! x264enc tune=zerolatency ! '
-       # f'mp4mux streamable=true fragment-duration=1 ! '
-       # f'filesink location=output.mkv '
-   
     )
 
     return display_pipeline
 
-def FILE_SINK_PIPELINE(output_file='output.mkv', name='file_sink', bitrate=5000):
+def HEADLESS_PIPELINE(sync='false', preview_fps=0, preview_width=320, preview_height=240, preview_location='preview.jpg', name='hailo_display'):
+    """
+    Creates a GStreamer pipeline string that replaces the display branch for unattended runs.
+    Frames end in a measurement-only fpsdisplaysink (backed by fakesink) so FPS reporting keeps working,
+    without scaling, overlay drawing or rendering. No X server is required.
+    Optionally a low-rate preview JPEG (with overlay) is written to preview_location, overwritten on every update.
+
+    Args:
+        sync (str, optional): The sync property for the measurement sink. Defaults to 'false'.
+        preview_fps (int, optional): Preview update rate in frames per second. 0 disables the preview. Defaults to 0.
+        preview_width (int, optional): The width of the preview image. Defaults to 320.
+        preview_height (int, optional): The height of the preview image. Defaults to 240.
+        preview_location (str, optional): The path of the preview JPEG. Defaults to 'preview.jpg'.
+        name (str, optional): The prefix name for the pipeline elements. Defaults to 'hailo_display'.
+
+    Returns:
+        str: A string representing the GStreamer pipeline for headless output.
+    """
+    measurement_sink = (
+        f'fpsdisplaysink name={name} video-sink=fakesink sync={sync} text-overlay=false signal-fps-measurements=true '
+    )
+    if not preview_fps:
+        return f'{QUEUE(name=f"{name}_q")} ! {measurement_sink}'
+
+    # The preview branch is leaky so a slow JPEG write never stalls the measurement sink
+    return MULTI_OUTPUT_PIPELINE(
+        [
+            (measurement_sink, {'leaky': 'no'}),
+            JPEG_SNAPSHOT_PIPELINE(
+                location=preview_location,
+                snapshot_fps=preview_fps,
+                width=preview_width,
+                height=preview_height,
+                quality=70,
+                name=f'{name}_preview',
+            ),
+        ],
+        name=f'{name}_outputs',
+    )
+
+# Encoder profiles used by FILE_SINK_PIPELINE.
+# 'element' is the GStreamer factory that must be installed for the profile to be usable,
+# 'pipeline' is formatted with bitrate (kbit/s), keyframe_interval (frames) and name.
+# x264-zerolatency is the historical default; the other x264 profiles trade quality for a fraction of the CPU.
+ENCODER_PROFILES = {
+    'x264-zerolatency': {
+        'element': 'x264enc',
+        'pipeline': 'x264enc name={name}_encoder tune=zerolatency bitrate={bitrate} key-int-max={keyframe_interval} ! h264parse ',
+    },
+    'x264-fast': {
+        'element': 'x264enc',
+        'pipeline': (
+            'x264enc name={name}_encoder tune=zerolatency speed-preset=ultrafast threads=2 '
+            'key-int-max={keyframe_interval} pass=cbr bitrate={bitrate} ! h264parse '
+        ),
+    },
+    'x264-low-cpu': {
+        'element': 'x264enc',
+        'pipeline': (
+            'x264enc name={name}_encoder tune=zerolatency speed-preset=ultrafast threads=1 sliced-threads=false '
+            'key-int-max={keyframe_interval} pass=cbr bitrate={bitrate} b-adapt=false bframes=0 ! h264parse '
+        ),
+    },
+    'openh264': {
+        'element': 'openh264enc',
+        'pipeline': (
+            'openh264enc name={name}_encoder complexity=low rate-control=bitrate bitrate={bitrate}000 '
+            'gop-size={keyframe_interval} ! h264parse '
+        ),
+    },
+    'v4l2-h264': {
+        # Hardware encoder (Raspberry Pi 4 and earlier, not available on Pi 5)
+        'element': 'v4l2h264enc',
+        'pipeline': (
+            'video/x-raw, format=I420 ! '
+            'v4l2h264enc name={name}_encoder '
+            'extra-controls="controls,video_bitrate={bitrate}000,h264_i_frame_period={keyframe_interval}" ! '
+            'video/x-h264, level=(string)4 ! h264parse '
+        ),
+    },
+    'mjpeg': {
+        # Intra-only, cheap to encode but large files
+        'element': 'jpegenc',
+        'pipeline': 'jpegenc name={name}_encoder quality=80 ',
+    },
+}
+
+def ENCODER_PIPELINE(encoder_profile='x264-zerolatency', bitrate=5000, keyframe_interval=30, name='encoder'):
+    """
+    Creates a GStreamer pipeline string for a video encoder from ENCODER_PROFILES.
+    The input should be raw video in a format the encoder accepts (add a videoconvert before it).
+
+    Args:
+        encoder_profile (str, optional): A key of ENCODER_PROFILES. Defaults to 'x264-zerolatency'.
+        bitrate (int, optional): Target bitrate in kbit/s (ignored by mjpeg). Defaults to 5000.
+        keyframe_interval (int, optional): Maximum number of frames between keyframes. Defaults to 30.
+        name (str, optional): The prefix name for the pipeline elements. Defaults to 'encoder'.
+
+    Returns:
+        str: A string representing the GStreamer pipeline for the encoder.
+    """
+    if encoder_profile not in ENCODER_PROFILES:
+        raise ValueError(f"Unknown encoder profile '{encoder_profile}', choose one of {list(ENCODER_PROFILES)}")
+    return ENCODER_PROFILES[encoder_profile]['pipeline'].format(
+        bitrate=bitrate, keyframe_interval=keyframe_interval, name=name)
+
+def FILE_SINK_PIPELINE(output_file='output.mkv', name='file_sink', bitrate=5000, encoder_profile='x264-zerolatency', keyframe_interval=30):
     """
     Creates a GStreamer pipeline string for saving the video to a file in .mkv format.
     It it recommended run ffmpeg to fix the file header after recording.
+    For long or unattended recordings prefer SEGMENTED_FILE_SINK_PIPELINE.
     example: ffmpeg -i output.mkv -c copy fixed_output.mkv
     Note: If your source is a file, looping will not work with this pipeline.
     Args:
         output_file (str): The path to the output file.
         name (str, optional): The prefix name for the pipeline elements. Defaults to 'file_sink'.
-        bitrate (int, optional): The bitrate for the encoder. Defaults to 5000.
+        bitrate (int, optional): The bitrate for the encoder in kbit/s. Defaults to 5000.
+        encoder_profile (str, optional): A key of ENCODER_PROFILES. Defaults to 'x264-zerolatency'.
+        keyframe_interval (int, optional): Maximum number of frames between keyframes. Defaults to 30.
 
     Returns:
         str: A string representing the GStreamer pipeline for saving the video to a file.
@@ -308,13 +523,170 @@ def FILE_SINK_PIPELINE(output_file='output.mkv', name='file_sink', bitrate=5000)
         f'{QUEUE(name=f"{name}_videoconvert_q")} ! '
         f'videoconvert name={name}_videoconvert n-threads=2 qos=false ! '
         f'{QUEUE(name=f"{name}_encoder_q")} ! '
-        f'x264enc tune=zerolatency bitrate={bitrate} ! '
+        f'{ENCODER_PIPELINE(encoder_profile, bitrate=bitrate, keyframe_interval=keyframe_interval, name=name)} ! '
         f'matroskamux ! '
         f'filesink location={output_file} '
     )
 
     return file_sink_pipeline
 
+def SEGMENTED_FILE_SINK_PIPELINE(output_dir='recordings', segment_seconds=60, max_segments=0, name='segment_sink', bitrate=5000, encoder_profile='x264-zerolatency', keyframe_interval=30):
+    """
+    Creates a GStreamer pipeline string for crash-safe recording into fixed-duration .mkv segments.
+    Every segment is finalized (playable) as soon as it is closed, so a power cut loses at most the segment being written
+    and no ffmpeg post-processing is needed. splitmuxsink posts a 'splitmuxsink-fragment-closed' element message
+    for every finished segment, which GStreamerApp uses to maintain the segment manifest.
+
+    Args:
+        output_dir (str, optional): The directory for the segments. Defaults to 'recordings'.
+        segment_seconds (int, optional): The duration of each segment in seconds. Defaults to 60.
+        max_segments (int, optional): Keep only the last max_segments segments on disk. 0 keeps all. Defaults to 0.
+        name (str, optional): The prefix name for the pipeline elements. Defaults to 'segment_sink'.
+        bitrate (int, optional): The bitrate for the encoder in kbit/s. Defaults to 5000.
+        encoder_profile (str, optional): A key of ENCODER_PROFILES. Defaults to 'x264-zerolatency'.
+        keyframe_interval (int, optional): Maximum number of frames between keyframes. Defaults to 30.
+
+    Returns:
+        str: A string representing the GStreamer pipeline for segmented recording.
+    """
+    location = os.path.join(output_dir, 'segment_%05d.mkv')
+    # send-keyframe-requests makes the encoder start every segment on a keyframe so segments are exactly segment_seconds long
+    segmented_file_sink_pipeline = (
+        f'{QUEUE(name=f"{name}_videoconvert_q")} ! '
+        f'videoconvert name={name}_videoconvert n-threads=2 qos=false ! '
+        f'{QUEUE(name=f"{name}_encoder_q")} ! '
+        f'{ENCODER_PIPELINE(encoder_profile, bitrate=bitrate, keyframe_interval=keyframe_interval, name=name)} ! '
+        f'splitmuxsink name={name} location={location} muxer-factory=matroskamux '
+        f'max-size-time={int(segment_seconds * 1e9)} max-files={max_segments} send-keyframe-requests=true async-finalize=true '
+    )
+
+    return segmented_file_sink_pipeline
+
+def NETWORK_PREVIEW_PIPELINE(host='127.0.0.1', port=5000, preview_fps=10, width=640, height=480, quality=60, name='network_preview'):
+    """
+    Creates a GStreamer pipeline string that streams a rate-limited MJPEG preview (with overlay) over RTP/UDP.
+    Receive it with e.g.:
+    gst-launch-1.0 udpsrc port=5000 caps="application/x-rtp,encoding-name=JPEG,payload=26" ! rtpjpegdepay ! jpegdec ! autovideosink
+
+    Args:
+        host (str, optional): The destination host. Defaults to '127.0.0.1'.
+        port (int, optional): The destination UDP port. Defaults to 5000.
+        preview_fps (int, optional): The maximum preview frame rate. Defaults to 10.
+        width (int, optional): The preview width. Defaults to 640.
+        height (int, optional): The preview height. Defaults to 480.
+        quality (int, optional): The JPEG quality. Defaults to 60.
+        name (str, optional): The prefix name for the pipeline elements. Defaults to 'network_preview'.
+
+    Returns:
+        str: A string representing the GStreamer pipeline for the network preview.
+    """
+    network_preview_pipeline = (
+        f'videorate name={name}_rate drop-only=true max-rate={int(preview_fps)} ! '
+        f'videoscale name={name}_videoscale ! '
+        f'video/x-raw, width={width}, height={height}, pixel-aspect-ratio=1/1 ! '
+        f'hailooverlay name={name}_overlay ! '
+        f'videoconvert name={name}_videoconvert qos=false ! '
+        f'jpegenc quality={quality} ! '
+        f'rtpjpegpay ! '
+        f'udpsink name={name}_sink host={host} port={port} sync=false async=false '
+    )
+
+    return network_preview_pipeline
+
+def JPEG_SNAPSHOT_PIPELINE(location='snapshot_%05d.jpg', snapshot_fps=1, width=640, height=480, quality=85, max_files=0, name='jpeg_snapshot'):
+    """
+    Creates a GStreamer pipeline string that periodically saves a JPEG snapshot (with overlay).
+    If location contains a printf pattern (e.g. %05d) a new file is written for every snapshot,
+    otherwise the same file is overwritten.
+
+    Args:
+        location (str, optional): The snapshot path or pattern. Defaults to 'snapshot_%05d.jpg'.
+        snapshot_fps (int, optional): The maximum number of snapshots per second. Defaults to 1.
+        width (int, optional): The snapshot width. Defaults to 640.
+        height (int, optional): The snapshot height. Defaults to 480.
+        quality (int, optional): The JPEG quality. Defaults to 85.
+        max_files (int, optional): Keep only the last max_files snapshots. 0 keeps all. Defaults to 0.
+        name (str, optional): The prefix name for the pipeline elements. Defaults to 'jpeg_snapshot'.
+
+    Returns:
+        str: A string representing the GStreamer pipeline for JPEG snapshots.
+    """
+    jpeg_snapshot_pipeline = (
+        f'videorate name={name}_rate drop-only=true max-rate={int(snapshot_fps)} ! '
+        f'videoscale name={name}_videoscale ! '
+        f'video/x-raw, width={width}, height={height}, pixel-aspect-ratio=1/1 ! '
+        f'hailooverlay name={name}_overlay ! '
+        f'videoconvert name={name}_videoconvert qos=false ! '
+        f'jpegenc quality={quality} ! '
+        f'multifilesink name={name}_sink location={location} max-files={max_files} sync=false async=false '
+    )
+
+    return jpeg_snapshot_pipeline
+
+def MULTI_OUTPUT_PIPELINE(branches, max_size_buffers=3, leaky='downstream', name='outputs'):
+    """
+    Creates a GStreamer pipeline string that feeds several output branches from a single tee.
+    Each branch gets its own queue (its own streaming thread). By default the queues are leaky, so a slow
+    branch (e.g. a file on an SD card) drops its own frames instead of backpressuring inference or the other branches.
+    The branch that should pace the pipeline (typically the display when sync=true) should use leaky='no'.
+
+    Example:
+        MULTI_OUTPUT_PIPELINE([
+            (DISPLAY_PIPELINE(), {'leaky': 'no'}),
+            FILE_SINK_PIPELINE('output.mkv'),
+            NETWORK_PREVIEW_PIPELINE(host='192.168.1.10'),
+        ])
+
+    Args:
+        branches (list): The output branches. Each item is a pipeline string, or a (pipeline string, dict) tuple
+            where the dict overrides the QUEUE() parameters of that branch.
+        max_size_buffers (int, optional): The default queue size of each branch. Defaults to 3.
+        leaky (str, optional): The default leaky type of each branch queue. Defaults to 'downstream'.
+        name (str, optional): The prefix name for the pipeline elements. Defaults to 'outputs'.
+
+    Returns:
+        str: A string representing the GStreamer pipeline for the tee and all of its branches.
+    """
+    if not branches:
+        raise ValueError("MULTI_OUTPUT_PIPELINE requires at least one branch")
+
+    multi_output_pipeline = (
+        f'{QUEUE(name=f"{name}_tee_q")} ! '
+        f'tee name={name}_tee '
+    )
+    for index, branch in enumerate(branches):
+        if isinstance(branch, tuple):
+            branch_pipeline, queue_params = branch
+        else:
+            branch_pipeline, queue_params = branch, {}
+        queue_params = {'max_size_buffers': max_size_buffers, 'leaky': leaky, **queue_params}
+        multi_output_pipeline += (
+            f'{name}_tee. ! {QUEUE(name=f"{name}_branch{index}_q", **queue_params)} ! {branch_pipeline} '
+        )
+
+    return multi_output_pipeline
+
+def STREAM_ROUTER_PIPELINE(stream_pipelines, name='router'):
+    """
+    Creates a GStreamer pipeline string that demultiplexes a MULTI_SOURCE_PIPELINE stream with hailostreamrouter:
+    frames of stream i (stream id 'sink_i') continue into stream_pipelines[i].
+
+    Args:
+        stream_pipelines (list): One pipeline string per source, in the order of the sources.
+        name (str, optional): The name of the hailostreamrouter element. Defaults to 'router'.
+
+    Returns:
+        str: A string representing the GStreamer pipeline for the per-stream outputs.
+    """
+    routes = ' '.join(f'src_{index}::input-streams="<sink_{index}>"' for index in range(len(stream_pipelines)))
+    stream_router_pipeline = f'hailostreamrouter name={name} {routes} '
+    for index, stream_pipeline in enumerate(stream_pipelines):
+        stream_router_pipeline += (
+            f'{name}.src_{index} ! {QUEUE(name=f"{name}_src_{index}_q")} ! {stream_pipeline} '
+        )
+
+    return stream_router_pipeline
+
 def USER_CALLBACK_PIPELINE(name='identity_callback'):
     """
     Creates a GStreamer pipeline string for the user callback element.
@@ -333,6 +705,37 @@ def USER_CALLBACK_PIPELINE(name='identity_callback'):
 
     return user_callback_pipeline
 
+# Named hailotracker parameter sets, selectable with --tracker-preset.
+# Measure their cost on your scene with --tracker-stats.
+TRACKER_PRESETS = {
+    # The TRACKER_PIPELINE defaults
+    'default': {},
+    # Short track memory: fewer objects kept alive, cheapest per frame, ids may change after short occlusions
+    'low-latency': {
+        'keep_new_frames': 1,
+        'keep_tracked_frames': 5,
+        'keep_lost_frames': 1,
+    },
+    # Many similar objects close to each other: stricter matching to avoid id swaps
+    'crowded': {
+        'kalman_dist_thr': 0.6,
+        'iou_thr': 0.7,
+        'init_iou_thr': 0.5,
+        'keep_new_frames': 3,
+        'keep_tracked_frames': 10,
+        'keep_lost_frames': 3,
+    },
+    # Slow, steady motion with occlusions: looser matching and long memory to keep one id per object
+    'slow-conveyor': {
+        'kalman_dist_thr': 0.9,
+        'iou_thr': 0.95,
+        'init_iou_thr': 0.8,
+        'keep_new_frames': 3,
+        'keep_tracked_frames': 30,
+        'keep_lost_frames': 10,
+    },
+}
+
 def TRACKER_PIPELINE(class_id, kalman_dist_thr=0.8, iou_thr=0.9, init_iou_thr=0.7, keep_new_frames=2, keep_tracked_frames=15, keep_lost_frames=2, keep_past_metadata=False, qos=False, name='hailo_tracker'):
     """
     Creates a GStreamer pipeline string for the HailoTracker element.
@@ -410,3 +813,57 @@ def CROPPER_PIPELINE(
         # aggregator output
         f'{name}_agg. ! {QUEUE(name=f"{name}_output_q")} '
     )
+
+def TILE_CROPPER_PIPELINE(
+    inner_pipeline,
+    tiles_x=2,
+    tiles_y=2,
+    overlap_x=0.1,
+    overlap_y=0.1,
+    iou_threshold=0.3,
+    border_threshold=0.1,
+    tiling_mode=0,
+    scale_level=2,
+    bypass_max_size_buffers=20,
+    name='tile_cropper_wrapper'
+):
+    """
+    Wraps an inner pipeline with hailotilecropper and hailotileaggregator, the tiling counterpart of CROPPER_PIPELINE.
+    The full-resolution frame is split into tiles_x * tiles_y overlapping tiles; every tile is scaled to the network
+    input by the inner pipeline, so small objects keep more pixels than with a single letterboxed frame.
+    The aggregator maps the tile detections back to full-frame coordinates, drops the ones cut by a tile border
+    and merges duplicates from overlapping tiles with cross-tile NMS.
+    Use a post-process function without letterbox (e.g. 'filter') in the inner pipeline, tiles are stretched, not padded.
+
+    Args:
+        inner_pipeline (str): The pipeline string to be wrapped, typically INFERENCE_PIPELINE with batch_size=tiles_x * tiles_y.
+        tiles_x (int): Tiles along the x axis. Defaults to 2.
+        tiles_y (int): Tiles along the y axis. Defaults to 2.
+        overlap_x (float): Overlap between neighbouring tiles as a fraction of the tile width. Defaults to 0.1.
+        overlap_y (float): Overlap between neighbouring tiles as a fraction of the tile height. Defaults to 0.1.
+        iou_threshold (float): IoU above which detections from different tiles are merged. Defaults to 0.3.
+        border_threshold (float): Detections closer than this (fraction of the tile) to an inner tile border are dropped. Defaults to 0.1.
+        tiling_mode (int): 0 for single-scale tiles, 1 for multi-scale (adds coarser levels, see scale_level). Defaults to 0.
+        scale_level (int): Number of scales used in multi-scale mode. Defaults to 2.
+        bypass_max_size_buffers (int): For the bypass queue. Defaults to 20.
+        name (str): A prefix name for pipeline elements. Defaults 'tile_cropper_wrapper'.
+
+    Returns:
+        str: A pipeline string representing hailotilecropper + hailotileaggregator around the inner_pipeline.
+    """
+    return (
+        f'{QUEUE(name=f"{name}_input_q")} ! '
+        f'hailotilecropper name={name}_cropper internal-offset=true '
+        f'tiles-along-x-axis={tiles_x} tiles-along-y-axis={tiles_y} '
+        f'overlap-x-axis={overlap_x} overlap-y-axis={overlap_y} '
+        f'tiling-mode={tiling_mode} scale-level={scale_level} '
+        f'hailotileaggregator name={name}_agg flatten-detections=true '
+        f'iou-threshold={iou_threshold} border-threshold={border_threshold} '
+        # bypass
+        f'{name}_cropper. ! '
+        f'{QUEUE(name=f"{name}_bypass_q", max_size_buffers=bypass_max_size_buffers)} ! {name}_agg.sink_0 '
+        # pipeline for the actual inference, one buffer per tile
+        f'{name}_cropper. ! {inner_pipeline} ! {name}_agg.sink_1 '
+        # aggregator output
+        f'{name}_agg. ! {QUEUE(name=f"{name}_output_q")} '
+    )
@@ -1,24 +1,17 @@
 import sys
-import gi
-gi.require_version('Gst', '1.0')
-from gi.repository import Gst, GLib, GObject
 import os
 import argparse
-import multiprocessing
-import numpy as np
-import setproctitle
-import cv2
-import time
-import signal
-import threading
-import subprocess
+from hailo_apps_infra.startup_profile import STARTUP_PROFILE, lazy_import
 from hailo_apps_infra.gstreamer_app import (
+    Gst,
     app_callback_class
 )
+from hailo_apps_infra.gstreamer_helper_pipelines import ENCODER_PROFILES, DECODE_CHAINS, TRACKER_PRESETS
 
 # Try to import hailo python module
 try:
-    import hailo
+    with STARTUP_PROFILE.section('import hailo'):
+        import hailo
 except ImportError:
     sys.exit("Failed to import hailo python module. Make sure you are in hailo virtual environment.")
 
@@ -28,7 +21,8 @@ except ImportError:
 def detect_hailo_arch():
     try:
         # Run the hailortcli command to get device information
-        result = subprocess.run(['hailortcli', 'fw-control', 'identify'], capture_output=True, text=True)
+        with STARTUP_PROFILE.section('detect_hailo_arch (hailortcli)'):
+            result = lazy_import('subprocess').run(['hailortcli', 'fw-control', 'identify'], capture_output=True, text=True)
 
         # Check if the command was successful
         if result.returncode != 0:
@@ -87,6 +81,46 @@ def get_default_parser():
             default=None,
             help="Path to HEF file",
         )
+    parser.add_argument(
+        "--decode-chain", type=str, default="separate",
+        choices=list(DECODE_CHAINS) + ['auto'],
+        help="Decode / scale / convert chain of the source. 'separate' is the software decoder with videoscale and \
+        videoconvert (2 / 3 threads). 'auto' picks the cheapest chain available (hardware decoders, single-pass \
+        videoconvertscale) and raises the hardware decoder ranks. Default is separate. \
+        Compare chains with: python -m hailo_apps_infra.source_benchmark"
+    )
+    parser.add_argument(
+        "--optimize-conversions", action="store_true",
+        help="Drop the scale / convert elements between the source and hailonet that would not change the frame \
+        (based on the input resolution and the HEF input shape) and print the removed elements."
+    )
+    parser.add_argument(
+        "--roi-file", type=str, default=None,
+        help="JSON file with a static region of interest, {\"rectangle\": [xmin, ymin, xmax, ymax]} or \
+        {\"polygon\": [[x, y], ...]} normalized to the frame. Only this region is sent to inference; \
+        detections are mapped back to the full frame."
+    )
+    parser.add_argument(
+        "--batch-size", type=int, default=None,
+        help="hailonet batch size. Default is the app default, or the --auto-tune result for the HEF."
+    )
+    parser.add_argument(
+        "--scheduler-timeout-ms", type=int, default=None,
+        help="hailonet scheduler-timeout-ms. Default is the hailonet default, or the --auto-tune result for the HEF."
+    )
+    parser.add_argument(
+        "--scheduler-priority", type=int, default=None,
+        help="hailonet scheduler-priority, relevant when several networks share the device."
+    )
+    parser.add_argument(
+        "--auto-tune", action="store_true",
+        help="Calibrate batch size and scheduler timeout on the input file (or resources/example.mp4 for live sources) \
+        before starting, and persist the fastest configuration for the HEF."
+    )
+    parser.add_argument(
+        "--tuning-file", type=str, default=None,
+        help="Where --auto-tune results are stored. Default is ~/.cache/hailo_apps_infra/tuning.json."
+    )
     parser.add_argument(
         "--disable-sync", action="store_true",
         help="Disables display sink sync, will run as fast as possible. Relevant when using file source."
@@ -95,7 +129,129 @@ def get_default_parser():
         "--disable-callback", action="store_true",
         help="Disables the user's custom callback function in the pipeline. Use this option to run the pipeline without invoking the callback logic."
     )
+    parser.add_argument(
+        "--headless", action="store_true",
+        help="Run without a display. Frames end in a measurement-only sink (FPS is still reported with --show-fps), no X server is needed."
+    )
+    parser.add_argument(
+        "--preview-fps", type=int, default=0,
+        help="In headless mode, write a low-rate preview JPEG with overlay at this rate (frames per second). 0 disables the preview. Default is 0."
+    )
+    parser.add_argument(
+        "--preview-path", type=str, default="preview.jpg",
+        help="Path of the headless preview JPEG. Default is preview.jpg."
+    )
+    parser.add_argument(
+        "--record-file", type=str, default=None,
+        help="Additionally record the video to this .mkv file on its own leaky branch, so a slow disk never stalls inference."
+    )
+    parser.add_argument(
+        "--record-dir", type=str, default=None,
+        help="Additionally record crash-safe fixed-duration .mkv segments into this directory, listed in manifest.json."
+    )
+    parser.add_argument(
+        "--segment-seconds", type=int, default=60,
+        help="Duration of each recording segment in seconds when --record-dir is set. Default is 60."
+    )
+    parser.add_argument(
+        "--max-segments", type=int, default=0,
+        help="Keep only the last N segments on disk (rolling recording). 0 keeps all. Default is 0."
+    )
+    parser.add_argument(
+        "--encoder-profile", type=str, default="x264-zerolatency",
+        choices=list(ENCODER_PROFILES) + ['auto'],
+        help="Encoder profile used for recordings. 'auto' picks the cheapest available encoder. Default is x264-zerolatency. \
+        Compare profiles on your hardware with: python -m hailo_apps_infra.encoder_benchmark --input <recording>"
+    )
+    parser.add_argument(
+        "--record-bitrate", type=int, default=5000,
+        help="Recording bitrate in kbit/s. Default is 5000."
+    )
+    parser.add_argument(
+        "--udp-preview", type=str, default=None, metavar="HOST:PORT",
+        help="Additionally stream a low-rate MJPEG/RTP preview with overlay to HOST:PORT."
+    )
+    parser.add_argument(
+        "--snapshot-dir", type=str, default=None,
+        help="Additionally save periodic JPEG snapshots with overlay into this directory."
+    )
+    parser.add_argument(
+        "--snapshot-fps", type=int, default=1,
+        help="Snapshot rate in frames per second when --snapshot-dir is set. Default is 1."
+    )
+    parser.add_argument(
+        "--target-fps", type=float, default=0,
+        help="Skip inference on some frames to stay real-time: infer at most this many frames per second and fewer while \
+        the inference-to-callback latency is over budget. Skipped frames bypass hailonet but are still shown, recorded \
+        and passed to the callback, with their boxes moved along the tracker tracks. Without resources/libgated_crops.so \
+        (see cpp/meson.build) skipped frames are dropped instead. 0 disables. Default is 0."
+    )
+    parser.add_argument(
+        "--latency-budget-ms", type=float, default=None,
+        help="Latency budget for --target-fps in milliseconds. Default is 3 frame periods at the target FPS."
+    )
+    parser.add_argument(
+        "--motion-gate", action="store_true",
+        help="Skip inference while the scene is static (downscaled frame differencing). Static frames bypass hailonet \
+        and reuse the previous frame's detections, the display and recordings keep running. Without \
+        resources/libgated_crops.so (see cpp/meson.build) static frames are dropped instead."
+    )
+    parser.add_argument(
+        "--motion-threshold", type=float, default=0.01,
+        help="Fraction of thumbnail pixels that must change for --motion-gate to run inference. Default is 0.01."
+    )
+    parser.add_argument(
+        "--motion-max-skip-seconds", type=float, default=2.0,
+        help="Run inference at least this often with --motion-gate, even on a static scene. Default is 2."
+    )
+    parser.add_argument(
+        "--tracker-preset", type=str, default="default", choices=list(TRACKER_PRESETS),
+        help="hailotracker parameter preset. Default is default."
+    )
+    parser.add_argument(
+        "--qos-allow", type=str, nargs="+", default=None, metavar="PATTERN",
+        help="Element name patterns allowed to drop late buffers through QoS, e.g. 'hailo_display*' for the display \
+        branch. QoS is disabled on all other elements, so recordings and inference never drop. Default is none."
+    )
+    parser.add_argument(
+        "--tracker-stats", action="store_true",
+        help="Measure the time spent in hailotracker per frame versus the number of tracked objects."
+    )
+    parser.add_argument(
+        "--metrics-interval", type=int, default=0,
+        help="Print the collected pipeline metrics every N seconds. 0 prints them only at shutdown. Default is 0."
+    )
     parser.add_argument("--dump-dot", action="store_true", help="Dump the pipeline graph to a dot file pipeline.dot")
+    parser.add_argument(
+        "--queue-config", type=str, default=None,
+        help="Apply the per-queue max-size-buffers / leaky settings of this queue config file (written by --tune-queues)."
+    )
+    parser.add_argument(
+        "--queue-telemetry", type=str, default=None,
+        help="Record the fill level of every queue to this JSONL file, for python -m hailo_apps_infra.queue_tuning."
+    )
+    parser.add_argument(
+        "--tune-queues", type=str, default=None,
+        help="Measure the queue fill levels while running and write the suggested queue sizes and leaky policies \
+        (minimal latency at --target-fps, or at the measured FPS) to this queue config file at exit."
+    )
+    parser.add_argument(
+        "--print-pipeline", action="store_true",
+        help="Print the pipeline stage by stage, one element per line, instead of the gst-launch string."
+    )
+    parser.add_argument(
+        "--save-pipeline", type=str, default=None,
+        help="Save the pipeline description (stages as JSON) to this file, e.g. to edit queue settings for a deployment."
+    )
+    parser.add_argument(
+        "--pipeline-file", type=str, default=None,
+        help="Run the pipeline description saved with --save-pipeline instead of the generated one. \
+        The differences to the generated pipeline are printed."
+    )
+    parser.add_argument(
+        "--startup-profile", action="store_true",
+        help="Print an import and initialization timing breakdown once the first frame reaches the callback."
+    )
     return parser
 
 
@@ -104,10 +260,12 @@ def get_default_parser():
 # ---------------------------------------------------------
 
 def handle_rgb(map_info, width, height):
+    np = lazy_import('numpy')
     # The copy() method is used to create a copy of the numpy array. This is necessary because the original numpy array is created from buffer data, and it does not own the data it represents. Instead, it's just a view of the buffer's data.
     return np.ndarray(shape=(height, width, 3), dtype=np.uint8, buffer=map_info.data).copy()
 
 def handle_nv12(map_info, width, height):
+    np = lazy_import('numpy')
     y_plane_size = width * height
     uv_plane_size = width * height // 2
     y_plane = np.ndarray(shape=(height, width), dtype=np.uint8, buffer=map_info.data[:y_plane_size]).copy()
@@ -115,6 +273,7 @@ def handle_nv12(map_info, width, height):
     return y_plane, uv_plane
 
 def handle_yuyv(map_info, width, height):
+    np = lazy_import('numpy')
     return np.ndarray(shape=(height, width, 2), dtype=np.uint8, buffer=map_info.data).copy()
 
 FORMAT_HANDLERS = {
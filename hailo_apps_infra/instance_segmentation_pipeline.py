@@ -1,14 +1,5 @@
-import gi
-gi.require_version('Gst', '1.0')
-from gi.repository import Gst, GLib
 import os
-import argparse
-import multiprocessing
-import numpy as np
-import setproctitle
-import cv2
-import time
-import hailo
+from hailo_apps_infra.startup_profile import lazy_import
 from hailo_apps_infra.hailo_rpi_common import (
     get_default_parser,
     detect_hailo_arch,
@@ -20,8 +11,9 @@ from hailo_apps_infra.gstreamer_helper_pipelines import(
     INFERENCE_PIPELINE_WRAPPER,
     USER_CALLBACK_PIPELINE,
     TRACKER_PIPELINE,
-    DISPLAY_PIPELINE,
+    TRACKER_PRESETS,
 )
+from hailo_apps_infra.pipeline_model import PipelineDescription
 from hailo_apps_infra.gstreamer_app import (
     GStreamerApp,
     app_callback_class,
@@ -76,33 +68,41 @@ class GStreamerInstanceSegmentationApp(GStreamerApp):
         self.post_function_name = "filter_letterbox"
         self.app_callback = app_callback
 
+        # Batch size and scheduler settings from the command line or a previous --auto-tune
+        self.apply_inference_tuning()
+
         # Set the process title
-        setproctitle.setproctitle("Hailo Instance Segmentation App")
+        lazy_import('setproctitle').setproctitle("Hailo Instance Segmentation App")
 
         self.create_pipeline()
 
-    def get_pipeline_string(self):
-        source_pipeline = SOURCE_PIPELINE(video_source=self.video_source, video_width=self.video_width, video_height=self.video_height)
+    def get_inference_pipeline(self):
         infer_pipeline = INFERENCE_PIPELINE(
             hef_path=self.hef_path,
             post_process_so=self.default_post_process_so,
             post_function_name=self.post_function_name,
             batch_size=self.batch_size,
             config_json=self.config_file,
+            scheduler_timeout_ms=self.scheduler_timeout_ms,
+            scheduler_priority=self.scheduler_priority,
+            **self.pipeline_plan.inference_args,
         )
-        infer_pipeline_wrapper = INFERENCE_PIPELINE_WRAPPER(infer_pipeline)
-        tracker_pipeline = TRACKER_PIPELINE(class_id=1)
+        return INFERENCE_PIPELINE_WRAPPER(infer_pipeline, crop_so=self.inference_crop_so)
+
+    def get_pipeline_description(self):
+        source_pipeline = SOURCE_PIPELINE(video_source=self.video_source, video_width=self.video_width, video_height=self.video_height, decode_chain=self.decode_chain, **self.pipeline_plan.source_args)
+        infer_pipeline_wrapper = self.get_inference_pipeline()
+        tracker_pipeline = TRACKER_PIPELINE(class_id=1, **TRACKER_PRESETS[self.options_menu.tracker_preset])
         user_callback_pipeline = USER_CALLBACK_PIPELINE()
-        display_pipeline = DISPLAY_PIPELINE(video_sink=self.video_sink, sync=self.sync, show_fps=self.show_fps)
-        pipeline_string = (
-            f'{source_pipeline} ! '
-            f'{infer_pipeline_wrapper} ! '
-            f'{tracker_pipeline} ! '
-            f'{user_callback_pipeline} ! '
-            f'{display_pipeline}'
+        display_pipeline = self.get_display_pipeline()
+        return (
+            PipelineDescription()
+            .add('source', source_pipeline)
+            .add('inference', infer_pipeline_wrapper)
+            .add('tracker', tracker_pipeline)
+            .add('callback', user_callback_pipeline)
+            .add('display', display_pipeline)
         )
-        print(pipeline_string)
-        return pipeline_string
 
 if __name__ == "__main__":
     # Create an instance of the user app callback class
@@ -0,0 +1,183 @@
+import os
+from hailo_apps_infra.startup_profile import lazy_import
+from hailo_apps_infra.hailo_rpi_common import (
+    get_default_parser,
+    detect_hailo_arch,
+)
+from hailo_apps_infra.gstreamer_helper_pipelines import(
+    get_source_type,
+    MULTI_SOURCE_PIPELINE,
+    STREAM_ROUTER_PIPELINE,
+    INFERENCE_PIPELINE,
+    INFERENCE_PIPELINE_WRAPPER,
+    TRACKER_PIPELINE,
+    TRACKER_PRESETS,
+    USER_CALLBACK_PIPELINE,
+    DISPLAY_PIPELINE,
+    HEADLESS_PIPELINE,
+)
+from hailo_apps_infra.pipeline_metrics import StreamFpsCounter
+from hailo_apps_infra.pipeline_model import PipelineDescription
+from hailo_apps_infra.gstreamer_app import (
+    GStreamerApp,
+    app_callback_class,
+    dummy_callback
+)
+
+
+
+# -----------------------------------------------------------------------------------------------
+# User Gstreamer Application
+# -----------------------------------------------------------------------------------------------
+
+# Runs several cameras / files through one hailonet:
+#   sources -> hailoroundrobin -> inference -> tracker -> callback -> hailostreamrouter -> one display per source
+# The callback is called once for every frame of every source; roi.get_stream_id() tells which source
+# ('sink_0', 'sink_1', ... in the order of --inputs) the frame and its detections belong to.
+class GStreamerMultiStreamDetectionApp(GStreamerApp):
+    def __init__(self, app_callback, user_data):
+        parser = get_default_parser()
+        parser.add_argument(
+            "--inputs", nargs="+", required=True,
+            help="Input sources sharing the Hailo device, e.g. --inputs /dev/video0 /dev/video2 recording.mp4. \
+            Any source accepted by --input except rpi (use libcamera).",
+        )
+        parser.add_argument(
+            "--labels-json",
+            default=None,
+            help="Path to costume labels JSON file",
+        )
+        args = parser.parse_args()
+        # The extra outputs and the headless preview are single-stream, the router has one display branch per input
+        single_stream_outputs = {
+            '--record-file': args.record_file,
+            '--record-dir': args.record_dir,
+            '--udp-preview': args.udp_preview,
+            '--snapshot-dir': args.snapshot_dir,
+            '--preview-fps': args.preview_fps,
+            '--preview-path': args.preview_path != parser.get_default('preview_path'),
+        }
+        unsupported = [flag for flag, value in single_stream_outputs.items() if value]
+        if unsupported:
+            parser.error(f"{', '.join(unsupported)} can not be used with the multi-stream app")
+        # The single-source settings of the parent class follow the first input
+        args.input = args.inputs[0]
+        # Call the parent class constructor
+        super().__init__(args, user_data)
+        self.video_sources = args.inputs
+        if any(get_source_type(source) != "file" for source in self.video_sources):
+            self.sync = "false"
+        self.display_names = [f"hailo_display_{index}" for index in range(len(self.video_sources))]
+        # One frame of every source per batch
+        self.batch_size = len(self.video_sources)
+        nms_score_threshold = 0.3
+        nms_iou_threshold = 0.45
+
+        # Determine the architecture if not specified
+        if args.arch is None:
+            detected_arch = detect_hailo_arch()
+            if detected_arch is None:
+                raise ValueError("Could not auto-detect Hailo architecture. Please specify --arch manually.")
+            self.arch = detected_arch
+            print(f"Auto-detected Hailo architecture: {self.arch}")
+        else:
+            self.arch = args.arch
+
+        if args.hef_path is not None:
+            self.hef_path = args.hef_path
+        # Set the HEF file path based on the arch
+        elif self.arch == "hailo8":
+            self.hef_path = os.path.join(self.current_path, '../resources/yolov8m.hef')
+        else:  # hailo8l
+            self.hef_path = os.path.join(self.current_path, '../resources/yolov8s_h8l.hef')
+
+        # Set the post-processing shared object file
+        self.post_process_so = os.path.join(self.current_path, '../resources/libyolo_hailortpp_postprocess.so')
+        self.post_function_name = "filter_letterbox"
+        # User-defined label JSON file
+        self.labels_json = args.labels_json
+
+        self.app_callback = app_callback
+
+        self.thresholds_str = (
+            f"nms-score-threshold={nms_score_threshold} "
+            f"nms-iou-threshold={nms_iou_threshold} "
+            f"output-format-type=HAILO_FORMAT_TYPE_FLOAT32"
+        )
+
+        # Batch size and scheduler settings from the command line or a previous --auto-tune
+        self.apply_inference_tuning()
+
+        # Set the process title
+        lazy_import('setproctitle').setproctitle("Hailo Multi-Stream Detection App")
+
+        self.create_pipeline()
+
+    def on_fps_measurement(self, sink, fps, droprate, avgfps):
+        print(f"{sink.get_name()} FPS: {fps:.2f}, Droprate: {droprate:.2f}, Avg FPS: {avgfps:.2f}")
+        return True
+
+    def get_inference_pipeline(self):
+        detection_pipeline = INFERENCE_PIPELINE(
+            hef_path=self.hef_path,
+            post_process_so=self.post_process_so,
+            post_function_name=self.post_function_name,
+            batch_size=self.batch_size,
+            config_json=self.labels_json,
+            additional_params=self.thresholds_str,
+            scheduler_timeout_ms=self.scheduler_timeout_ms,
+            scheduler_priority=self.scheduler_priority,
+            **self.pipeline_plan.inference_args)
+        # The same --roi-file applies to every stream
+        return INFERENCE_PIPELINE_WRAPPER(detection_pipeline, crop_so=self.inference_crop_so)
+
+    def plan_conversions(self):
+        # The inputs differ, so only the inference side is planned
+        return lazy_import('hailo_apps_infra.pipeline_planner').plan_conversions(
+            None,
+            self.hef_path,
+            self.video_width,
+            self.video_height,
+            self.video_format,
+            resized_by_cropper=True,
+        )
+
+    def get_stream_display_pipeline(self, index):
+        # Extra outputs (--record-file, --udp-preview, ...) are single-stream and rejected in __init__
+        name = self.display_names[index]
+        if self.headless:
+            return HEADLESS_PIPELINE(sync=self.sync, name=name)
+        return DISPLAY_PIPELINE(video_sink=self.video_sink, sync=self.sync, show_fps=self.show_fps, name=name)
+
+    def get_pipeline_description(self):
+        sources_pipeline = MULTI_SOURCE_PIPELINE(self.video_sources, self.video_width, self.video_height, decode_chain=self.decode_chain)
+        detection_pipeline_wrapper = self.get_inference_pipeline()
+        # hailotracker keeps separate tracks per stream id
+        tracker_pipeline = TRACKER_PIPELINE(class_id=-1, **TRACKER_PRESETS[self.options_menu.tracker_preset])
+        user_callback_pipeline = USER_CALLBACK_PIPELINE()
+        router_pipeline = STREAM_ROUTER_PIPELINE(
+            [self.get_stream_display_pipeline(index) for index in range(len(self.video_sources))]
+        )
+        return (
+            PipelineDescription()
+            .add('source', sources_pipeline)
+            .add('inference', detection_pipeline_wrapper)
+            .add('tracker', tracker_pipeline)
+            .add('callback', user_callback_pipeline)
+            .add('display', router_pipeline)
+        )
+
+    def setup_metrics(self):
+        # Per-stream frame counts on the router outputs (request pads already linked by parse_launch)
+        router = self.pipeline.get_by_name("router")
+        self.metrics.append(StreamFpsCounter({
+            f"sink_{index}": router.get_static_pad(f"src_{index}") for index in range(len(self.video_sources))
+        }))
+        super().setup_metrics()
+
+if __name__ == "__main__":
+    # Create an instance of the user app callback class
+    user_data = app_callback_class()
+    app_callback = dummy_callback
+    app = GStreamerMultiStreamDetectionApp(app_callback, user_data)
+    app.run()
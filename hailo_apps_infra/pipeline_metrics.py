@@ -0,0 +1,249 @@
+import json
+import threading
+import time
+import gi
+gi.require_version('Gst', '1.0')
+from gi.repository import Gst, GLib
+from hailo_apps_infra.startup_profile import lazy_import
+
+# -----------------------------------------------------------------------------------------------
+# Pipeline metrics
+# -----------------------------------------------------------------------------------------------
+# Metric collectors are attached to a running pipeline and registered in GStreamerApp.metrics.
+# Each collector implements report() returning a list of text lines; GStreamerApp prints all reports
+# at shutdown and every --metrics-interval seconds.
+
+# Upper bound of the entry timestamps kept for buffers that have not reached the exit pad yet
+MAX_IN_FLIGHT = 256
+
+def pop_entered(entered, pts):
+    """
+    Pops and returns the entry time of the buffer with this pts from an insertion-ordered {pts: time} dict, or None.
+    Buffers leave in the order they entered, so older entries belong to buffers dropped on the way and are discarded.
+    """
+    if pts not in entered:
+        return None
+    while True:
+        key, start = next(iter(entered.items()))
+        del entered[key]
+        if key == pts:
+            return start
+
+def add_entered(entered, pts, now):
+    # Buffers without a timestamp can not be matched at the exit pad
+    if pts == Gst.CLOCK_TIME_NONE:
+        return
+    entered[pts] = now
+    if len(entered) > MAX_IN_FLIGHT:
+        del entered[next(iter(entered))]
+
+def count_detections(buffer):
+    """
+    Returns the number of HAILO_DETECTION objects attached to the buffer.
+    """
+    hailo = lazy_import('hailo')
+    return len(hailo.get_roi_from_buffer(buffer).get_objects_typed(hailo.HAILO_DETECTION))
+
+
+class ElementTimer:
+    """
+    Measures the time a buffer spends inside an element (from entering its sink pad to leaving its src pad),
+    bucketed by the number of objects on the outgoing buffer.
+    Intended for in-place elements such as hailotracker, hailofilter or identity.
+    """
+    def __init__(self, element, count_objects=count_detections):
+        self.name = element.get_name()
+        self.count_objects = count_objects
+        self.entered = {}
+        self.buckets = {}  # objects -> [frames, total seconds, max seconds]
+        self.lock = threading.Lock()
+        element.get_static_pad('sink').add_probe(Gst.PadProbeType.BUFFER, self.on_sink_buffer)
+        element.get_static_pad('src').add_probe(Gst.PadProbeType.BUFFER, self.on_src_buffer)
+
+    def on_sink_buffer(self, pad, info):
+        with self.lock:
+            add_entered(self.entered, info.get_buffer().pts, time.perf_counter())
+        return Gst.PadProbeReturn.OK
+
+    def on_src_buffer(self, pad, info):
+        buffer = info.get_buffer()
+        with self.lock:
+            start = pop_entered(self.entered, buffer.pts)
+        if start is None:
+            return Gst.PadProbeReturn.OK
+        elapsed = time.perf_counter() - start
+        objects = self.count_objects(buffer) if self.count_objects else 0
+        with self.lock:
+            bucket = self.buckets.setdefault(objects, [0, 0.0, 0.0])
+            bucket[0] += 1
+            bucket[1] += elapsed
+            bucket[2] = max(bucket[2], elapsed)
+        return Gst.PadProbeReturn.OK
+
+    def report(self):
+        with self.lock:
+            buckets = sorted(self.buckets.items())
+        lines = [f"{self.name} time per frame by number of objects:",
+                 f"  {'objects':>8} {'frames':>8} {'mean ms':>9} {'max ms':>9}"]
+        total_frames, total_time = 0, 0.0
+        for objects, (frames, elapsed, max_elapsed) in buckets:
+            lines.append(f"  {objects:>8} {frames:>8} {1000 * elapsed / frames:>9.2f} {1000 * max_elapsed:>9.2f}")
+            total_frames += frames
+            total_time += elapsed
+        if total_frames:
+            lines.append(f"  {'all':>8} {total_frames:>8} {1000 * total_time / total_frames:>9.2f}")
+        return lines
+
+
+class StreamFpsCounter:
+    """
+    Counts frames per stream on a set of pads (e.g. the hailostreamrouter src pads of a multi-source pipeline)
+    and reports the per-stream FPS since the previous report and over the whole run.
+    """
+    def __init__(self, pads):
+        """
+        Args:
+            pads (dict): Stream name -> Gst.Pad to count buffers on.
+        """
+        self.frames = {stream: 0 for stream in pads}
+        self.reported_frames = dict(self.frames)
+        self.start_time = self.report_time = time.perf_counter()
+        self.lock = threading.Lock()
+        for stream, pad in pads.items():
+            pad.add_probe(Gst.PadProbeType.BUFFER, self.on_buffer, stream)
+
+    def on_buffer(self, pad, info, stream):
+        with self.lock:
+            self.frames[stream] += 1
+        return Gst.PadProbeReturn.OK
+
+    def report(self):
+        now = time.perf_counter()
+        with self.lock:
+            frames = dict(self.frames)
+        interval = max(now - self.report_time, 1e-6)
+        elapsed = max(now - self.start_time, 1e-6)
+        lines = ["Per-stream FPS:", f"  {'stream':>10} {'frames':>8} {'fps':>7} {'avg fps':>8}"]
+        for stream, count in frames.items():
+            fps = (count - self.reported_frames[stream]) / interval
+            lines.append(f"  {stream:>10} {count:>8} {fps:>7.2f} {count / elapsed:>8.2f}")
+        self.reported_frames = frames
+        self.report_time = now
+        return lines
+
+
+class QueueMonitor:
+    """
+    Samples the fill level (current-level-buffers) of every queue in the pipeline and counts overruns, for
+    queue size / leaky policy tuning (see queue_tuning). Frames are counted on frame_pad to measure the throughput.
+    """
+    def __init__(self, pipeline, frame_pad, interval_ms=50, telemetry_path=None):
+        """
+        Args:
+            pipeline (Gst.Pipeline): The running pipeline.
+            frame_pad (Gst.Pad): Pad counting the processed frames (e.g. the identity_callback src pad).
+            interval_ms (int): Sampling interval.
+            telemetry_path (str, optional): Also write every sample to this JSONL file.
+        """
+        self.queues = {}
+        iterator = pipeline.iterate_recurse()
+        while True:
+            result, element = iterator.next()
+            if result != Gst.IteratorResult.OK:
+                break
+            factory = element.get_factory()
+            if factory is not None and factory.get_name() == 'queue':
+                self.queues[element.get_name()] = element
+        self.overruns = {name: 0 for name in self.queues}
+        for name, queue in self.queues.items():
+            queue.connect('overrun', self.on_overrun, name)
+        self.stats = lazy_import('hailo_apps_infra.queue_tuning').QueueStats({
+            name: {'max-size-buffers': queue.get_property('max-size-buffers'), 'leaky': queue.get_property('leaky').value_nick}
+            for name, queue in self.queues.items()
+        })
+        self.frames = 0
+        self.start_time = time.perf_counter()
+        self.lock = threading.Lock()
+        frame_pad.add_probe(Gst.PadProbeType.BUFFER, self.on_frame)
+        self.telemetry_file = None
+        self.closed = False
+        if telemetry_path:
+            self.telemetry_file = open(telemetry_path, 'w')
+            self.telemetry_file.write(json.dumps({'queues': self.stats.queues}) + '\n')
+        GLib.timeout_add(interval_ms, self.sample)
+
+    def on_overrun(self, queue, name):
+        # Called from the streaming thread when the queue is full
+        with self.lock:
+            self.overruns[name] += 1
+
+    def on_frame(self, pad, info):
+        with self.lock:
+            self.frames += 1
+        return Gst.PadProbeReturn.OK
+
+    def sample(self):
+        if self.closed:
+            return False
+        levels = {name: queue.get_property('current-level-buffers') for name, queue in self.queues.items()}
+        with self.lock:
+            frames, overruns = self.frames, dict(self.overruns)
+        t = round(time.perf_counter() - self.start_time, 4)
+        self.stats.add_sample(t, frames, levels, overruns)
+        if self.telemetry_file is not None:
+            self.telemetry_file.write(json.dumps({'t': t, 'frames': frames, 'levels': levels, 'overruns': overruns}) + '\n')
+        return True
+
+    def close(self):
+        self.closed = True
+        if self.telemetry_file is not None:
+            self.telemetry_file.close()
+            self.telemetry_file = None
+
+    def report(self):
+        return self.stats.report()
+
+
+# parse_qos_stats() reports processed / dropped as -1 (G_MAXUINT64 through the bindings) when the element does not know them
+QOS_UNKNOWN_COUNTS = (-1, 2 ** 64 - 1)
+
+class QosCounters:
+    """
+    Per-element counters of the QoS messages posted on the bus (by elements with qos enabled, see apply_qos_policy):
+    buffers processed and dropped, jitter and proportion. Fed from GStreamerApp.bus_call.
+    """
+    def __init__(self):
+        self.elements = {}  # name -> {'messages', 'processed', 'dropped', 'jitter_sum', 'jitter_max', 'proportion'}
+        self.lock = threading.Lock()
+
+    def on_message(self, message):
+        _format, processed, dropped = message.parse_qos_stats()
+        jitter, proportion, _quality = message.parse_qos_values()
+        name = message.src.get_name()
+        with self.lock:
+            counters = self.elements.setdefault(name, {
+                'messages': 0, 'processed': 0, 'dropped': 0, 'jitter_sum': 0, 'jitter_max': 0, 'proportion': 1.0,
+            })
+            counters['messages'] += 1
+            # processed / dropped are running totals of the element, unknown values are skipped
+            if processed not in QOS_UNKNOWN_COUNTS:
+                counters['processed'] = max(counters['processed'], processed)
+            if dropped not in QOS_UNKNOWN_COUNTS:
+                counters['dropped'] = max(counters['dropped'], dropped)
+            counters['jitter_sum'] += jitter
+            counters['jitter_max'] = max(counters['jitter_max'], jitter)
+            counters['proportion'] = proportion
+
+    def report(self):
+        with self.lock:
+            elements = {name: dict(counters) for name, counters in self.elements.items()}
+        if not elements:
+            return []
+        lines = ["QoS per element:",
+                 f"  {'element':<28} {'messages':>8} {'processed':>10} {'dropped':>8} {'jitter ms':>10} {'max ms':>8} {'proportion':>10}"]
+        for name, counters in sorted(elements.items()):
+            # jitter is in nanoseconds, positive when the buffer arrived late
+            jitter_ms = counters['jitter_sum'] / counters['messages'] / Gst.MSECOND
+            lines.append(f"  {name:<28} {counters['messages']:>8} {counters['processed']:>10} {counters['dropped']:>8} "
+                         f"{jitter_ms:>10.2f} {counters['jitter_max'] / Gst.MSECOND:>8.2f} {counters['proportion']:>10.3f}")
+        return lines
@@ -0,0 +1,263 @@
+import fnmatch
+import functools
+import json
+import re
+
+# -----------------------------------------------------------------------------------------------
+# Pipeline description model
+# -----------------------------------------------------------------------------------------------
+# The helper functions in gstreamer_helper_pipelines return gst-launch strings. PipelineDescription keeps the
+# stages an app concatenates (source, inference wrapper, tracker, callback, display, ...) as objects, so the
+# pipeline can be validated, pretty-printed, diffed against another deployment and saved / loaded as JSON before
+# it is handed to Gst.parse_launch. Queue sizes and leaky policies can be changed per deployment with set_queue().
+#
+# Parsing only understands what the helpers generate: elements with key=value properties, caps, and
+# "name." / "name.pad" references for branches. Tokenized stage strings are cached, so rebuilding the same
+# template (e.g. per batch file or per auto-tune trial) does not tokenize it again.
+
+QUEUE_LEAKY_VALUES = ('no', 'upstream', 'downstream')
+
+# A token is a run of non-whitespace characters and quoted strings, so location="/tmp/my file.mp4" stays one token
+TOKEN_PATTERN = re.compile(r'(?:[^\s"\']+|"[^"]*"|\'[^\']*\')+')
+
+@functools.lru_cache(maxsize=64)
+def tokenize_pipeline(pipeline_string):
+    """
+    Splits a gst-launch string into links.
+
+    Args:
+        pipeline_string (str): The pipeline string.
+
+    Returns:
+        tuple: One tuple of tokens per "!"-separated link. Quoted values keep their quotes.
+    """
+    links, tokens = [], []
+    for token in TOKEN_PATTERN.findall(pipeline_string):
+        if token == '!':
+            links.append(tuple(tokens))
+            tokens = []
+        else:
+            tokens.append(token)
+    links.append(tuple(tokens))
+    return tuple(links)
+
+
+class PipelineElement:
+    """
+    An element of a link: a GStreamer element with its properties, a caps filter or a "name." reference.
+    """
+    def __init__(self, factory, properties=None, kind='element'):
+        """
+        Args:
+            factory (str): The element factory name, the caps string or the reference.
+            properties (dict, optional): Element properties as strings, in pipeline order.
+            kind (str): 'element', 'caps' or 'reference'.
+        """
+        self.factory = factory
+        self.properties = dict(properties or {})
+        self.kind = kind
+
+    @property
+    def name(self):
+        return self.properties.get('name')
+
+    def to_string(self):
+        if self.kind != 'element':
+            return self.factory
+        return ' '.join([self.factory] + [f'{key}={value}' for key, value in self.properties.items()])
+
+    def to_dict(self):
+        return {'factory': self.factory, 'properties': self.properties, 'kind': self.kind}
+
+
+def parse_link(tokens):
+    """
+    Returns the PipelineElements of one link (the tokens between two "!").
+    """
+    elements = []
+    for token in tokens:
+        if elements and elements[-1].kind == 'caps' and elements[-1].factory.endswith(','):
+            # Caps written with spaces after the commas: video/x-raw, format=RGB, width=640
+            elements[-1].factory += f' {token}'
+        elif '=' in token and not token.startswith('"') and elements and elements[-1].kind == 'element':
+            key, value = token.split('=', 1)
+            elements[-1].properties[key] = value
+        elif '/' in token.split(',')[0] and '=' not in token.split(',')[0]:
+            elements.append(PipelineElement(token, kind='caps'))
+        elif '.' in token and '=' not in token:
+            elements.append(PipelineElement(token, kind='reference'))
+        else:
+            elements.append(PipelineElement(token))
+    return elements
+
+
+class PipelineStage:
+    """
+    A named part of the pipeline, as returned by one helper (SOURCE_PIPELINE, INFERENCE_PIPELINE_WRAPPER, ...).
+    """
+    def __init__(self, kind, pipeline_string):
+        """
+        Args:
+            kind (str): The stage role: 'source', 'inference', 'tracker', 'callback', 'display', ...
+            pipeline_string (str): The helper output.
+        """
+        self.kind = kind
+        self.links = [parse_link(tokens) for tokens in tokenize_pipeline(pipeline_string.strip())]
+
+    def elements(self):
+        return [element for link in self.links for element in link]
+
+    def to_string(self):
+        return ' ! '.join(' '.join(element.to_string() for element in link) for link in self.links)
+
+    def to_dict(self):
+        return {'kind': self.kind, 'pipeline': self.to_string()}
+
+
+class PipelineDescription:
+    """
+    The ordered stages of an app pipeline. to_string() links the stages with "!" as the apps used to.
+    """
+    def __init__(self, stages=None):
+        self.stages = list(stages or [])
+
+    def add(self, kind, pipeline_string):
+        self.stages.append(PipelineStage(kind, pipeline_string))
+        return self
+
+    def elements(self):
+        return [element for stage in self.stages for element in stage.elements()]
+
+    def named_elements(self):
+        return {element.name: element for element in self.elements() if element.kind == 'element' and element.name}
+
+    def to_string(self):
+        return ' ! '.join(stage.to_string() for stage in self.stages)
+
+    def validate(self, element_available=None):
+        """
+        Checks the description before Gst.parse_launch.
+
+        Args:
+            element_available (callable, optional): Returns False for factories not installed on this machine
+                (e.g. gstreamer_app.element_available). Factories are not checked if None.
+
+        Returns:
+            list: Problem descriptions, empty if none were found.
+        """
+        problems = []
+        names = {}
+        for stage in self.stages:
+            if not any(stage.links):
+                problems.append(f"stage '{stage.kind}' is empty")
+            for element in stage.elements():
+                if element.kind != 'element':
+                    continue
+                if element.name in names:
+                    problems.append(f"element name '{element.name}' is used in '{names[element.name]}' and '{stage.kind}'")
+                elif element.name:
+                    names[element.name] = stage.kind
+                if element.factory == 'queue' and element.properties.get('leaky', 'no') not in QUEUE_LEAKY_VALUES:
+                    problems.append(f"queue '{element.name}' has an invalid leaky value '{element.properties['leaky']}'")
+                if element_available is not None and not element_available(element.factory):
+                    problems.append(f"element '{element.factory}' ({element.name or stage.kind}) is not installed")
+        for element in self.elements():
+            if element.kind == 'reference' and element.factory.split('.')[0] not in names:
+                problems.append(f"'{element.factory}' refers to an unknown element")
+        return problems
+
+    def pretty(self):
+        """
+        Returns the pipeline as indented text: one block per stage, one line per element.
+        """
+        lines = []
+        for stage in self.stages:
+            lines.append(f"[{stage.kind}]")
+            for link in stage.links:
+                for element in link:
+                    if element.kind == 'element':
+                        properties = ' '.join(f'{key}={value}' for key, value in element.properties.items() if key != 'name')
+                        lines.append(f"  {element.factory:<20} {element.name or '':<32} {properties}".rstrip())
+                    else:
+                        lines.append(f"  {element.factory}")
+        return '\n'.join(lines)
+
+    def diff(self, other):
+        """
+        Compares the named elements of two descriptions.
+
+        Returns:
+            list: Lines describing the elements added, removed or changed in other.
+        """
+        mine, theirs = self.named_elements(), other.named_elements()
+        lines = []
+        for name in mine.keys() - theirs.keys():
+            lines.append(f"- {name} ({mine[name].factory})")
+        for name in theirs.keys() - mine.keys():
+            lines.append(f"+ {name} ({theirs[name].factory})")
+        for name in mine.keys() & theirs.keys():
+            before, after = mine[name].properties, theirs[name].properties
+            for key in sorted(before.keys() | after.keys()):
+                if before.get(key) != after.get(key):
+                    lines.append(f"~ {name}.{key}: {before.get(key)} -> {after.get(key)}")
+        return sorted(lines, key=lambda line: line[2:])
+
+    def set_queue(self, pattern, max_size_buffers=None, leaky=None):
+        """
+        Changes the queues whose name matches a glob pattern (e.g. 'inference_wrapper_*').
+
+        Returns:
+            int: The number of queues changed.
+        """
+        if leaky is not None and leaky not in QUEUE_LEAKY_VALUES:
+            raise ValueError(f"Invalid leaky value '{leaky}', expected one of {QUEUE_LEAKY_VALUES}")
+        changed = 0
+        for element in self.elements():
+            if element.factory != 'queue' or not element.name or not fnmatch.fnmatch(element.name, pattern):
+                continue
+            if max_size_buffers is not None:
+                element.properties['max-size-buffers'] = str(max_size_buffers)
+            if leaky is not None:
+                element.properties['leaky'] = leaky
+            changed += 1
+        return changed
+
+    def to_dict(self):
+        return {'stages': [stage.to_dict() for stage in self.stages]}
+
+    @classmethod
+    def from_dict(cls, config):
+        return cls([PipelineStage(stage['kind'], stage['pipeline']) for stage in config['stages']])
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+
+def check_round_trip():
+    """
+    Checks that a quoted property value with spaces stays one property through parsing, to_string() and JSON.
+    Run with: python -m hailo_apps_infra.pipeline_model
+    """
+    location = '"/tmp/my  recording.mp4"'
+    pipeline_string = f'filesrc location={location} name=source ! decodebin name=source_decodebin ! fakesink'
+    description = PipelineDescription().add('source', pipeline_string)
+    element = description.named_elements()['source']
+    if element.properties.get('location') != location:
+        raise AssertionError(f"location parsed as {element.properties.get('location')!r}, expected {location!r}")
+    if description.to_string() != pipeline_string:
+        raise AssertionError(f"to_string() returned {description.to_string()!r}, expected {pipeline_string!r}")
+    if PipelineDescription.from_dict(json.loads(json.dumps(description.to_dict()))).to_string() != pipeline_string:
+        raise AssertionError("The JSON round trip changed the pipeline")
+    problems = description.validate()
+    if problems:
+        raise AssertionError(f"Unexpected validation problems: {problems}")
+    print("Pipeline model round-trip check passed")
+
+if __name__ == "__main__":
+    check_round_trip()
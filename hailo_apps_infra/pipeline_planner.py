@@ -0,0 +1,105 @@
+import os
+import gi
+gi.require_version('Gst', '1.0')
+from gi.repository import Gst
+from hailo_apps_infra.startup_profile import lazy_import
+from hailo_apps_infra.gstreamer_helper_pipelines import get_source_type
+
+# -----------------------------------------------------------------------------------------------
+# Conversion planner
+# -----------------------------------------------------------------------------------------------
+# The default pipeline scales / converts in SOURCE_PIPELINE, again in INFERENCE_PIPELINE, and hailocropper resizes
+# (letterboxes) on top. Elements whose input already matches their output only cost a queue hop and a thread.
+# The planner looks at the source (Discoverer for files), the HEF input shape (hailo_platform, if installed) and
+# the inference wrapper, and returns the SOURCE_PIPELINE / INFERENCE_PIPELINE arguments that drop those elements.
+# It only removes elements it can prove redundant; anything unknown keeps the default chain.
+
+def get_hef_input_shape(hef_path):
+    """
+    Returns the (height, width, channels) of the first HEF input, or None if hailo_platform is not installed.
+    """
+    try:
+        hailo_platform = lazy_import('hailo_platform')
+        return tuple(hailo_platform.HEF(hef_path).get_input_vstream_infos()[0].shape)
+    except Exception as e:
+        print(f"Conversion planner: could not read the HEF input shape ({e})")
+        return None
+
+def get_source_size(video_source):
+    """
+    Returns the (width, height) of a video file, or None if it can not be discovered.
+    """
+    try:
+        gi.require_version('GstPbutils', '1.0')
+        from gi.repository import GstPbutils
+        Gst.init(None)
+        discoverer = GstPbutils.Discoverer.new(5 * Gst.SECOND)
+        info = discoverer.discover_uri(Gst.filename_to_uri(os.path.abspath(video_source)))
+        stream = info.get_video_streams()[0]
+        return stream.get_width(), stream.get_height()
+    except Exception as e:
+        print(f"Conversion planner: could not discover {video_source} ({e})")
+        return None
+
+
+class PipelinePlan:
+    """
+    Keyword arguments for SOURCE_PIPELINE (source_args) and INFERENCE_PIPELINE (inference_args),
+    and the list of elements removed from the default chain with the reason.
+    The default plan keeps every element.
+    """
+    def __init__(self):
+        self.source_args = {}
+        self.inference_args = {}
+        self.removed = []  # (element, reason)
+
+    def remove(self, args, key, element, reason):
+        args[key] = False
+        self.removed.append((element, reason))
+
+    def report(self):
+        if not self.removed:
+            return ["Conversion planner: no redundant conversions found"]
+        lines = [f"Conversion planner removed {len(self.removed)} element(s):"]
+        lines += [f"  {element}: {reason}" for element, reason in self.removed]
+        return lines
+
+def plan_conversions(video_source, hef_path, video_width, video_height, video_format='RGB', resized_by_cropper=True):
+    """
+    Plans the scale / convert steps between the source and hailonet.
+
+    Args:
+        video_source (str or None): The app input. None skips the source planning (e.g. several inputs).
+        hef_path (str): The HEF file.
+        video_width (int): The frame width after SOURCE_PIPELINE.
+        video_height (int): The frame height after SOURCE_PIPELINE.
+        video_format (str): The frame format after SOURCE_PIPELINE.
+        resized_by_cropper (bool): False when the inference branch does not start with the whole-buffer
+            hailocropper output (tiling).
+
+    Returns:
+        PipelinePlan: The plan.
+    """
+    plan = PipelinePlan()
+    source_type = get_source_type(video_source) if video_source is not None else None
+
+    # Source: the RPi camera appsrc is configured at the output size and format already,
+    # a file only needs scaling when its resolution differs from the app resolution
+    if source_type == 'rpi':
+        plan.remove(plan.source_args, 'scale', 'source_videoscale', f'appsrc already delivers {video_width}x{video_height}')
+        plan.remove(plan.source_args, 'convert', 'source_convert', f'appsrc already delivers {video_format}')
+    elif source_type == 'file':
+        source_size = get_source_size(video_source)
+        if source_size == (video_width, video_height):
+            plan.remove(plan.source_args, 'scale', 'source_videoscale', f'the file is already {video_width}x{video_height}')
+
+    # Inference: the whole-buffer hailocropper of INFERENCE_PIPELINE_WRAPPER resizes (letterboxes) every frame to the
+    # hailonet input caps, so the inner videoscale never changes the frame. A static ROI is cropped and scaled by the
+    # same hailocropper (roi.InferenceRoi), so it does not change this.
+    if resized_by_cropper:
+        plan.remove(plan.inference_args, 'scale', 'inference_videoscale', 'hailocropper already resizes to the HEF input')
+    hef_shape = get_hef_input_shape(hef_path) if hef_path else None
+    if hef_shape is not None and hef_shape[-1] == 3 and video_format == 'RGB':
+        plan.remove(plan.inference_args, 'convert', 'inference_videoconvert',
+                    f'the frame is already RGB as the {hef_shape[1]}x{hef_shape[0]}x3 HEF input expects')
+    return plan
@@ -0,0 +1,200 @@
+import argparse
+import fnmatch
+import json
+import sys
+from hailo_apps_infra.recording import write_json_atomic
+
+# -----------------------------------------------------------------------------------------------
+# Queue size / leaky policy tuning
+# -----------------------------------------------------------------------------------------------
+# Every queue holds 3 buffers and blocks (leaky=no) by default. A queue that stays full in front of a slower element
+# only adds max-size-buffers frame periods of latency; a queue that never fills can be smaller.
+# QueueMonitor (pipeline_metrics) samples the fill level of every queue while the app runs (--queue-telemetry,
+# --tune-queues). suggest_queue_config() turns the recorded statistics into per-queue sizes and leaky policies,
+# and the result is persisted as a queue config file applied with --queue-config.
+#
+# Queue config file:
+#   {"target_fps": 30, "measured_fps": 24.8,
+#    "queues": {"inference_wrapper_input_q": {"max-size-buffers": 1, "leaky": "downstream"},
+#               "source_*": {"max-size-buffers": 2}}}
+# Queue names may be glob patterns.
+#
+# Telemetry file (JSONL): a header line {"queues": {name: {"max-size-buffers": n, "leaky": policy}}} followed by
+# one sample per line {"t": seconds, "frames": frames at the callback, "levels": {name: buffers}, "overruns": {name: n}}.
+#
+# Offline usage:
+#   python -m hailo_apps_infra.queue_tuning queue_telemetry.jsonl --target-fps 30 --output queues.json
+
+# Only these queues may drop frames: the queue in front of the inference wrapper (the freshest frame is inferred) and
+# the display branches (hailo_display_<i>_* in the multi-stream app). Queues between hailocropper and hailoaggregator
+# must never drop, the aggregator would wait forever.
+DEFAULT_LEAKY_ALLOWED = ['inference_wrapper_input_q', 'hailo_display_q', '*_display_q', 'hailo_display_*_q']
+# A queue is considered full (waiting on a slower downstream element) when it was full in this fraction of samples
+FULL_FRACTION = 0.1
+
+
+class QueueStats:
+    """
+    Running fill-level statistics of a set of queues.
+    """
+    def __init__(self, queues):
+        """
+        Args:
+            queues (dict): Queue name -> {'max-size-buffers': int, 'leaky': str}.
+        """
+        self.queues = queues
+        self.samples = 0
+        self.level_sum = {name: 0 for name in queues}
+        self.level_max = {name: 0 for name in queues}
+        self.full_samples = {name: 0 for name in queues}
+        self.overruns = {name: 0 for name in queues}
+        self.first_sample = None  # (t, frames)
+        self.last_sample = None
+
+    def add_sample(self, t, frames, levels, overruns=None):
+        self.samples += 1
+        for name, level in levels.items():
+            if name not in self.queues:
+                continue
+            self.level_sum[name] += level
+            self.level_max[name] = max(self.level_max[name], level)
+            if level >= self.queues[name]['max-size-buffers'] > 0:
+                self.full_samples[name] += 1
+        for name, count in (overruns or {}).items():
+            if name in self.overruns:
+                self.overruns[name] = count
+        if self.first_sample is None:
+            self.first_sample = (t, frames)
+        self.last_sample = (t, frames)
+
+    def get_fps(self):
+        if self.first_sample is None or self.last_sample[0] <= self.first_sample[0]:
+            return 0.0
+        return (self.last_sample[1] - self.first_sample[1]) / (self.last_sample[0] - self.first_sample[0])
+
+    def get_queue_stats(self, name):
+        samples = max(self.samples, 1)
+        return {
+            'mean': self.level_sum[name] / samples,
+            'max': self.level_max[name],
+            'full_fraction': self.full_samples[name] / samples,
+            'overruns': self.overruns[name],
+        }
+
+    def report(self):
+        fps = self.get_fps()
+        lines = [f"Queue fill levels ({self.samples} samples, {fps:.1f} FPS at the callback):",
+                 f"  {'queue':<34} {'size':>5} {'leaky':>10} {'mean':>6} {'max':>4} {'full %':>7} {'wait ms':>8}"]
+        total_wait = 0.0
+        for name, settings in self.queues.items():
+            stats = self.get_queue_stats(name)
+            # Little's law: buffers waiting / throughput
+            wait_ms = 1000 * stats['mean'] / fps if fps else 0.0
+            total_wait += wait_ms
+            lines.append(f"  {name:<34} {settings['max-size-buffers']:>5} {settings['leaky']:>10} {stats['mean']:>6.2f} "
+                         f"{stats['max']:>4} {100 * stats['full_fraction']:>7.1f} {wait_ms:>8.1f}")
+        lines.append(f"  Estimated queueing latency: {total_wait:.1f} ms")
+        return lines
+
+
+def read_telemetry(path):
+    """
+    Returns the QueueStats of a telemetry file written with --queue-telemetry.
+    """
+    with open(path) as f:
+        header = json.loads(f.readline())
+        stats = QueueStats(header['queues'])
+        for line in f:
+            if line.strip():
+                sample = json.loads(line)
+                stats.add_sample(sample['t'], sample['frames'], sample['levels'], sample.get('overruns'))
+    return stats
+
+def suggest_queue_config(stats, target_fps=0, leaky_allowed=DEFAULT_LEAKY_ALLOWED):
+    """
+    Suggests per-queue sizes and leaky policies that minimize queueing latency at the target FPS.
+
+    A queue that is often full waits on a slower element downstream: if it may drop frames it becomes a
+    1-buffer leaky queue (the freshest frame goes on, stale frames are dropped), otherwise it keeps its size since
+    more buffers would only add latency. A queue that is rarely full is shrunk to its observed maximum plus one.
+    Wrapper bypass queues keep their size: they must hold every frame in flight in the inference branch (a batch plus
+    the inner queues), and a sampled maximum can miss that peak, which would stall hailoaggregator.
+
+    Args:
+        stats (QueueStats): The recorded statistics.
+        target_fps (float): The required throughput, 0 uses the measured FPS.
+        leaky_allowed (list): Glob patterns of the queues allowed to drop frames.
+
+    Returns:
+        dict: The queue config (see the module comment).
+    """
+    measured_fps = stats.get_fps()
+    target_fps = target_fps or measured_fps
+    below_target = measured_fps < 0.95 * target_fps
+    queues = {}
+    for name, settings in stats.queues.items():
+        queue_stats = stats.get_queue_stats(name)
+        size, leaky = settings['max-size-buffers'], settings['leaky']
+        may_leak = any(fnmatch.fnmatch(name, pattern) for pattern in leaky_allowed)
+        if queue_stats['full_fraction'] > FULL_FRACTION or queue_stats['overruns']:
+            if may_leak and (below_target or leaky != 'no'):
+                size, leaky = 1, 'downstream'
+        elif size > 0 and not name.endswith('_bypass_q'):
+            size = min(size, max(queue_stats['max'] + 1, 2))
+        queues[name] = {'max-size-buffers': size, 'leaky': leaky}
+    return {'target_fps': target_fps, 'measured_fps': round(measured_fps, 2), 'queues': queues}
+
+def load_queue_config(path):
+    with open(path) as f:
+        return json.load(f)
+
+def save_queue_config(path, config):
+    write_json_atomic(path, config)
+
+def apply_queue_config(description, config):
+    """
+    Applies a queue config to a pipeline_model.PipelineDescription.
+
+    Returns:
+        list: The queue names / patterns that matched no queue.
+    """
+    unmatched = []
+    for pattern, settings in config.get('queues', {}).items():
+        changed = description.set_queue(pattern, max_size_buffers=settings.get('max-size-buffers'), leaky=settings.get('leaky'))
+        if not changed:
+            unmatched.append(pattern)
+    return unmatched
+
+def format_queue_config_changes(stats, config):
+    lines = ["Suggested queue settings:"]
+    for name, settings in config['queues'].items():
+        current = stats.queues[name]
+        if settings != current:
+            lines.append(f"  {name}: max-size-buffers {current['max-size-buffers']} -> {settings['max-size-buffers']}, "
+                         f"leaky {current['leaky']} -> {settings['leaky']}")
+    if len(lines) == 1:
+        lines.append("  no changes")
+    return lines
+
+def main():
+    parser = argparse.ArgumentParser(description="Suggest queue sizes and leaky policies from recorded queue telemetry")
+    parser.add_argument("telemetry", type=str, help="Telemetry file written with --queue-telemetry")
+    parser.add_argument("--target-fps", type=float, default=0, help="Required FPS. Default is the measured FPS.")
+    parser.add_argument("--leaky-allowed", nargs="+", default=DEFAULT_LEAKY_ALLOWED,
+                        help="Glob patterns of the queues allowed to drop frames.")
+    parser.add_argument("--output", "-o", type=str, default=None, help="Write the queue config (for --queue-config) to this file")
+    args = parser.parse_args()
+
+    stats = read_telemetry(args.telemetry)
+    if not stats.samples:
+        print(f"No samples in {args.telemetry}", file=sys.stderr)
+        sys.exit(1)
+    config = suggest_queue_config(stats, args.target_fps, args.leaky_allowed)
+    print("\n".join(stats.report()))
+    print("\n".join(format_queue_config_changes(stats, config)))
+    if args.output:
+        save_queue_config(args.output, config)
+        print(f"Queue config saved to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+import collections
+import json
+import os
+import queue
+import threading
+import time
+from hailo_apps_infra.startup_profile import lazy_import
+from hailo_apps_infra.frame_gating import get_thumbnail, get_changed_fraction
+
+# -----------------------------------------------------------------------------------------------
+# Recording helpers
+# -----------------------------------------------------------------------------------------------
+
+def write_json_atomic(path, data):
+    """
+    Writes data as JSON so that the file on disk is always either the old or the new version,
+    even if power is lost during the write (write to a temp file, fsync, rename).
+    """
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class SegmentManifest:
+    """
+    Rolling manifest of finalized recording segments (see SEGMENTED_FILE_SINK_PIPELINE).
+    The manifest is rewritten atomically every time a segment is closed and lists only segments still on disk,
+    so after a power cut it describes exactly the playable segments.
+    """
+    def __init__(self, output_dir, manifest_name='manifest.json', segment_seconds=None):
+        self.output_dir = output_dir
+        self.path = os.path.join(output_dir, manifest_name)
+        self.segment_seconds = segment_seconds
+        self.segments = []
+        os.makedirs(output_dir, exist_ok=True)
+        # Keep segments from a previous run (e.g. before a power cut) in the manifest
+        if os.path.exists(self.path):
+            try:
+                with open(self.path) as f:
+                    self.segments = json.load(f).get('segments', [])
+            except (OSError, ValueError) as e:
+                print(f"Could not read segment manifest {self.path}, starting a new one: {e}")
+
+    def add_segment(self, location, running_time_ns=None):
+        """
+        Records a finalized segment and rewrites the manifest.
+
+        Args:
+            location (str): The path of the closed segment file.
+            running_time_ns (int, optional): The pipeline running time at which the segment was closed.
+        """
+        self.segments.append({
+            'file': os.path.basename(location),
+            'closed_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'running_time_s': None if running_time_ns is None else running_time_ns / 1e9,
+            'size_bytes': os.path.getsize(location) if os.path.exists(location) else None,
+        })
+        # Drop segments removed by splitmuxsink max-files
+        self.segments = [
+            segment for segment in self.segments
+            if os.path.exists(os.path.join(self.output_dir, segment['file']))
+        ]
+        write_json_atomic(self.path, {
+            'segment_seconds': self.segment_seconds,
+            'segments': self.segments,
+        })
+
+    def on_element_message(self, structure):
+        # Handles splitmuxsink element messages posted on the bus
+        if structure.get_name() != 'splitmuxsink-fragment-closed':
+            return
+        location = structure.get_string('location')
+        found, running_time = structure.get_uint64('running-time')
+        self.add_segment(location, running_time if found else None)
+        print(f"Recording segment closed: {location}")
+
+
+class EventRecorder:
+    """
+    Keeps the last pre_seconds of frames in memory as JPEG bytes and persists them, plus post_seconds of following frames,
+    whenever one of the trigger labels is detected. Nothing is written to disk while no trigger label is present.
+
+    Each event is stored in its own directory (event_<time>_<label>/) as a JPEG sequence with an event.json index
+    holding the per-frame timestamps, so the segment can be turned into a video at the correct timing.
+    Disk writes happen on a background thread so a slow SD card never stalls the pipeline.
+    """
+    def __init__(self, output_dir, trigger_labels, pre_seconds=5.0, post_seconds=5.0, min_confidence=0.0, jpeg_quality=80, max_queue=300):
+        self.output_dir = output_dir
+        self.trigger_labels = set(trigger_labels)
+        self.pre_seconds = pre_seconds
+        self.post_seconds = post_seconds
+        self.min_confidence = min_confidence
+        self.jpeg_quality = jpeg_quality
+        self.ring = collections.deque()  # (timestamp, jpeg bytes)
+        self.event = None
+        self.events_saved = 0
+        self.frames_dropped = 0
+        self.write_queue = queue.Queue(maxsize=max_queue)
+        self.writer = threading.Thread(target=self._writer_loop, daemon=True)
+        self.writer.start()
+        os.makedirs(output_dir, exist_ok=True)
+
+    def push(self, frame, detections, timestamp=None):
+        """
+        Adds a frame to the ring buffer and starts, extends or closes events.
+
+        Args:
+            frame (np.ndarray): The frame in BGR order (as used by cv2).
+            detections (list): (label, confidence) tuples detected in this frame.
+            timestamp (float, optional): Frame time in seconds. Defaults to time.monotonic().
+        """
+        cv2 = lazy_import('cv2')
+        if timestamp is None:
+            timestamp = time.monotonic()
+        ok, jpeg = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+        if not ok:
+            return
+
+        triggers = [label for label, confidence in detections
+                    if label in self.trigger_labels and confidence >= self.min_confidence]
+        if triggers:
+            if self.event is None:
+                self._open_event(timestamp, triggers[0])
+            self.event['deadline'] = timestamp + self.post_seconds
+            self.event['labels'].update(triggers)
+
+        if self.event is not None:
+            self._write_frame(timestamp, jpeg)
+            if timestamp > self.event['deadline']:
+                self._close_event()
+            return
+
+        self.ring.append((timestamp, jpeg))
+        while self.ring and self.ring[0][0] < timestamp - self.pre_seconds:
+            self.ring.popleft()
+
+    def close(self):
+        """
+        Closes the open event (if any) and waits for pending writes.
+        """
+        if self.event is not None:
+            self._close_event()
+        self.write_queue.put(None)
+        self.writer.join()
+
+    def _open_event(self, timestamp, label):
+        event_name = f"event_{time.strftime('%Y-%m-%d_%H-%M-%S')}_{label.replace(' ', '_')}"
+        self.event = {
+            'dir': os.path.join(self.output_dir, event_name),
+            'trigger_time': timestamp,
+            'deadline': timestamp + self.post_seconds,
+            'labels': set(),
+            'frames': [],
+        }
+        os.makedirs(self.event['dir'], exist_ok=True)
+        print(f"Event recording started: {event_name}")
+        # Flush the pre-event window
+        while self.ring:
+            self._write_frame(*self.ring.popleft())
+
+    def _write_frame(self, timestamp, jpeg):
+        index = len(self.event['frames'])
+        file_name = f'frame_{index:05d}.jpg'
+        try:
+            self.write_queue.put_nowait((os.path.join(self.event['dir'], file_name), jpeg))
+        except queue.Full:
+            self.frames_dropped += 1
+            return
+        self.event['frames'].append({'file': file_name, 'time_s': round(timestamp - self.event['trigger_time'], 4)})
+
+    def _close_event(self):
+        index = {
+            'trigger_labels': sorted(self.event['labels']),
+            'pre_seconds': self.pre_seconds,
+            'post_seconds': self.post_seconds,
+            'frames': self.event['frames'],
+        }
+        self.write_queue.put((os.path.join(self.event['dir'], 'event.json'), index))
+        self.events_saved += 1
+        print(f"Event recording saved: {self.event['dir']} ({len(self.event['frames'])} frames)")
+        self.event = None
+
+    def _writer_loop(self):
+        while True:
+            item = self.write_queue.get()
+            if item is None:
+                return
+            path, data = item
+            try:
+                if isinstance(data, dict):
+                    write_json_atomic(path, data)
+                else:
+                    with open(path, 'wb') as f:
+                        f.write(data.tobytes())
+            except OSError as e:
+                print(f"Error writing {path}: {e}")
+
+
+class FrameDeduplicator:
+    """
+    Decides whether a frame is worth writing to disk: frames whose downsampled difference to the last written frame
+    is below threshold are skipped. Every written frame gets a line in a JSONL timing file with its frame index
+    and the number of frames skipped before it, so a video can be rebuilt at the original timing by repeating
+    each image until the next one (see pictovid.py).
+    """
+    def __init__(self, threshold=0.01, pixel_threshold=20, thumbnail_width=64, timing_path=None):
+        """
+        Args:
+            threshold (float): Minimum fraction of thumbnail pixels that must change for a frame to be written. 0 writes every frame.
+            pixel_threshold (int): Minimum change of a thumbnail pixel (0-255) to count as changed. Defaults to 20.
+            thumbnail_width (int): Approximate thumbnail width in pixels. Defaults to 64.
+            timing_path (str or None): The JSONL timing file. None disables it.
+        """
+        self.threshold = threshold
+        self.pixel_threshold = pixel_threshold
+        self.thumbnail_width = thumbnail_width
+        self.timing_path = timing_path
+        self.reference = None
+        self.last_frame_index = None
+        self.written = 0
+        self.skipped = 0
+        self.skipped_since_last = 0
+
+    def accept(self, frame, frame_index, file_name=None):
+        """
+        Returns True if the frame differs enough from the last written one and should be written.
+        A True result is recorded in the timing file as written under file_name.
+
+        Args:
+            frame (np.ndarray): The frame before any drawing, RGB or BGR (e.g. a view from evidence.get_frame_view()).
+            frame_index (int): The frame index, used to rebuild the timing.
+            file_name (str or None): The name the frame is written under.
+        """
+        self.last_frame_index = frame_index
+        thumbnail = get_thumbnail(frame, self.thumbnail_width)
+        if self.threshold > 0 and get_changed_fraction(thumbnail, self.reference, self.pixel_threshold) < self.threshold:
+            self.skipped += 1
+            self.skipped_since_last += 1
+            return False
+        self.reference = thumbnail
+        self.written += 1
+        self._write_timing({'file': file_name, 'frame_index': frame_index, 'skipped_before': self.skipped_since_last})
+        self.skipped_since_last = 0
+        return True
+
+    def close(self):
+        """
+        Records the last seen frame index so the frames skipped after the last written one keep their duration.
+        """
+        if self.last_frame_index is not None:
+            self._write_timing({'end_frame_index': self.last_frame_index, 'skipped_before': self.skipped_since_last})
+        print(f"Frame deduplicator: written {self.written}, skipped {self.skipped}")
+
+    def _write_timing(self, entry):
+        if self.timing_path is None:
+            return
+        with open(self.timing_path, 'a') as f:
+            f.write(json.dumps(entry) + '\n')
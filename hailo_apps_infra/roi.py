@@ -0,0 +1,142 @@
+import json
+import gi
+gi.require_version('Gst', '1.0')
+from gi.repository import Gst
+from hailo_apps_infra.startup_profile import lazy_import
+
+# -----------------------------------------------------------------------------------------------
+# Static inference region of interest
+# -----------------------------------------------------------------------------------------------
+# With a fixed camera mounting most of the frame is static background. The ROI limits inference to the part of the
+# frame that matters. A probe before the hailocropper of INFERENCE_PIPELINE_WRAPPER sets the bbox of the frame's
+# main ROI to the ROI bounding rectangle; the whole-buffer cropping function returns that ROI, so hailocropper crops
+# the region from the source frame and scales (letterboxes) only it to the network input. The detections come back
+# relative to the region, and a probe after the wrapper maps them to full-frame coordinates and restores the
+# full-frame bbox. For a polygon ROI, detections whose center lies outside the polygon are removed.
+#
+# ROI file (coordinates normalized to the frame), either
+#   {"rectangle": [xmin, ymin, xmax, ymax]}
+# or
+#   {"polygon": [[x0, y0], [x1, y1], [x2, y2], ...]}
+
+def load_roi(path):
+    """
+    Loads an InferenceRoi from a JSON file.
+
+    Args:
+        path (str): The ROI JSON file.
+
+    Returns:
+        InferenceRoi: The ROI.
+    """
+    with open(path) as f:
+        config = json.load(f)
+    if 'rectangle' in config:
+        xmin, ymin, xmax, ymax = config['rectangle']
+        return InferenceRoi([(xmin, ymin), (xmax, ymin), (xmax, ymax), (xmin, ymax)], is_rectangle=True)
+    if 'polygon' in config:
+        return InferenceRoi([tuple(point) for point in config['polygon']])
+    raise ValueError(f"{path}: expected a 'rectangle' or 'polygon' entry")
+
+
+class InferenceRoi:
+    """
+    A static ROI in normalized frame coordinates.
+    """
+    def __init__(self, polygon, is_rectangle=False):
+        """
+        Args:
+            polygon (list): The ROI corners as (x, y) normalized to [0, 1].
+            is_rectangle (bool): True if the polygon is an axis aligned rectangle (no point-in-polygon test needed).
+        """
+        if len(polygon) < 3:
+            raise ValueError("An ROI polygon needs at least 3 points")
+        self.polygon = [(min(max(x, 0.0), 1.0), min(max(y, 0.0), 1.0)) for x, y in polygon]
+        self.is_rectangle = is_rectangle
+        xs, ys = zip(*self.polygon)
+        # The region sent to inference (normalized to the source frame)
+        self.crop_bounds = (min(xs), min(ys), max(xs), max(ys))
+        if self.crop_bounds[2] <= self.crop_bounds[0] or self.crop_bounds[3] <= self.crop_bounds[1]:
+            raise ValueError(f"The ROI {self.crop_bounds} is empty")
+
+    def map_to_frame(self, xmin, ymin, width, height):
+        """
+        Maps a bbox normalized to the ROI region to (xmin, ymin, width, height) normalized to the full frame.
+        """
+        crop_xmin, crop_ymin, crop_xmax, crop_ymax = self.crop_bounds
+        crop_width, crop_height = crop_xmax - crop_xmin, crop_ymax - crop_ymin
+        return crop_xmin + xmin * crop_width, crop_ymin + ymin * crop_height, width * crop_width, height * crop_height
+
+    def contains(self, x, y):
+        """
+        Returns True if the normalized point lies inside the ROI polygon (even-odd rule).
+        """
+        inside = False
+        x1, y1 = self.polygon[-1]
+        for x2, y2 in self.polygon:
+            if (y1 > y) != (y2 > y) and x < x1 + (y - y1) * (x2 - x1) / (y2 - y1):
+                inside = not inside
+            x1, y1 = x2, y2
+        return inside
+
+    def attach(self, pipeline, name='inference_wrapper'):
+        """
+        Adds the probes selecting the region before the wrapper cropper and mapping the detections back to
+        full-frame coordinates after the wrapper.
+
+        Returns:
+            bool: False if the wrapper queues were not found.
+        """
+        input_queue = pipeline.get_by_name(f'{name}_input_q')
+        output_queue = pipeline.get_by_name(f'{name}_output_q')
+        if input_queue is None or output_queue is None:
+            print(f"Warning: {name}_input_q / {name}_output_q not found, the inference ROI is not applied.")
+            return False
+        input_queue.get_static_pad('src').add_probe(Gst.PadProbeType.BUFFER, self.on_input_buffer)
+        output_queue.get_static_pad('sink').add_probe(Gst.PadProbeType.BUFFER, self.on_buffer)
+        return True
+
+    def on_input_buffer(self, pad, info):
+        # The whole-buffer cropping function returns the main ROI, so hailocropper crops its bbox
+        hailo = lazy_import('hailo')
+        xmin, ymin, xmax, ymax = self.crop_bounds
+        hailo.get_roi_from_buffer(info.get_buffer()).set_bbox(hailo.HailoBBox(xmin, ymin, xmax - xmin, ymax - ymin))
+        return Gst.PadProbeReturn.OK
+
+    def on_buffer(self, pad, info):
+        hailo = lazy_import('hailo')
+        roi = hailo.get_roi_from_buffer(info.get_buffer())
+        for detection in roi.get_objects_typed(hailo.HAILO_DETECTION):
+            bbox = detection.get_bbox()
+            xmin, ymin, width, height = self.map_to_frame(bbox.xmin(), bbox.ymin(), bbox.width(), bbox.height())
+            if not self.is_rectangle and not self.contains(xmin + width / 2, ymin + height / 2):
+                roi.remove_object(detection)
+                continue
+            detection.set_bbox(hailo.HailoBBox(xmin, ymin, width, height))
+        # Downstream elements (tracker, overlay, callback) see full-frame coordinates again
+        roi.set_bbox(hailo.HailoBBox(0.0, 0.0, 1.0, 1.0))
+        return Gst.PadProbeReturn.OK
+
+
+def check_mapping():
+    """
+    Checks map_to_frame on a known 640x480 frame with the ROI rectangle x 160-480, y 240-480: a detection covering
+    the whole region, one in its top-left quarter and one at its center must land on the expected frame pixels.
+    Run with: python -m hailo_apps_infra.roi
+    """
+    frame_width, frame_height = 640, 480
+    roi = InferenceRoi([(0.25, 0.5), (0.75, 0.5), (0.75, 1.0), (0.25, 1.0)], is_rectangle=True)
+    cases = [
+        ((0.0, 0.0, 1.0, 1.0), (160, 240, 320, 240)),
+        ((0.0, 0.0, 0.5, 0.5), (160, 240, 160, 120)),
+        ((0.25, 0.25, 0.5, 0.5), (240, 300, 160, 120)),
+    ]
+    for region_bbox, expected_pixels in cases:
+        xmin, ymin, width, height = roi.map_to_frame(*region_bbox)
+        pixels = (xmin * frame_width, ymin * frame_height, width * frame_width, height * frame_height)
+        if any(abs(p - e) > 1e-6 for p, e in zip(pixels, expected_pixels)):
+            raise AssertionError(f"{region_bbox} mapped to {pixels}, expected {expected_pixels}")
+    print("ROI mapping check passed")
+
+if __name__ == "__main__":
+    check_mapping()
@@ -0,0 +1,68 @@
+import argparse
+import os
+import sys
+from hailo_apps_infra.gstreamer_app import (
+    Gst,
+    decode_chain_available,
+    set_hardware_decoder_preference,
+)
+from hailo_apps_infra.gstreamer_helper_pipelines import (
+    SOURCE_PIPELINE,
+    DECODE_CHAINS,
+)
+from hailo_apps_infra.encoder_benchmark import run_benchmark
+
+# -----------------------------------------------------------------------------------------------
+# Source (decode / scale / convert) benchmark
+# -----------------------------------------------------------------------------------------------
+# Runs a recorded file through SOURCE_PIPELINE -> fakesink for every decode chain installed on this machine
+# and reports FPS and CPU usage, so the cheapest chain for --decode-chain can be picked.
+#
+# Usage:
+#   python -m hailo_apps_infra.source_benchmark --input resources/example.mp4 --width 640 --height 480
+
+def get_benchmark_pipeline_string(input_file, decode_chain, width, height, video_format, num_frames):
+    eos_after_str = f'eos-after={num_frames} ' if num_frames > 0 else ''
+    return (
+        f'{SOURCE_PIPELINE(input_file, width, height, video_format, name="bench_source", decode_chain=decode_chain)} ! '
+        f'identity name=bench_limit {eos_after_str}! '
+        f'fakesink name=bench_sink sync=false '
+    )
+
+def get_parser():
+    default_input = os.path.join(os.path.dirname(os.path.abspath(__file__)), '../resources/example.mp4')
+    parser = argparse.ArgumentParser(description="Benchmark the source decode / scale / convert chains on a recorded input")
+    parser.add_argument("--input", "-i", type=str, default=default_input, help="Recorded video file used as input. Default is resources/example.mp4.")
+    parser.add_argument("--chains", nargs="+", default=list(DECODE_CHAINS), choices=list(DECODE_CHAINS),
+                        help="Decode chains to benchmark. Defaults to all chains.")
+    parser.add_argument("--width", type=int, default=640, help="Output width. Default is 640.")
+    parser.add_argument("--height", type=int, default=480, help="Output height. Default is 480.")
+    parser.add_argument("--format", type=str, default="RGB", help="Output format. Default is RGB.")
+    parser.add_argument("--num-frames", type=int, default=300, help="Frames per chain, 0 for the whole file. Default is 300.")
+    return parser
+
+def main():
+    args = get_parser().parse_args()
+    Gst.init(None)
+
+    print(f"{'chain':<16} {'frames':>7} {'fps':>8} {'cpu %':>7} {'cpu ms/frame':>13}")
+    results = []
+    for chain in args.chains:
+        if not decode_chain_available(chain):
+            print(f"{chain:<16} skipped, not available on this machine")
+            continue
+        set_hardware_decoder_preference(DECODE_CHAINS[chain]['hardware_decoders'])
+        pipeline_string = get_benchmark_pipeline_string(args.input, chain, args.width, args.height, args.format, args.num_frames)
+        try:
+            frames, wall, cpu = run_benchmark(pipeline_string)
+        except Exception as e:
+            print(f"{chain:<16} failed ({e})", file=sys.stderr)
+            continue
+        cpu_ms = 1000 * cpu / max(frames, 1)
+        results.append((cpu_ms, chain))
+        print(f"{chain:<16} {frames:>7} {frames / wall:>8.1f} {100 * cpu / wall:>7.0f} {cpu_ms:>13.2f}")
+    if results:
+        print(f"Cheapest chain: {min(results)[1]} (use --decode-chain {min(results)[1]})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+import importlib
+import sys
+import time
+from contextlib import contextmanager
+
+# -----------------------------------------------------------------------------------------------
+# Startup profiling
+# -----------------------------------------------------------------------------------------------
+# This module is deliberately dependency free so it can be imported before anything heavy.
+# Every infra module records its imports and initialization steps here; the report is only
+# printed when the app is started with --startup-profile.
+
+def _process_age_seconds():
+    # Seconds elapsed since the interpreter process was started (Linux only).
+    # Returns None when /proc is not available.
+    try:
+        import os
+        with open('/proc/self/stat') as stat_file:
+            start_ticks = int(stat_file.read().rsplit(')', 1)[1].split()[19])
+        with open('/proc/uptime') as uptime_file:
+            uptime = float(uptime_file.read().split()[0])
+        return uptime - start_ticks / os.sysconf('SC_CLK_TCK')
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+class StartupProfile:
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.process_age_at_origin = _process_age_seconds()
+        self.sections = []
+        self.marks = []
+
+    @contextmanager
+    def section(self, label):
+        """
+        Context manager that records the wall time spent inside the block under the given label.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.sections.append((label, start - self.origin, time.perf_counter() - start))
+
+    def mark(self, label):
+        """
+        Records a point in time (e.g. 'first buffer') relative to the profile origin.
+        """
+        self.marks.append((label, time.perf_counter() - self.origin))
+
+    def lazy_import(self, module_name):
+        """
+        Imports a module on first use and records the import time.
+        Subsequent calls are a dictionary lookup and are not recorded.
+
+        Args:
+            module_name (str): The dotted module name, e.g. 'cv2'.
+
+        Returns:
+            module: The imported module.
+        """
+        module = sys.modules.get(module_name)
+        if module is not None:
+            return module
+        with self.section(f'import {module_name}'):
+            return importlib.import_module(module_name)
+
+    def report(self, file=sys.stdout):
+        """
+        Prints the recorded sections and marks ordered by start time.
+        """
+        print("----- Startup profile -----", file=file)
+        if self.process_age_at_origin is not None:
+            print(f"{'interpreter + imports before hailo_apps_infra':<50} {self.process_age_at_origin * 1000:9.1f} ms", file=file)
+        for label, start, duration in sorted(self.sections, key=lambda s: s[1]):
+            print(f"{label:<50} {duration * 1000:9.1f} ms  (at +{start * 1000:.1f} ms)", file=file)
+        for label, at in self.marks:
+            print(f"{label:<50} {'':>9}     (at +{at * 1000:.1f} ms)", file=file)
+        total = time.perf_counter() - self.origin
+        if self.process_age_at_origin is not None:
+            total += self.process_age_at_origin
+        print(f"{'total':<50} {total * 1000:9.1f} ms", file=file)
+        print("---------------------------", file=file)
+
+
+# Shared profile instance used by all infra modules
+STARTUP_PROFILE = StartupProfile()
+lazy_import = STARTUP_PROFILE.lazy_import
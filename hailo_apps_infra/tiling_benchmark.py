@@ -0,0 +1,204 @@
+import argparse
+import json
+import os
+import sys
+import time
+from hailo_apps_infra.startup_profile import lazy_import
+from hailo_apps_infra.gstreamer_app import Gst
+from hailo_apps_infra.hailo_rpi_common import detect_hailo_arch
+from hailo_apps_infra.gstreamer_helper_pipelines import (
+    QUEUE,
+    SOURCE_PIPELINE,
+    INFERENCE_PIPELINE,
+    INFERENCE_PIPELINE_WRAPPER,
+    TILE_CROPPER_PIPELINE,
+)
+
+# -----------------------------------------------------------------------------------------------
+# Tiling benchmark
+# -----------------------------------------------------------------------------------------------
+# Runs a recorded file through the detection network untiled (1x1, letterboxed whole frame) and with every
+# requested tile grid, and reports FPS against recall.
+# Recall is measured against --ground-truth when given, otherwise against the densest tile grid
+# (the configuration finding the most small objects is used as the reference).
+#
+# Usage:
+#   python -m hailo_apps_infra.tiling_benchmark --input recording.mp4 --configs 1x1 2x2 3x2:0.15
+#
+# Ground truth is a JSONL file with one line per annotated frame (frame_index counts from 0):
+#   {"frame_index": 12, "detections": [{"label": "Missing Bolt", "bbox": [xmin, ymin, xmax, ymax]}]}
+# with bbox normalized to the frame.
+
+def parse_config(config, default_overlap):
+    """
+    Parses 'COLSxROWS' or 'COLSxROWS:OVERLAP' into (cols, rows, overlap).
+    """
+    grid, _, overlap = config.partition(':')
+    cols, rows = (int(v) for v in grid.lower().split('x'))
+    return cols, rows, float(overlap) if overlap else default_overlap
+
+def get_inference_pipeline_string(args, cols, rows, overlap):
+    thresholds_str = (
+        f"nms-score-threshold={args.score_threshold} "
+        f"nms-iou-threshold=0.45 "
+        f"output-format-type=HAILO_FORMAT_TYPE_FLOAT32"
+    )
+    tiled = cols * rows > 1
+    inference_pipeline = INFERENCE_PIPELINE(
+        hef_path=args.hef_path,
+        post_process_so=args.post_process_so,
+        post_function_name="filter" if tiled else "filter_letterbox",
+        batch_size=cols * rows if tiled else 2,
+        additional_params=thresholds_str)
+    if not tiled:
+        return INFERENCE_PIPELINE_WRAPPER(inference_pipeline)
+    return TILE_CROPPER_PIPELINE(
+        inference_pipeline,
+        tiles_x=cols,
+        tiles_y=rows,
+        overlap_x=overlap,
+        overlap_y=overlap,
+        iou_threshold=args.tile_iou_threshold)
+
+def get_benchmark_pipeline_string(input_file, inference_pipeline, width, height, num_frames):
+    eos_after_str = f'eos-after={num_frames} ' if num_frames > 0 else ''
+    return (
+        f'{SOURCE_PIPELINE(input_file, width, height)} ! '
+        f'identity name=bench_limit {eos_after_str}! '
+        f'{inference_pipeline} ! '
+        f'{QUEUE(name="bench_sink_q")} ! '
+        f'fakesink name=bench_sink sync=false '
+    )
+
+def run_benchmark(pipeline_string):
+    """
+    Runs the pipeline to EOS and returns (detections per frame, wall seconds).
+    Detections are lists of (label, (xmin, ymin, xmax, ymax)) in full-frame normalized coordinates.
+    """
+    hailo = lazy_import('hailo')
+    pipeline = Gst.parse_launch(pipeline_string)
+    frames = []
+
+    def collect_detections(pad, info):
+        roi = hailo.get_roi_from_buffer(info.get_buffer())
+        detections = []
+        for detection in roi.get_objects_typed(hailo.HAILO_DETECTION):
+            bbox = detection.get_bbox()
+            detections.append((detection.get_label(), (bbox.xmin(), bbox.ymin(), bbox.xmax(), bbox.ymax())))
+        frames.append(detections)
+        return Gst.PadProbeReturn.OK
+
+    pipeline.get_by_name("bench_sink").get_static_pad("sink").add_probe(Gst.PadProbeType.BUFFER, collect_detections)
+
+    wall_start = time.perf_counter()
+    pipeline.set_state(Gst.State.PLAYING)
+    message = pipeline.get_bus().timed_pop_filtered(Gst.CLOCK_TIME_NONE, Gst.MessageType.EOS | Gst.MessageType.ERROR)
+    wall_time = time.perf_counter() - wall_start
+    pipeline.set_state(Gst.State.NULL)
+
+    if message.type == Gst.MessageType.ERROR:
+        err, debug = message.parse_error()
+        raise RuntimeError(f"{err}, {debug}")
+    return frames, wall_time
+
+def load_ground_truth(path):
+    """
+    Returns {frame_index: [(label, bbox), ...]} from a ground truth JSONL file.
+    """
+    ground_truth = {}
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                entry = json.loads(line)
+                ground_truth[entry['frame_index']] = [(d['label'], tuple(d['bbox'])) for d in entry['detections']]
+    return ground_truth
+
+def box_iou(a, b):
+    inter_w = min(a[2], b[2]) - max(a[0], b[0])
+    inter_h = min(a[3], b[3]) - max(a[1], b[1])
+    if inter_w <= 0 or inter_h <= 0:
+        return 0.0
+    inter = inter_w * inter_h
+    return inter / ((a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter)
+
+def count_matches(reference, frames, iou_threshold=0.5):
+    """
+    Greedily matches reference objects to detections of the same label per frame.
+
+    Returns:
+        tuple: (matched reference objects, total reference objects)
+    """
+    matched, total = 0, 0
+    for frame_index, reference_detections in reference.items():
+        candidates = list(frames[frame_index]) if frame_index < len(frames) else []
+        total += len(reference_detections)
+        for label, bbox in reference_detections:
+            best_index, best_iou = None, iou_threshold
+            for index, (candidate_label, candidate_bbox) in enumerate(candidates):
+                iou = box_iou(bbox, candidate_bbox)
+                if candidate_label == label and iou >= best_iou:
+                    best_index, best_iou = index, iou
+            if best_index is not None:
+                candidates.pop(best_index)
+                matched += 1
+    return matched, total
+
+def get_parser():
+    parser = argparse.ArgumentParser(description="Benchmark tiled inference (FPS vs recall) on a recorded input")
+    parser.add_argument("--input", "-i", type=str, required=True, help="Recorded video file used as input")
+    parser.add_argument("--configs", nargs="+", default=["1x1", "2x2", "3x2", "4x3"],
+                        help="Tile grids as COLSxROWS[:OVERLAP]; 1x1 is the untiled letterboxed frame. Default is 1x1 2x2 3x2 4x3.")
+    parser.add_argument("--overlap", type=float, default=0.1, help="Tile overlap when not given per config. Default is 0.1.")
+    parser.add_argument("--tile-iou-threshold", type=float, default=0.3, help="Cross-tile NMS IoU threshold. Default is 0.3.")
+    parser.add_argument("--score-threshold", type=float, default=0.3, help="Detection score threshold. Default is 0.3.")
+    parser.add_argument("--width", type=int, default=1280, help="Frame width. Default is 1280.")
+    parser.add_argument("--height", type=int, default=720, help="Frame height. Default is 720.")
+    parser.add_argument("--num-frames", type=int, default=300, help="Frames per config, 0 for the whole file. Default is 300.")
+    parser.add_argument("--ground-truth", type=str, default=None,
+                        help="Ground truth JSONL. Default uses the densest tile grid as the reference.")
+    parser.add_argument("--hef-path", type=str, default=None, help="HEF file. Default is the detection app default for the detected architecture.")
+    parser.add_argument("--post-process-so", type=str, default=None, help="Post-process .so. Default is the YOLO post-process of the detection app.")
+    return parser
+
+def main():
+    args = get_parser().parse_args()
+    resources_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '../resources')
+    if args.hef_path is None:
+        hef_name = 'yolov8m.hef' if detect_hailo_arch() == 'hailo8' else 'yolov8s_h8l.hef'
+        args.hef_path = os.path.join(resources_path, hef_name)
+    if args.post_process_so is None:
+        args.post_process_so = os.path.join(resources_path, 'libyolo_hailortpp_postprocess.so')
+    Gst.init(None)
+
+    results = []
+    for config in args.configs:
+        cols, rows, overlap = parse_config(config, args.overlap)
+        inference_pipeline = get_inference_pipeline_string(args, cols, rows, overlap)
+        pipeline_string = get_benchmark_pipeline_string(args.input, inference_pipeline, args.width, args.height, args.num_frames)
+        try:
+            frames, wall_time = run_benchmark(pipeline_string)
+        except Exception as e:
+            print(f"{config}: failed ({e})", file=sys.stderr)
+            continue
+        results.append((config, cols * rows, frames, wall_time))
+    if not results:
+        sys.exit(1)
+
+    if args.ground_truth:
+        reference = load_ground_truth(args.ground_truth)
+        reference_name = args.ground_truth
+    else:
+        reference_config, _, reference_frames, _ = max(results, key=lambda r: r[1])
+        reference = dict(enumerate(reference_frames))
+        reference_name = f"{reference_config} detections"
+
+    print(f"Recall reference: {reference_name}")
+    print(f"{'config':<10} {'tiles':>5} {'frames':>7} {'fps':>8} {'det/frame':>10} {'recall':>8}")
+    for config, tiles, frames, wall_time in results:
+        matched, total = count_matches(reference, frames)
+        recall = f"{matched / total:.3f}" if total else '-'
+        detections_per_frame = sum(len(d) for d in frames) / max(len(frames), 1)
+        print(f"{config:<10} {tiles:>5} {len(frames):>7} {len(frames) / wall_time:>8.1f} {detections_per_frame:>10.2f} {recall:>8}")
+
+if __name__ == "__main__":
+    main()
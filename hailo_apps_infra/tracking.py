@@ -0,0 +1,474 @@
+import json
+import time
+import hailo
+import numpy as np
+from hailo_apps_infra.evidence import EvidenceWriter
+
+# -----------------------------------------------------------------------------------------------
+# Track based helpers for the callback layer
+# -----------------------------------------------------------------------------------------------
+# These helpers rely on the ids assigned by hailotracker (TRACKER_PIPELINE), stored on each detection as HAILO_UNIQUE_ID.
+
+def get_track_id(detection):
+    """
+    Returns the tracker id of a detection, or 0 if the detection is not tracked.
+    """
+    track = detection.get_objects_typed(hailo.HAILO_UNIQUE_ID)
+    if len(track) == 1:
+        return track[0].get_id()
+    return 0
+
+
+class TrackKeyframeCapture:
+    """
+    Saves one image per tracked object instead of one image per frame.
+    While a track is visible only its best-confidence crop is kept in memory (as JPEG bytes); it is written when the track
+    is lost (not seen for lost_frames frames), and optionally rewritten every refresh_seconds if a better view arrived.
+    Files are written by an EvidenceWriter into a per-run session directory (track_<id>_<label>.jpg plus index.jsonl), so a refresh overwrites the
+    previous image of the same track.
+    Detections without a track id (no tracker in the pipeline) are ignored.
+    """
+    def __init__(self, output_dir, labels=None, refresh_seconds=0, lost_frames=30, min_confidence=0.0, padding=0.2, jpeg_quality=90, thumbnail_scale=0, channel_order='RGB', session=None):
+        self.labels = set(labels) if labels else None
+        self.refresh_seconds = refresh_seconds
+        self.lost_frames = lost_frames
+        self.min_confidence = min_confidence
+        self.writer = EvidenceWriter(
+            output_dir,
+            padding=padding,
+            jpeg_quality=jpeg_quality,
+            thumbnail_scale=thumbnail_scale,
+            channel_order=channel_order,
+            session=session,
+        )
+        self.tracks = {}
+        self.saved_count = 0
+
+    def update(self, frame_index, frame, detections):
+        """
+        Updates the per-track best crops and writes the ones that are due.
+
+        Args:
+            frame_index (int): The index of the current frame.
+            frame (np.ndarray): The current frame, typically a zero-copy view from evidence.get_frame_view()
+                taken while the buffer is mapped.
+            detections (list): (track_id, label, confidence, (xmin, ymin, xmax, ymax)) tuples, bbox normalized to [0, 1].
+        """
+        now = time.monotonic()
+        for track_id, label, confidence, bbox in detections:
+            if track_id == 0 or confidence < self.min_confidence:
+                continue
+            if self.labels is not None and label not in self.labels:
+                continue
+            state = self.tracks.get(track_id)
+            if state is None:
+                state = {'best_confidence': -1.0, 'encoded': None, 'dirty': False, 'saved_at': now}
+                self.tracks[track_id] = state
+            state['last_seen'] = frame_index
+            if confidence > state['best_confidence']:
+                state.update({
+                    'best_confidence': confidence,
+                    'label': label,
+                    'bbox': bbox,
+                    'frame_index': frame_index,
+                    'encoded': self.writer.encode(frame, bbox),
+                    'dirty': True,
+                })
+            if self.refresh_seconds and state['dirty'] and now - state['saved_at'] >= self.refresh_seconds:
+                self._save(track_id, state, now)
+
+        for track_id in [t for t, s in self.tracks.items() if frame_index - s['last_seen'] > self.lost_frames]:
+            state = self.tracks.pop(track_id)
+            if state['dirty']:
+                self._save(track_id, state, now)
+
+    def flush(self):
+        """
+        Writes the pending images of all tracks, e.g. at shutdown.
+        """
+        now = time.monotonic()
+        for track_id, state in self.tracks.items():
+            if state['dirty']:
+                self._save(track_id, state, now)
+        self.tracks.clear()
+
+    def _save(self, track_id, state, now):
+        file_name = self.writer.write(
+            state['encoded'], state['frame_index'], track_id, state['label'], state['best_confidence'], state['bbox'])
+        print(f"Saved {file_name} (frame {state['frame_index']}, confidence {state['best_confidence']:.2f})")
+        state['dirty'] = False
+        state['saved_at'] = now
+        self.saved_count += 1
+
+
+class TrackAggregator:
+    """
+    Aggregates per-frame detections into one summary record per physical object (track).
+
+    Per-track state lives in preallocated NumPy arrays indexed by a slot per active track:
+    first/last seen frame, number of frames seen, max confidence, confidence-weighted label votes, last bbox and
+    a fixed-size ring of sampled bbox centers (the trajectory). Per-frame updates are vectorized over the detections
+    of the frame. When a track has not been seen for lost_frames frames its summary is emitted and the slot is reused.
+
+    Summaries are returned by update()/flush() and, if output_path is set, appended to it as JSON lines.
+    """
+    def __init__(self, lost_frames=30, trajectory_length=32, trajectory_stride=5, report_labels=None, output_path=None, capacity=64):
+        self.lost_frames = lost_frames
+        self.trajectory_length = trajectory_length
+        self.trajectory_stride = trajectory_stride
+        self.report_labels = set(report_labels) if report_labels else None
+        self.output_path = output_path
+        self.labels = []
+        self.label_index = {}
+        self.slot_of_track = {}
+        self.free_slots = []
+        self.capacity = 0
+        self.track_id = np.zeros(0, dtype=np.int64)
+        self.active = np.zeros(0, dtype=bool)
+        self.first_frame = np.zeros(0, dtype=np.int64)
+        self.last_frame = np.zeros(0, dtype=np.int64)
+        self.hits = np.zeros(0, dtype=np.int32)
+        self.max_confidence = np.zeros(0, dtype=np.float32)
+        self.votes = np.zeros((0, 0), dtype=np.float32)
+        self.last_bbox = np.zeros((0, 4), dtype=np.float32)
+        self.trajectory = np.zeros((0, trajectory_length, 3), dtype=np.float32)  # (frame, cx, cy)
+        self.trajectory_count = np.zeros(0, dtype=np.int32)
+        self._grow(capacity)
+
+    def _grow(self, new_capacity):
+        extra = new_capacity - self.capacity
+
+        def pad(array, fill=0):
+            shape = (extra,) + array.shape[1:]
+            return np.concatenate([array, np.full(shape, fill, dtype=array.dtype)])
+
+        self.track_id = pad(self.track_id)
+        self.active = pad(self.active, False)
+        self.first_frame = pad(self.first_frame)
+        self.last_frame = pad(self.last_frame)
+        self.hits = pad(self.hits)
+        self.max_confidence = pad(self.max_confidence)
+        self.votes = pad(self.votes)
+        self.last_bbox = pad(self.last_bbox)
+        self.trajectory = pad(self.trajectory)
+        self.trajectory_count = pad(self.trajectory_count)
+        self.free_slots.extend(range(new_capacity - 1, self.capacity - 1, -1))
+        self.capacity = new_capacity
+
+    def _get_label_index(self, label):
+        index = self.label_index.get(label)
+        if index is None:
+            index = len(self.labels)
+            self.labels.append(label)
+            self.label_index[label] = index
+            self.votes = np.concatenate([self.votes, np.zeros((self.capacity, 1), dtype=np.float32)], axis=1)
+        return index
+
+    def _get_slot(self, track_id, frame_index):
+        slot = self.slot_of_track.get(track_id)
+        if slot is None:
+            if not self.free_slots:
+                self._grow(self.capacity * 2)
+            slot = self.free_slots.pop()
+            self.slot_of_track[track_id] = slot
+            self.track_id[slot] = track_id
+            self.active[slot] = True
+            self.first_frame[slot] = frame_index
+            self.hits[slot] = 0
+            self.max_confidence[slot] = 0
+            self.votes[slot] = 0
+            self.trajectory_count[slot] = 0
+        return slot
+
+    def update(self, frame_index, detections):
+        """
+        Adds the detections of one frame and emits the summaries of lost tracks.
+
+        Args:
+            frame_index (int): The index of the current frame.
+            detections (list): (track_id, label, confidence, (xmin, ymin, xmax, ymax)) tuples. Untracked (id 0) detections are ignored.
+
+        Returns:
+            list: The summary dicts of the tracks lost at this frame.
+        """
+        detections = [d for d in detections if d[0] != 0]
+        if detections:
+            slots = np.array([self._get_slot(d[0], frame_index) for d in detections], dtype=np.int64)
+            label_indices = np.array([self._get_label_index(d[1]) for d in detections], dtype=np.int64)
+            confidences = np.array([d[2] for d in detections], dtype=np.float32)
+            bboxes = np.array([d[3] for d in detections], dtype=np.float32)
+
+            self.last_frame[slots] = frame_index
+            np.add.at(self.hits, slots, 1)
+            np.maximum.at(self.max_confidence, slots, confidences)
+            np.add.at(self.votes, (slots, label_indices), confidences)
+            self.last_bbox[slots] = bboxes
+
+            # Sample the bbox center into each track's trajectory ring every trajectory_stride frames of the track
+            sample = (self.hits[slots] - 1) % self.trajectory_stride == 0
+            if sample.any():
+                sample_slots = slots[sample]
+                positions = self.trajectory_count[sample_slots] % self.trajectory_length
+                centers = (bboxes[sample, :2] + bboxes[sample, 2:]) / 2
+                self.trajectory[sample_slots, positions, 0] = frame_index
+                self.trajectory[sample_slots, positions, 1:] = centers
+                self.trajectory_count[sample_slots] += 1
+
+        lost_slots = np.nonzero(self.active & (frame_index - self.last_frame > self.lost_frames))[0]
+        return self._emit(lost_slots)
+
+    def flush(self):
+        """
+        Emits the summaries of all active tracks, e.g. at shutdown.
+        """
+        return self._emit(np.nonzero(self.active)[0])
+
+    def _summary(self, slot):
+        votes = self.votes[slot]
+        count = int(self.trajectory_count[slot])
+        if count > self.trajectory_length:
+            order = np.roll(np.arange(self.trajectory_length), -(count % self.trajectory_length))
+        else:
+            order = np.arange(count)
+        return {
+            'track_id': int(self.track_id[slot]),
+            'label': self.labels[int(np.argmax(votes))] if len(self.labels) else None,
+            'label_votes': {self.labels[i]: round(float(v), 3) for i, v in enumerate(votes) if v > 0},
+            'first_frame': int(self.first_frame[slot]),
+            'last_frame': int(self.last_frame[slot]),
+            'frames_seen': int(self.hits[slot]),
+            'max_confidence': round(float(self.max_confidence[slot]), 4),
+            'last_bbox': [round(float(v), 4) for v in self.last_bbox[slot]],
+            'trajectory': [[int(f), round(float(x), 4), round(float(y), 4)] for f, x, y in self.trajectory[slot, order]],
+        }
+
+    def _emit(self, slots):
+        summaries = []
+        for slot in slots:
+            summary = self._summary(slot)
+            self.active[slot] = False
+            del self.slot_of_track[summary['track_id']]
+            self.free_slots.append(int(slot))
+            if self.report_labels is None or summary['label'] in self.report_labels:
+                summaries.append(summary)
+        if summaries and self.output_path:
+            with open(self.output_path, 'a') as f:
+                for summary in summaries:
+                    f.write(json.dumps(summary) + '\n')
+        return summaries
+
+
+class LabelSmoother:
+    """
+    Temporal label smoothing keyed on track id, to stop labels flickering (e.g. "Bolt" / "Missing Bolt") between frames.
+
+    Every track has a fixed-size ring of the last `window` per-class confidences, shape (tracks, window, classes).
+    The smoothed label is the class with the highest summed confidence over the ring; the reported label only changes
+    after the new class has won for `hysteresis` consecutive frames. All per-frame work is vectorized over the
+    tracks present in the frame, so the cost stays low with hundreds of tracks.
+    Detections without a track id are passed through unchanged.
+    """
+    def __init__(self, labels=None, window=8, hysteresis=3, lost_frames=30, capacity=64):
+        self.window = window
+        self.hysteresis = hysteresis
+        self.lost_frames = lost_frames
+        self.labels = []
+        self.label_index = {}
+        self.slot_of_track = {}
+        self.free_slots = []
+        self.capacity = 0
+        self.track_id = np.zeros(0, dtype=np.int64)
+        self.probabilities = np.zeros((0, window, 0), dtype=np.float32)
+        self.ring_position = np.zeros(0, dtype=np.int64)
+        self.reported = np.zeros(0, dtype=np.int64)
+        self.candidate = np.zeros(0, dtype=np.int64)
+        self.candidate_count = np.zeros(0, dtype=np.int32)
+        self.last_frame = np.zeros(0, dtype=np.int64)
+        self.active = np.zeros(0, dtype=bool)
+        self.label_changes = 0
+        for label in labels or []:
+            self._get_label_index(label)
+        self._grow(capacity)
+
+    def _grow(self, new_capacity):
+        extra = new_capacity - self.capacity
+
+        def pad(array, fill=0):
+            shape = (extra,) + array.shape[1:]
+            return np.concatenate([array, np.full(shape, fill, dtype=array.dtype)])
+
+        self.track_id = pad(self.track_id)
+        self.probabilities = pad(self.probabilities)
+        self.ring_position = pad(self.ring_position)
+        self.reported = pad(self.reported, -1)
+        self.candidate = pad(self.candidate, -1)
+        self.candidate_count = pad(self.candidate_count)
+        self.last_frame = pad(self.last_frame)
+        self.active = pad(self.active, False)
+        self.free_slots.extend(range(new_capacity - 1, self.capacity - 1, -1))
+        self.capacity = new_capacity
+
+    def _get_label_index(self, label):
+        index = self.label_index.get(label)
+        if index is None:
+            index = len(self.labels)
+            self.labels.append(label)
+            self.label_index[label] = index
+            new_class = np.zeros(self.probabilities.shape[:2] + (1,), dtype=np.float32)
+            self.probabilities = np.concatenate([self.probabilities, new_class], axis=2)
+        return index
+
+    def _get_slot(self, track_id):
+        slot = self.slot_of_track.get(track_id)
+        if slot is None:
+            if not self.free_slots:
+                self._grow(self.capacity * 2)
+            slot = self.free_slots.pop()
+            self.slot_of_track[track_id] = slot
+            self.track_id[slot] = track_id
+            self.probabilities[slot] = 0
+            self.ring_position[slot] = 0
+            self.reported[slot] = -1
+            self.candidate[slot] = -1
+            self.candidate_count[slot] = 0
+            self.active[slot] = True
+        return slot
+
+    def smooth(self, frame_index, detections):
+        """
+        Adds the detections of one frame and returns them with smoothed labels.
+
+        Args:
+            frame_index (int): The index of the current frame.
+            detections (list): (track_id, label, confidence, bbox) tuples.
+
+        Returns:
+            list: The same tuples with the label replaced by the smoothed label.
+        """
+        tracked = [i for i, d in enumerate(detections) if d[0] != 0]
+        smoothed = list(detections)
+        if tracked:
+            slots = np.array([self._get_slot(detections[i][0]) for i in tracked], dtype=np.int64)
+            classes = np.array([self._get_label_index(detections[i][1]) for i in tracked], dtype=np.int64)
+            confidences = np.array([detections[i][2] for i in tracked], dtype=np.float32)
+
+            # Overwrite the oldest ring entry of every track with this frame's class confidence
+            positions = self.ring_position[slots] % self.window
+            self.probabilities[slots, positions, :] = 0
+            self.probabilities[slots, positions, classes] = confidences
+            self.ring_position[slots] += 1
+            self.last_frame[slots] = frame_index
+
+            best = self.probabilities[slots].sum(axis=1).argmax(axis=1)
+            reported = self.reported[slots]
+            reported = np.where(reported < 0, best, reported)  # new tracks report their first label immediately
+            differs = best != reported
+            count = np.where(differs & (best == self.candidate[slots]), self.candidate_count[slots] + 1, differs.astype(np.int32))
+            switch = differs & (count >= self.hysteresis)
+            reported = np.where(switch, best, reported)
+            self.reported[slots] = reported
+            self.candidate[slots] = np.where(differs & ~switch, best, -1)
+            self.candidate_count[slots] = np.where(switch, 0, count)
+            self.label_changes += int(switch.sum())
+
+            for i, label_index in zip(tracked, reported):
+                smoothed[i] = (detections[i][0], self.labels[label_index]) + tuple(detections[i][2:])
+
+        # Release the slots of lost tracks
+        for slot in np.nonzero(self.active & (frame_index - self.last_frame > self.lost_frames))[0]:
+            self.active[slot] = False
+            del self.slot_of_track[int(self.track_id[slot])]
+            self.free_slots.append(int(slot))
+        return smoothed
+
+
+def get_iou(a, b):
+    """
+    Returns the intersection over union of two (xmin, ymin, width, height) boxes.
+    """
+    width = min(a[0] + a[2], b[0] + b[2]) - max(a[0], b[0])
+    height = min(a[1] + a[3], b[1] + b[3]) - max(a[1], b[1])
+    if width <= 0 or height <= 0:
+        return 0.0
+    intersection = width * height
+    return intersection / (a[2] * a[3] + b[2] * b[3] - intersection)
+
+
+class TrackInterpolator:
+    """
+    Fills the boxes of frames that skipped inference (see frame_gating.AdaptiveRateController).
+    Every track keeps its box and per-frame velocity from the last two inferred frames it appeared in; on a skipped
+    frame the box is moved on from the last inferred position by that velocity. The boxes are extrapolated rather
+    than interpolated between two inferred frames, since the next inferred frame is not known yet when a skipped
+    frame passes. Tracks missing from an inferred frame are forgotten.
+    Track ids come from hailotracker, or from match() for detections that have not reached the tracker yet.
+    """
+    def __init__(self):
+        self.tracks = {}
+        self.labels = {}
+        self.next_id = 1
+
+    def match(self, labeled_boxes, min_iou=0.3):
+        """
+        Assigns track ids to the boxes of an inferred frame: a box takes the id of the box of the last inferred frame
+        with the same label and the highest IoU (at least min_iou), other boxes get new ids.
+
+        Args:
+            labeled_boxes (list): (label, (xmin, ymin, width, height)) tuples, bbox normalized to [0, 1].
+            min_iou (float): The minimum IoU to continue a track. Defaults to 0.3.
+
+        Returns:
+            list: The track ids, in the order of labeled_boxes.
+        """
+        pairs = sorted(
+            ((get_iou(bbox, self.tracks[track_id][1]), i, track_id)
+             for i, (label, bbox) in enumerate(labeled_boxes)
+             for track_id in self.tracks if self.labels.get(track_id) == label),
+            reverse=True,
+        )
+        ids = [None] * len(labeled_boxes)
+        taken = set()
+        for iou, i, track_id in pairs:
+            if iou < min_iou:
+                break
+            if ids[i] is None and track_id not in taken:
+                ids[i] = track_id
+                taken.add(track_id)
+        for i, (label, _) in enumerate(labeled_boxes):
+            if ids[i] is None:
+                ids[i] = self.next_id
+                self.next_id += 1
+        self.labels = {track_id: label for track_id, (label, _) in zip(ids, labeled_boxes)}
+        return ids
+
+    def update(self, frame_index, tracked_boxes):
+        """
+        Records the tracked boxes of an inferred frame.
+
+        Args:
+            frame_index (int): The index of the current frame.
+            tracked_boxes (dict): {track_id: (xmin, ymin, width, height)}, bbox normalized to [0, 1].
+        """
+        tracks = {}
+        for track_id, bbox in tracked_boxes.items():
+            velocity = (0.0, 0.0, 0.0, 0.0)
+            previous = self.tracks.get(track_id)
+            if previous is not None and frame_index > previous[0]:
+                frames = frame_index - previous[0]
+                velocity = tuple((c - p) / frames for p, c in zip(previous[1], bbox))
+            tracks[track_id] = (frame_index, tuple(bbox), velocity)
+        self.tracks = tracks
+
+    def predict(self, frame_index, track_id):
+        """
+        Returns the extrapolated (xmin, ymin, width, height) of a track at a skipped frame, or None if the track
+        was not in the last inferred frame.
+        """
+        track = self.tracks.get(track_id)
+        if track is None:
+            return None
+        last_index, bbox, velocity = track
+        frames = frame_index - last_index
+        xmin, ymin, width, height = (b + v * frames for b, v in zip(bbox, velocity))
+        width, height = min(max(width, 0.0), 1.0), min(max(height, 0.0), 1.0)
+        return min(max(xmin, 0.0), 1.0 - width), min(max(ymin, 0.0), 1.0 - height), width, height
@@ -1,11 +1,30 @@
 import cv2
+import json
 import os
 
+def load_frame_repeats(timing_path):
+    # frames.jsonl is written by FrameDeduplicator: each written image is shown until the next one,
+    # so it is repeated for the frames skipped after it as near-duplicates
+    with open(timing_path) as f:
+        entries = [json.loads(line) for line in f if line.strip()]
+    repeats = {}
+    previous = None
+    for entry in entries:
+        if previous is not None:
+            repeats[previous['file']] = 1 + entry['skipped_before']
+        previous = entry if 'file' in entry else None
+    if previous is not None:
+        repeats[previous['file']] = 1
+    return repeats
+
 def create_video_from_images(image_folder, output_video, frame_rate):
 
     images = [img for img in os.listdir(image_folder) if img.startswith("frame2_") and img.endswith(".jpg")]
     images.sort(key=lambda x: int(x.split('_')[1].split('.')[0]))
 
+    timing_path = os.path.join(image_folder, "frames.jsonl")
+    repeats = load_frame_repeats(timing_path) if os.path.exists(timing_path) else {}
+
     first_image_path = os.path.join(image_folder, images[0])
     first_image = cv2.imread(first_image_path)
     height,width,layers = first_image.shape
@@ -15,12 +34,15 @@ def create_video_from_images(image_folder, output_video, frame_rate):
     for image_name in images:
         image_path = os.path.join(image_folder, image_name)
         frame = cv2.imread(image_path)
-        video_writer.write(frame)
+        for _ in range(repeats.get(image_name, 1)):
+            video_writer.write(frame)
 
     video_writer.release()
     for image_name in images:
         image_path = os.path.join(image_folder, image_name)
         os.remove(image_path)
+    if os.path.exists(timing_path):
+        os.remove(timing_path)
 
     print("videosaved as {output_video}")
 
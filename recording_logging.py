@@ -11,6 +11,19 @@ from hailo_apps_infra.hailo_rpi_common import (
     app_callback_class,
 )
 from hailo_apps_infra.detection_pipeline import GStreamerDetectionApp
+from hailo_apps_infra.tracking import get_track_id, TrackKeyframeCapture, TrackAggregator, LabelSmoother
+from hailo_apps_infra.evidence import get_frame_view
+from hailo_apps_infra.recording import FrameDeduplicator
+
+DEFECT_LABELS = ["Missing Access Panel", "Missing Bolt",
+                 "Missing Bracket", "Missing Nut", "Missing Power Pack", "Missing Power Pack Head",
+                 "Missing Rail Cover"]
+
+timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M")  # Timestamp up to hours
+
+FRAMES_DIR = "/home/team206/hailo-rpi5-examples/frames"
+# Fraction of the (downsampled) frame that must change for a frame to be written again, 0 writes every frame
+DEDUP_THRESHOLD = 0.01
 
 # -----------------------------------------------------------------------------------------------
 # User-defined class to be used in the callback function
@@ -19,6 +32,27 @@ class user_app_callback_class(app_callback_class):
     def __init__(self):
         super().__init__()
         self.new_variable = 42  # Example variable
+        # One best-confidence image per tracked defect instead of one image per frame
+        self.keyframe_capture = TrackKeyframeCapture(
+            "/home/team206/hailo-rpi5-examples/log_frames",
+            labels=DEFECT_LABELS,
+            refresh_seconds=0,  # set > 0 to rewrite a track's image when a better view arrives
+            thumbnail_scale=4,  # also keep a 1/4 resolution thumbnail of the full frame
+            session=timestamp,  # log_frames/<timestamp>/ next to log/defect_tracks_<timestamp>.jsonl
+        )
+        # A label change is only reported after it wins 3 consecutive frames over the last 8
+        self.label_smoother = LabelSmoother(window=8, hysteresis=3)
+        # One log row per tracked defect (written when the track is lost) instead of one line per frame
+        os.makedirs("./log", exist_ok=True)
+        self.track_aggregator = TrackAggregator(
+            report_labels=DEFECT_LABELS,
+            output_path=os.path.join("./log", f"defect_tracks_{timestamp}.jsonl"),
+        )
+        # Near-identical frames are not written again; frames.jsonl keeps the timing for pictovid.py
+        self.frame_deduplicator = FrameDeduplicator(
+            threshold=DEDUP_THRESHOLD,
+            timing_path=os.path.join(FRAMES_DIR, "frames.jsonl"),
+        )
     
     def new_function(self):  # Example function
         return "The meaning of life is: "
@@ -26,7 +60,21 @@ class user_app_callback_class(app_callback_class):
 # -----------------------------------------------------------------------------------------------
 # User-defined callback function
 # -----------------------------------------------------------------------------------------------
-timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M")  # Timestamp up to hours
+
+def draw_defects(frame_view, defect_detections):
+    """
+    Returns a BGR copy of the RGB frame view with the defect boxes and labels drawn on it.
+    """
+    height, width = frame_view.shape[:2]
+    frame2 = cv2.cvtColor(frame_view, cv2.COLOR_RGB2BGR)
+    for _, label, confidence, (bbox_xmin, bbox_ymin, bbox_xmax, bbox_ymax) in defect_detections:
+        xmin, ymin, xmax, ymax = (
+            int(bbox_xmin * width), int(bbox_ymin * height),
+            int(bbox_xmax * width), int(bbox_ymax * height)
+        )
+        cv2.rectangle(frame2, (xmin, ymin), (xmax, ymax), (0, 255, 0), 2)
+        cv2.putText(frame2, f"{label} {confidence:.2f}", (xmin, ymin-10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 1)
+    return frame2
 
 def app_callback(pad, info, user_data):
     frame_count = user_data.get_count()
@@ -48,41 +96,39 @@ def app_callback(pad, info, user_data):
     roi = hailo.get_roi_from_buffer(buffer)
     detections = roi.get_objects_typed(hailo.HAILO_DETECTION)
     
-    log_dir = "./log"
-    os.makedirs(log_dir, exist_ok=True)
-    log_file_path = os.path.join(log_dir, f"detections_log_{timestamp}.txt")
-    
     detection_count = 0
-    frame2 = np.frombuffer(map_info.data, dtype=np.uint8).reshape((height, width, 3))
-    frame2 = np.array(frame2, copy=True)
-    
+    defect_detections = []
+    tracked_detections = []
     for detection in detections:
-        label = detection.get_label()
-        confidence = detection.get_confidence()
         bbox = detection.get_bbox()
-        xmin, ymin, xmax, ymax = (
-            int(bbox.xmin() * width), int(bbox.ymin() * height),
-            int(bbox.xmax() * width), int(bbox.ymax() * height)
-        )
+        tracked_detections.append((get_track_id(detection), detection.get_label(), detection.get_confidence(),
+                                   (bbox.xmin(), bbox.ymin(), bbox.xmax(), bbox.ymax())))
+    # Labels are smoothed per track so a flickering label does not create spurious log entries and captures
+    tracked_detections = user_data.label_smoother.smooth(frame_count, tracked_detections)
+    frame_detections = [(label, confidence) for _, label, confidence, _ in tracked_detections]
+    
+    for tracked_detection in tracked_detections:
+        _, label, confidence, _ = tracked_detection
         
-        if label in ["Missing Access Panel", "Missing Bolt",
-                     "Missing Bracket", "Missing Nut", "Missing Power Pack", "Missing Power Pack Head",
-                     "Missing Rail Cover"]:
+        if label in DEFECT_LABELS:
             #roi.remove_object(detection)
             string_to_print += f"Frame: frame2_{frame_count:04d}.jpg -- Label: {label} -- Confidence: {confidence:.2f}\n"
             detection_count += 1
-            
-            with open(log_file_path, "a") as log_file:
-                log_file.write(f"Frame: frame2_{frame_count:04d}.jpg -- Label: {label} -- Confidence: {confidence:.2f}\n")
-            
-            cv2.rectangle(frame2, (xmin, ymin), (xmax, ymax), (0, 255, 0), 2)
-            cv2.putText(frame2, f"{label} {confidence:.2f}", (xmin, ymin-10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 1)
-            frame2 = cv2.cvtColor(frame2, cv2.COLOR_RGB2BGR)
-            output_path2 = f"/home/team206/hailo-rpi5-examples/log_frames/frame2_{frame_count:04d}.jpg"
-            cv2.imwrite(output_path2, frame2)
-    frame2 = cv2.cvtColor(frame2, cv2.COLOR_RGB2BGR)
-    output_path = f"/home/team206/hailo-rpi5-examples/frames/frame2_{frame_count:04d}.jpg"
-    cv2.imwrite(output_path, frame2)
+            defect_detections.append(tracked_detection)
+    # All labels are aggregated so a track's final label is decided by its votes over all frames
+    for track in user_data.track_aggregator.update(frame_count, tracked_detections):
+        string_to_print += f"Track {track['track_id']} done -- Label: {track['label']} -- Max confidence: {track['max_confidence']:.2f} -- Frames: {track['first_frame']}-{track['last_frame']}\n"
+    # Evidence crops and the duplicate check use the mapped buffer, before any drawing or colour conversion
+    frame_view = get_frame_view(map_info, width, height)
+    user_data.keyframe_capture.update(frame_count, frame_view, defect_detections)
+    if user_data.event_recorder is not None:
+        # --event-labels: only the buffered window around defect detections is written to disk
+        user_data.event_recorder.push(draw_defects(frame_view, defect_detections), frame_detections)
+    else:
+        # The copy, drawing and colour conversion are only done for frames the deduplicator lets through
+        file_name = f"frame2_{frame_count:04d}.jpg"
+        if user_data.frame_deduplicator.accept(frame_view, frame_count, file_name):
+            cv2.imwrite(os.path.join(FRAMES_DIR, file_name), draw_defects(frame_view, defect_detections))
     
     if user_data.use_frame:
         cv2.putText(frame, f"Detections: {detection_count}", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
@@ -91,10 +137,16 @@ def app_callback(pad, info, user_data):
         cv2.imwrite("home/team206/Documents/frame.jpg", frame)
         user_data.set_frame(frame)
     
+    buffer.unmap(map_info)
     print(string_to_print)
     return Gst.PadProbeReturn.OK
 
 if __name__ == "__main__":
     user_data = user_app_callback_class()
     app = GStreamerDetectionApp(app_callback, user_data)
-    app.run()
+    try:
+        app.run()
+    finally:
+        user_data.keyframe_capture.flush()
+        user_data.track_aggregator.flush()
+        user_data.frame_deduplicator.close()